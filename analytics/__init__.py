@@ -0,0 +1 @@
+from .stats import UserStats, compute_stats, daily_arrays
@@ -0,0 +1,91 @@
+from dataclasses import dataclass
+from datetime import date
+from typing import Iterable
+
+import numpy as np
+
+# Окно, которое всегда попадает в плотный массив: нужно для скользящих средних за 7 и 30 дней
+_MIN_WINDOW_DAYS = 60
+# 1970-01-01 (начало отсчёта datetime64) — четверг
+_EPOCH_WEEKDAY = 3
+
+@dataclass(frozen=True)
+class UserStats:
+    active_days: int
+    current_streak: int
+    longest_streak: int
+    avg_7: float          # среднее минут в день за последние 7 дней
+    avg_7_prev: float     # то же за предыдущие 7 дней
+    avg_30: float
+    best_week_avg: float  # лучшее среднее за 7 дней подряд
+    best_weekday: int | None  # 0 — понедельник
+    best_weekday_avg: float
+    session_p50: float | None
+    session_p90: float | None
+
+def daily_arrays(rows: Iterable[tuple[date, int, int]]) -> tuple[np.ndarray, np.ndarray]:
+    """Преобразует строки дневной сводки (day, минуты, записей) в массивы дней и минут."""
+    rows = list(rows)
+    days = np.fromiter((row[0] for row in rows), dtype='datetime64[D]', count=len(rows))
+    minutes = np.fromiter((row[1] for row in rows), dtype=np.int64, count=len(rows))
+    return days, minutes
+
+def compute_stats(
+    days: np.ndarray,
+    minutes: np.ndarray,
+    today: date,
+    session_p50: float | None = None,
+    session_p90: float | None = None,
+) -> UserStats:
+    """Считает серии, скользящие средние и лучший день недели по плотному массиву минут за каждый день.
+
+    days — уникальные дни (datetime64[D]), minutes — минуты за эти дни.
+    """
+    end = np.datetime64(today, 'D')
+    keep = days <= end
+    days, minutes = days[keep], minutes[keep]
+    start = min(days.min(), end - (_MIN_WINDOW_DAYS - 1)) if days.size else end - (_MIN_WINDOW_DAYS - 1)
+    n = int((end - start).astype(np.int64)) + 1
+
+    dense = np.zeros(n, dtype=np.int64)
+    dense[(days - start).astype(np.int64)] = minutes
+    active = dense > 0
+
+    # Серии: границы отрезков из активных дней
+    edges = np.diff(np.concatenate(([0], active.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    lengths = ends - starts
+    longest = int(lengths.max()) if lengths.size else 0
+    # Текущая серия не прерывается, пока сегодня ещё можно что-то записать
+    current = int(lengths[-1]) if lengths.size and ends[-1] >= n - 1 else 0
+
+    # Скользящие средние через префиксные суммы
+    cumsum = np.concatenate(([0], np.cumsum(dense)))
+    rolling_7 = (cumsum[7:] - cumsum[:-7]) / 7
+    rolling_30 = (cumsum[30:] - cumsum[:-30]) / 30
+
+    # Средние по дням недели считаем с первого дня с данными, без добавленных нулей в начале
+    best_weekday, best_weekday_avg = None, 0.0
+    if days.size:
+        first = int((days.min() - start).astype(np.int64))
+        weekdays = (np.arange(first, n) + int(start.astype(np.int64)) + _EPOCH_WEEKDAY) % 7
+        sums = np.bincount(weekdays, weights=dense[first:], minlength=7)
+        averages = sums / np.maximum(np.bincount(weekdays, minlength=7), 1)
+        if sums.max() > 0:
+            best_weekday = int(averages.argmax())
+            best_weekday_avg = float(averages[best_weekday])
+
+    return UserStats(
+        active_days=int(active.sum()),
+        current_streak=current,
+        longest_streak=longest,
+        avg_7=float(rolling_7[-1]),
+        avg_7_prev=float(rolling_7[-8]),
+        avg_30=float(rolling_30[-1]),
+        best_week_avg=float(rolling_7.max()),
+        best_weekday=best_weekday,
+        best_weekday_avg=best_weekday_avg,
+        session_p50=session_p50,
+        session_p90=session_p90,
+    )
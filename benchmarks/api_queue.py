@@ -0,0 +1,175 @@
+"""Проверка очереди исходящих запросов (messaging.QueuedSession) на локальном поддельном Bot API.
+
+FakeBotAPI — aiohttp-сервер с теми же адресами, что у api.telegram.org (/bot<token>/<method>).
+Он отвечает на отправку и правку сообщений и, как Telegram, возвращает 429 с retry_after,
+если в чат уходит больше --chat-limit запросов в секунду или всего больше --global-limit.
+
+Прогон одновременно отправляет рассылку (--background сообщений в разные чаты, фоновый приоритет)
+и интерактивные ответы (--users пользователей по --replies сообщения подряд) и сравнивает задержки
+по приоритетам и ошибки 429, дошедшие до вызывающего. С --no-queue — обычная AiohttpSession.
+С --serve сервер просто слушает порт: бота можно запустить против него с API_SERVER_URL.
+
+    python -m benchmarks.api_queue --background 600 --users 50 --replies 3
+    python -m benchmarks.api_queue --background 600 --users 50 --replies 3 --no-queue
+    python -m benchmarks.api_queue --serve --port 8081
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from collections import defaultdict, deque
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.exceptions import TelegramRetryAfter
+from aiohttp import web
+
+from benchmarks.load_test import percentiles
+from messaging import QueuedSession, mark_background
+
+BOT_TOKEN = '123456:fake-token'
+BACKGROUND_CHAT_ID = 8_000_000_000
+USER_CHAT_ID = 9_000_000_000
+
+class FakeBotAPI:
+    """Поддельный сервер Bot API с ограничениями частоты по чату и общим (скользящее окно в 1 секунду)."""
+
+    def __init__(self, global_limit: int = 30, chat_limit: int = 1, retry_after: int = 1, latency: float = 0.02):
+        self.global_limit = global_limit
+        self.chat_limit = chat_limit
+        self.retry_after = retry_after
+        self.latency = latency
+        self._global: deque[float] = deque()
+        self._chats: dict[str, deque[float]] = defaultdict(deque)
+        self._message_ids = itertools.count(1)
+        self.requests = 0
+        self.limited = 0
+
+    @staticmethod
+    def _hit(window: deque[float], limit: int, now: float) -> bool:
+        while window and window[0] <= now - 1:
+            window.popleft()
+        if len(window) >= limit:
+            return False
+        window.append(now)
+        return True
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info['method'].lower()
+        data = await request.post()
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if method == 'getupdates':
+            await asyncio.sleep(min(float(data.get('timeout', 0) or 0), 1.0))
+            return web.json_response({'ok': True, 'result': []})
+        if method == 'getme':
+            return web.json_response({'ok': True, 'result': {'id': 123456, 'is_bot': True, 'first_name': 'Fake'}})
+        chat_id = data.get('chat_id')
+        if chat_id is None:
+            return web.json_response({'ok': True, 'result': True})
+        now = time.monotonic()
+        if not self._hit(self._chats[chat_id], self.chat_limit, now) or not self._hit(self._global, self.global_limit, now):
+            self.limited += 1
+            return web.json_response({
+                'ok': False,
+                'error_code': 429,
+                'description': f'Too Many Requests: retry after {self.retry_after}',
+                'parameters': {'retry_after': self.retry_after},
+            }, status=429)
+        message_id = int(data['message_id']) if 'message_id' in data else next(self._message_ids)
+        return web.json_response({'ok': True, 'result': {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': int(chat_id), 'type': 'private'},
+            'text': data.get('text', ''),
+        }})
+
+    async def start(self, host: str, port: int) -> web.AppRunner:
+        app = web.Application()
+        app.router.add_post('/bot{token}/{method}', self.handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        return runner
+
+async def run(args) -> dict:
+    server = FakeBotAPI(args.global_limit, args.chat_limit, args.retry_after, args.latency)
+    runner = await server.start(args.host, args.port)
+    api = TelegramAPIServer.from_base(f'http://{args.host}:{args.port}')
+    if args.no_queue:
+        session = AiohttpSession(api=api)
+    else:
+        session = QueuedSession(
+            global_rate=args.global_limit, chat_rate=args.chat_limit, chat_burst=args.chat_limit, api=api
+        )
+    bot = Bot(BOT_TOKEN, session=session)
+    rng = random.Random(args.seed)
+    latencies: dict[str, list[float]] = {'interactive': [], 'background': []}
+    errors: dict[str, int] = {'interactive': 0, 'background': 0}
+
+    async def send(chat_id: int, kind: str) -> None:
+        start = time.perf_counter()
+        try:
+            await bot.send_message(chat_id, kind)
+        except TelegramRetryAfter:
+            errors[kind] += 1
+            return
+        latencies[kind].append(time.perf_counter() - start)
+
+    async def broadcast() -> None:
+        mark_background()
+        await asyncio.gather(*(send(BACKGROUND_CHAT_ID + i, 'background') for i in range(args.background)))
+
+    async def user(i: int) -> None:
+        await asyncio.sleep(rng.uniform(0, args.spread))
+        for _ in range(args.replies):
+            await send(USER_CHAT_ID + i, 'interactive')
+
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(broadcast(), *(user(i) for i in range(args.users)))
+    finally:
+        await bot.session.close()
+        await runner.cleanup()
+    return {
+        'session': type(session).__name__,
+        'duration_s': round(time.perf_counter() - start, 3),
+        'server_requests': server.requests,
+        'server_429': server.limited,
+        'errors_429': errors,
+        'latency': {kind: percentiles(samples) for kind, samples in latencies.items()},
+    }
+
+async def serve(args) -> None:
+    server = FakeBotAPI(args.global_limit, args.chat_limit, args.retry_after, args.latency)
+    await server.start(args.host, args.port)
+    print(f"Fake Bot API on http://{args.host}:{args.port} (API_SERVER_URL)")
+    await asyncio.Event().wait()
+
+def main():
+    parser = argparse.ArgumentParser(description="Очередь запросов Bot API против поддельного сервера")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--global-limit', type=int, default=30, help="запросов в секунду на всех")
+    parser.add_argument('--chat-limit', type=int, default=1, help="запросов в секунду в один чат")
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--latency', type=float, default=0.02, help="задержка ответа сервера, с")
+    parser.add_argument('--background', type=int, default=600, help="сообщений рассылки")
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--replies', type=int, default=3, help="ответов подряд одному пользователю")
+    parser.add_argument('--spread', type=float, default=5.0, help="за сколько секунд приходят пользователи")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--no-queue', action='store_true', help="без очереди (AiohttpSession)")
+    parser.add_argument('--serve', action='store_true', help="только поднять сервер")
+    args = parser.parse_args()
+    if args.serve:
+        asyncio.run(serve(args))
+        return
+    print(json.dumps(asyncio.run(run(args)), ensure_ascii=False, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""Сбор и сравнение планов EXPLAIN для запросов чтения из database/db.py.
+
+Сравнение до/после изменения схемы:
+    python -m benchmarks.explain_queries --user TELEGRAM_ID --out before.json
+    python -m database.migrate
+    python -m benchmarks.explain_queries --user TELEGRAM_ID --out after.json
+    python -m benchmarks.explain_queries --compare before.json after.json
+"""
+import argparse
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from database.connection import AsyncSessionLocal, engine
+from database import db
+
+def history_queries(user_id: int) -> dict:
+    """Функции чтения из database/db.py с типичными аргументами экранов истории."""
+    now = datetime.now()
+    return {
+        'get_user_productivity_history': lambda s: db.get_user_productivity_history(s, user_id),
+        'get_productivity_sum_by_day': lambda s: db.get_productivity_sum_by_day(s, user_id, now - timedelta(days=13), now),
+        'get_productivity_sum_for_month': lambda s: db.get_productivity_sum_for_month(s, user_id, now.year, now.month),
+        'get_all_months_with_data': lambda s: db.get_all_months_with_data(s, user_id),
+        'get_total_productivity': lambda s: db.get_total_productivity(s, user_id),
+        'get_months_with_total': lambda s: db.get_months_with_total(s, user_id),
+    }
+
+async def capture_statements(call) -> list[tuple[str, tuple]]:
+    """Выполняет call(session) и возвращает отправленные в БД операторы с параметрами."""
+    captured: list[tuple[str, tuple]] = []
+
+    def _on_execute(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, tuple(parameters or ())))
+
+    event.listen(engine.sync_engine, 'before_cursor_execute', _on_execute)
+    try:
+        async with AsyncSessionLocal() as session:
+            await call(session)
+    finally:
+        event.remove(engine.sync_engine, 'before_cursor_execute', _on_execute)
+    return captured
+
+async def explain(statement: str, parameters: tuple) -> dict:
+    """Возвращает план EXPLAIN (ANALYZE, BUFFERS) оператора в формате JSON."""
+    async with engine.connect() as conn:
+        result = await conn.exec_driver_sql(
+            'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ' + statement, parameters
+        )
+        plan = result.scalar()
+        await conn.rollback()
+    return (json.loads(plan) if isinstance(plan, str) else plan)[0]
+
+def summarize(plan: dict) -> dict:
+    """Краткая сводка плана: узлы, индексы, время и прочитанные строки/буферы."""
+    nodes, indexes = [], set()
+    rows_scanned = 0
+    buffers = 0
+
+    def walk(node: dict):
+        nonlocal rows_scanned, buffers
+        nodes.append(node['Node Type'])
+        if 'Index Name' in node:
+            indexes.add(node['Index Name'])
+        if 'Relation Name' in node:
+            loops = node.get('Actual Loops', 1)
+            rows_scanned += (node.get('Actual Rows', 0) + node.get('Rows Removed by Filter', 0)) * loops
+        buffers += node.get('Shared Hit Blocks', 0) + node.get('Shared Read Blocks', 0)
+        for child in node.get('Plans', []):
+            walk(child)
+
+    walk(plan['Plan'])
+    return {
+        'nodes': nodes,
+        'indexes': sorted(indexes),
+        'rows_scanned': rows_scanned,
+        'buffers': buffers,
+        'execution_ms': plan.get('Execution Time'),
+    }
+
+async def collect(user_id: int) -> dict:
+    report = {}
+    for name, call in history_queries(user_id).items():
+        plans = []
+        for statement, parameters in await capture_statements(call):
+            plan = await explain(statement, parameters)
+            plans.append({'statement': statement, 'summary': summarize(plan), 'plan': plan})
+        report[name] = plans
+    return report
+
+def compare(before: dict, after: dict) -> str:
+    lines = []
+    for name in sorted(set(before) | set(after)):
+        lines.append(name)
+        for label, report in (('before', before), ('after', after)):
+            for i, item in enumerate(report.get(name, [])):
+                s = item['summary']
+                lines.append(
+                    f"  {label:<6} #{i}: {s['execution_ms']} ms, rows={s['rows_scanned']}, "
+                    f"buffers={s['buffers']}, nodes={'>'.join(s['nodes'])}, indexes={','.join(s['indexes']) or '-'}"
+                )
+    return '\n'.join(lines)
+
+async def main(args):
+    if args.compare:
+        with open(args.compare[0], encoding='utf-8') as f_before, open(args.compare[1], encoding='utf-8') as f_after:
+            print(compare(json.load(f_before), json.load(f_after)))
+        return
+    report = await collect(args.user)
+    await engine.dispose()
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+    print(compare({}, report))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="EXPLAIN для запросов истории")
+    parser.add_argument('--user', type=int, help="telegram_id пользователя с данными")
+    parser.add_argument('--out', default='explain.json')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'))
+    asyncio.run(main(parser.parse_args()))
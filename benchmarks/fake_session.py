@@ -0,0 +1,54 @@
+import asyncio
+import itertools
+from datetime import datetime
+from typing import Any, AsyncGenerator
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import (
+    EditMessageReplyMarkup,
+    EditMessageText,
+    SendDocument,
+    SendMessage,
+    TelegramMethod,
+)
+from aiogram.methods.base import TelegramType
+from aiogram.types import Chat, Message
+
+class FakeSession(BaseSession):
+    """
+    Сессия Bot API без сети: отвечает на методы правдоподобными объектами.
+    latency — искусственная задержка каждого вызова в секундах.
+    """
+    def __init__(self, latency: float = 0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.latency = latency
+        self.calls: dict[str, int] = {}
+        self._message_ids = itertools.count(1)
+
+    async def make_request(self, bot: Bot, method: TelegramMethod[TelegramType], timeout: int | None = None) -> TelegramType:
+        name = type(method).__name__
+        self.calls[name] = self.calls.get(name, 0) + 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if isinstance(method, (SendMessage, SendDocument)):
+            return self._message(bot, method.chat_id, getattr(method, 'text', None), next(self._message_ids))
+        if isinstance(method, (EditMessageText, EditMessageReplyMarkup)) and method.message_id is not None:
+            return self._message(bot, method.chat_id, getattr(method, 'text', None), method.message_id)
+        return True
+
+    @staticmethod
+    def _message(bot: Bot, chat_id: Any, text: str | None, message_id: int) -> Message:
+        return Message(
+            message_id=message_id,
+            date=datetime.now(),
+            chat=Chat(id=int(chat_id), type='private'),
+            text=text,
+        ).as_(bot)
+
+    async def stream_content(self, url: str, headers: dict | None = None, timeout: int = 30,
+                             chunk_size: int = 65536, raise_for_status: bool = True) -> AsyncGenerator[bytes, None]:
+        yield b''
+
+    async def close(self) -> None:
+        pass
@@ -0,0 +1,122 @@
+"""Замер общего планировщика живых таймеров потока (timers.FlowTicker) без сети и БД.
+
+Запускает N таймеров со случайным уже прошедшим временем поверх FakeSession и в течение
+--duration секунд меряет процессорное время, память, число правок и опоздание тиков,
+а также задержку цикла событий (насколько тикер мешает обработке апдейтов).
+Текст таймера показывает секунды, поэтому каждый тик требует правки.
+С --baseline для сравнения запускается вариант «отдельная задача на таймер».
+
+    python -m benchmarks.flow_timer --timers 10000 --interval 5 --duration 30
+    python -m benchmarks.flow_timer --timers 10000 --interval 5 --duration 30 --baseline
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import tracemalloc
+
+from aiogram import Bot
+
+from benchmarks.fake_session import FakeSession
+from benchmarks.load_test import percentiles
+from timers import FlowTicker
+
+BASE_CHAT_ID = 9_000_000_000
+
+def _render(elapsed_sec: int) -> str:
+    return f'⏱ {elapsed_sec // 3600}:{elapsed_sec // 60 % 60:02d}:{elapsed_sec % 60:02d}'
+
+async def _probe_loop_lag(samples: list[float], stop: asyncio.Event, period: float = 0.01) -> None:
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(period)
+        samples.append(loop.time() - start - period)
+
+async def _run_ticker(bot: Bot, timers: int, interval: float, max_edits: float, duration: float) -> dict:
+    ticker = FlowTicker(interval=interval, max_edits_per_sec=max_edits, render=_render)
+    ticker.start(bot)
+    before = tracemalloc.get_traced_memory()[0]
+    for i in range(timers):
+        ticker.track(BASE_CHAT_ID + i, 1, random.randrange(3600))
+    tracked = tracemalloc.get_traced_memory()[0]
+    await asyncio.sleep(duration)
+    stats = ticker.stats()
+    await ticker.close()
+    return {'memory_per_timer_bytes': round((tracked - before) / timers, 1), **stats}
+
+async def _run_baseline(bot: Bot, timers: int, interval: float, duration: float) -> dict:
+    # Наивный вариант: своя задача на каждый таймер, без общего лимита правок
+    edits = 0
+
+    async def tick(chat_id: int, elapsed: int) -> None:
+        nonlocal edits
+        await asyncio.sleep(interval - elapsed % interval)
+        elapsed += interval - elapsed % interval
+        while True:
+            await bot.edit_message_text(text=_render(int(elapsed)), chat_id=chat_id, message_id=1)
+            edits += 1
+            await asyncio.sleep(interval)
+            elapsed += interval
+
+    before = tracemalloc.get_traced_memory()[0]
+    tasks = [asyncio.create_task(tick(BASE_CHAT_ID + i, random.randrange(3600))) for i in range(timers)]
+    await asyncio.sleep(0)
+    tracked = tracemalloc.get_traced_memory()[0]
+    await asyncio.sleep(duration)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return {'memory_per_timer_bytes': round((tracked - before) / timers, 1), 'active': timers, 'edits': edits}
+
+async def run(timers: int, interval: float, max_edits: float, duration: float, api_latency: float, baseline: bool) -> dict:
+    session = FakeSession(latency=api_latency)
+    bot = Bot(token='123456:TIMERBENCH', session=session)
+    lag_samples: list[float] = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_probe_loop_lag(lag_samples, stop))
+
+    tracemalloc.start()
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    if baseline:
+        result = await _run_baseline(bot, timers, interval, duration)
+    else:
+        result = await _run_ticker(bot, timers, interval, max_edits, duration)
+    cpu, wall = time.process_time() - cpu_start, time.perf_counter() - wall_start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    stop.set()
+    await probe
+
+    return {
+        'mode': 'baseline' if baseline else 'ticker',
+        'params': {
+            'timers': timers, 'interval_s': interval, 'max_edits_per_sec': max_edits,
+            'duration_s': duration, 'api_latency_ms': api_latency * 1000,
+        },
+        'cpu_utilization': round(cpu / wall, 3),
+        'memory_peak_mb': round(peak / 2 ** 20, 1),
+        'edits_per_sec': round(result['edits'] / wall, 1),
+        # Сколько правок потребовалось бы без лимита
+        'demanded_edits_per_sec': round(timers / interval, 1),
+        'event_loop_lag': percentiles(lag_samples),
+        **result,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Замер планировщика живых таймеров потока")
+    parser.add_argument('--timers', type=int, default=10000)
+    parser.add_argument('--interval', type=float, default=5.0, help="период тика таймера, секунды")
+    parser.add_argument('--max-edits', type=float, default=20.0, help="лимит правок в секунду")
+    parser.add_argument('--duration', type=float, default=30.0)
+    parser.add_argument('--api-latency-ms', type=float, default=50.0, help="задержка фейкового Bot API")
+    parser.add_argument('--baseline', action='store_true', help="задача на каждый таймер вместо общего планировщика")
+    args = parser.parse_args()
+    report = asyncio.run(run(
+        args.timers, args.interval, args.max_edits, args.duration, args.api_latency_ms / 1000, args.baseline,
+    ))
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+if __name__ == '__main__':
+    main()
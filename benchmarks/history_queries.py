@@ -0,0 +1,60 @@
+"""Микробенчмарк функций чтения database/db.py на пользователях с разным объёмом истории.
+
+Сначала: python -m benchmarks.seed (создаёт пробных пользователей и манифест).
+    python -m benchmarks.history_queries --manifest seed_manifest.json --iterations 50 --out history.json
+
+Для каждого размера истории и каждого запроса пишет задержку (p50/p95/max),
+прочитанные строки, буферы и план EXPLAIN.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from database.connection import AsyncSessionLocal, engine
+from benchmarks.explain_queries import capture_statements, explain, history_queries, summarize
+from benchmarks.load_test import percentiles
+
+async def bench_user(user_id: int, iterations: int) -> dict:
+    results = {}
+    for name, call in history_queries(user_id).items():
+        # прогрев: кэш планов и страниц
+        async with AsyncSessionLocal() as session:
+            await call(session)
+        samples = []
+        for _ in range(iterations):
+            async with AsyncSessionLocal() as session:
+                start = time.perf_counter()
+                await call(session)
+                samples.append(time.perf_counter() - start)
+        plans = []
+        for statement, parameters in await capture_statements(call):
+            plan = await explain(statement, parameters)
+            plans.append({'summary': summarize(plan), 'plan': plan})
+        results[name] = {
+            'latency': percentiles(samples),
+            'rows_scanned': sum(p['summary']['rows_scanned'] for p in plans),
+            'buffers': sum(p['summary']['buffers'] for p in plans),
+            'plans': plans,
+        }
+    return results
+
+async def main(args):
+    with open(args.manifest, encoding='utf-8') as f:
+        probes = json.load(f)['probes']
+    report = {}
+    for size, user_id in sorted(probes.items(), key=lambda item: int(item[0])):
+        report[size] = await bench_user(user_id, args.iterations)
+        for name, result in report[size].items():
+            print(f"{size:>7} records  {name:<32} p50={result['latency']['p50_ms']} ms "
+                  f"p95={result['latency']['p95_ms']} ms rows={result['rows_scanned']} buffers={result['buffers']}")
+    await engine.dispose()
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Бенчмарк запросов истории")
+    parser.add_argument('--manifest', default='seed_manifest.json')
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--out', default='history_queries.json')
+    asyncio.run(main(parser.parse_args()))
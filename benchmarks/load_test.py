@@ -0,0 +1,210 @@
+"""Нагрузочный прогон реального Dispatcher на синтетических апдейтах.
+
+Собирает диспетчер через main.create_dispatcher, подменяет сессию Bot API на FakeSession
+и прогоняет пользователей по сценариям через dp.feed_update:
+    flow:    /record_flow -> пауза -> продолжить -> завершить
+    sprint:  /record_sprint -> "25"
+    history: /history -> листание на 2 недели назад и обратно -> по месяцам
+
+Нужна PostgreSQL (переменные DB_* как для бота, лучше отдельная пустая база, например
+`docker compose up db`): запросы используют ON CONFLICT и GROUPING SETS, поэтому SQLite не подходит.
+
+    python -m benchmarks.load_test --users 2000 --concurrency 200 --out results.json
+    python -m benchmarks.load_test --compare old.json new.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import subprocess
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.default import DefaultBotProperties
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import CallbackQuery, Chat, Message, TelegramObject, Update, User
+
+from benchmarks.fake_session import FakeSession
+
+SCENARIOS = ('flow', 'sprint', 'history')
+BASE_USER_ID = 9_000_000_000
+
+class TimingMiddleware(BaseMiddleware):
+    """Собирает время каждого вызова обработчика для расчёта перцентилей."""
+    def __init__(self, samples: dict[str, list[float]]):
+        self.samples = samples
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        name = getattr(getattr(data.get("handler"), "callback", None), "__name__", "unknown")
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            self.samples[name].append(time.perf_counter() - start)
+
+class UpdateFactory:
+    def __init__(self):
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+
+    def message(self, user_id: int, text: str) -> Update:
+        return Update(
+            update_id=next(self._update_ids),
+            message=Message(
+                message_id=next(self._message_ids),
+                date=datetime.now(),
+                chat=Chat(id=user_id, type='private'),
+                from_user=User(id=user_id, is_bot=False, first_name='Load', username=f'load{user_id}'),
+                text=text,
+            ),
+        )
+
+    def callback(self, user_id: int, data: str, message_id: int = 1) -> Update:
+        return Update(
+            update_id=next(self._update_ids),
+            callback_query=CallbackQuery(
+                id=str(next(self._update_ids)),
+                from_user=User(id=user_id, is_bot=False, first_name='Load', username=f'load{user_id}'),
+                chat_instance=str(user_id),
+                data=data,
+                message=Message(
+                    message_id=message_id,
+                    date=datetime.now(),
+                    chat=Chat(id=user_id, type='private'),
+                    text='-',
+                ),
+            ),
+        )
+
+def scenario_updates(factory: UpdateFactory, scenario: str, user_id: int) -> list[Update]:
+    if scenario == 'flow':
+        return [
+            factory.message(user_id, '/record_flow'),
+            factory.callback(user_id, 'flow_pause'),
+            factory.callback(user_id, 'flow_resume'),
+            factory.callback(user_id, 'flow_finish'),
+        ]
+    if scenario == 'sprint':
+        return [factory.message(user_id, '/record_sprint'), factory.message(user_id, '25')]
+    return [
+        factory.message(user_id, '/history'),
+        factory.callback(user_id, 'hist:days:1:0'),
+        factory.callback(user_id, 'hist:days:0:0'),
+        factory.callback(user_id, 'hist:months:0:0'),
+    ]
+
+def percentiles(samples: list[float]) -> dict[str, float]:
+    ordered = sorted(samples)
+    if not ordered:
+        return {}
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3)
+
+    return {
+        'count': len(ordered),
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 3),
+        'p50_ms': pick(0.50),
+        'p95_ms': pick(0.95),
+        'p99_ms': pick(0.99),
+    }
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def run(users: int, concurrency: int, api_latency: float, throttle: bool = False) -> dict:
+    from config import conf
+    from database import create_db_and_tables, engine
+    from main import create_dispatcher
+
+    # Сценарии шлют апдейты пользователя подряд, поэтому ограничение частоты по умолчанию выключено
+    conf.THROTTLE_ENABLED = throttle
+
+    await create_db_and_tables()
+    session = FakeSession(latency=api_latency)
+    bot = Bot(token='123456:LOADTEST', session=session, default=DefaultBotProperties(parse_mode='HTML'))
+    dp = create_dispatcher(MemoryStorage())
+    handler_samples: dict[str, list[float]] = defaultdict(list)
+    dp.message.middleware(TimingMiddleware(handler_samples))
+    dp.callback_query.middleware(TimingMiddleware(handler_samples))
+
+    factory = UpdateFactory()
+    update_samples: list[float] = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def simulate(index: int) -> None:
+        nonlocal errors
+        user_id = BASE_USER_ID + index
+        async with semaphore:
+            for update in scenario_updates(factory, SCENARIOS[index % len(SCENARIOS)], user_id):
+                start = time.perf_counter()
+                try:
+                    await dp.feed_update(bot, update)
+                except Exception:
+                    errors += 1
+                update_samples.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(simulate(i) for i in range(users)))
+    elapsed = time.perf_counter() - started
+    await engine.dispose()
+
+    return {
+        'commit': _git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'params': {'users': users, 'concurrency': concurrency, 'api_latency_ms': api_latency * 1000, 'throttle': throttle},
+        'elapsed_s': round(elapsed, 3),
+        'updates': len(update_samples),
+        'errors': errors,
+        'throughput_updates_per_s': round(len(update_samples) / elapsed, 1) if elapsed else None,
+        'updates_latency': percentiles(update_samples),
+        'handlers': {name: percentiles(samples) for name, samples in sorted(handler_samples.items())},
+        'api_calls': session.calls,
+    }
+
+def compare(before: dict, after: dict) -> str:
+    lines = [
+        f"throughput: {before.get('throughput_updates_per_s')} -> {after.get('throughput_updates_per_s')} updates/s",
+    ]
+    for name in sorted(set(before['handlers']) | set(after['handlers'])):
+        old, new = before['handlers'].get(name, {}), after['handlers'].get(name, {})
+        lines.append(
+            f"{name:<32} p50 {old.get('p50_ms')} -> {new.get('p50_ms')} ms, "
+            f"p95 {old.get('p95_ms')} -> {new.get('p95_ms')} ms, p99 {old.get('p99_ms')} -> {new.get('p99_ms')} ms"
+        )
+    return '\n'.join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон диспетчера")
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--api-latency-ms', type=float, default=0.0, help="задержка фейкового Bot API")
+    parser.add_argument('--throttle', action='store_true', help="включить ограничение частоты (THROTTLE_*)")
+    parser.add_argument('--out', default='load_test.json')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'))
+    args = parser.parse_args()
+    if args.compare:
+        with open(args.compare[0], encoding='utf-8') as f_before, open(args.compare[1], encoding='utf-8') as f_after:
+            print(compare(json.load(f_before), json.load(f_after)))
+        return
+    report = asyncio.run(run(args.users, args.concurrency, args.api_latency_ms / 1000, args.throttle))
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(json.dumps({k: v for k, v in report.items() if k != 'handlers'}, ensure_ascii=False, indent=2))
+    for name, stats in report['handlers'].items():
+        print(f"{name:<32} {stats}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""Заполнение базы синтетическими данными через COPY.
+
+    python -m benchmarks.seed --users 100000 --records 5000000 --years 5
+    python -m benchmarks.seed --clean
+
+Кроме основной массы пользователей (число записей на пользователя распределено
+с тяжёлым хвостом) создаются "пробные" пользователи с точным размером истории
+(--probe-sizes). Их telegram_id пишутся в манифест для benchmarks.history_queries.
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import text
+
+from config import conf
+from database.connection import AsyncSessionLocal, create_db_and_tables, engine
+from database.db import rebuild_daily_productivity
+
+SEED_USER_BASE = 8_000_000_000
+PROBE_USER_BASE = 7_900_000_000
+RECORD_COLUMNS = ['user_id', 'duration_minutes', 'recorded_at', 'local_date', 'username']
+
+def _record_time(rng: random.Random, start: datetime, span_days: int) -> datetime:
+    """Время записи (в поясе start): будни чаще выходных, рабочие часы чаще ночи."""
+    while True:
+        day = start + timedelta(days=rng.randrange(span_days))
+        if day.weekday() < 5 or rng.random() < 0.5:
+            break
+    hour = min(23, max(6, int(rng.gauss(15, 4))))
+    return day.replace(hour=hour, minute=rng.randrange(60), second=rng.randrange(60), microsecond=0)
+
+def _records_for_user(rng: random.Random, user_id: int, count: int, start: datetime, span_days: int):
+    username = f'seed{user_id}'
+    for _ in range(count):
+        recorded_at = _record_time(rng, start, span_days)
+        if rng.random() < 0.6:
+            yield 'flow', (user_id, max(1, int(rng.lognormvariate(math.log(45), 0.6))), recorded_at, recorded_at.date(), username)
+        else:
+            yield 'sprint', (user_id, rng.choice((15, 25, 30, 45, 50, 60, 90)), recorded_at, recorded_at.date(), username)
+
+def _allocate(rng: random.Random, users: int, records: int) -> list[int]:
+    """Распределяет записи по пользователям с тяжёлым хвостом (Парето)."""
+    weights = [rng.paretovariate(1.2) for _ in range(users)]
+    scale = records / sum(weights)
+    return [int(w * scale) for w in weights]
+
+async def _copy(driver, table: str, rows: list[tuple]) -> None:
+    if rows:
+        await driver.copy_records_to_table(table, records=rows, columns=RECORD_COLUMNS)
+
+async def seed(users: int, records: int, years: int, probe_sizes: list[int], batch: int, seed_value: int) -> dict:
+    rng = random.Random(seed_value)
+    span_days = 365 * years
+    # Все пользователи получают пояс по умолчанию, время записей генерируется сразу в нём
+    zone = ZoneInfo(conf.DEFAULT_TIMEZONE)
+    start = datetime.now(zone).replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=span_days)
+    plan = [(SEED_USER_BASE + i, count) for i, count in enumerate(_allocate(rng, users, records))]
+    plan += [(PROBE_USER_BASE + i, size) for i, size in enumerate(probe_sizes)]
+
+    await create_db_and_tables()
+    async with engine.connect() as conn:
+        driver = (await conn.get_raw_connection()).driver_connection
+        now = datetime.now(zone)
+        for offset in range(0, len(plan), batch):
+            await driver.copy_records_to_table(
+                'users',
+                records=[
+                    (telegram_id, f'seed{telegram_id}', now, conf.DEFAULT_TIMEZONE)
+                    for telegram_id, _ in plan[offset:offset + batch]
+                ],
+                columns=['telegram_id', 'username', 'created_at', 'timezone'],
+            )
+        buffers = {'flow': [], 'sprint': []}
+        loaded = 0
+        for user_id, count in plan:
+            for kind, row in _records_for_user(rng, user_id, count, start, span_days):
+                buffers[kind].append(row)
+                if len(buffers[kind]) >= batch:
+                    await _copy(driver, f'{kind}_records', buffers[kind])
+                    loaded += len(buffers[kind])
+                    buffers[kind] = []
+                    print(f"loaded {loaded} records", end='\r', flush=True)
+        for kind, rows in buffers.items():
+            await _copy(driver, f'{kind}_records', rows)
+            loaded += len(rows)
+        await conn.commit()
+    print(f"loaded {loaded} records")
+
+    async with AsyncSessionLocal() as session:
+        await rebuild_daily_productivity(session)
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level='AUTOCOMMIT')
+        await conn.execute(text('ANALYZE'))
+    return {'probes': {str(size): PROBE_USER_BASE + i for i, size in enumerate(probe_sizes)}, 'years': years}
+
+async def clean() -> None:
+    """Удаляет все сгенерированные данные."""
+    async with engine.begin() as conn:
+        for table in ('daily_productivity', 'flow_records', 'sprint_records'):
+            await conn.execute(text(f'DELETE FROM {table} WHERE user_id >= :base'), {'base': PROBE_USER_BASE})
+        await conn.execute(text('DELETE FROM users WHERE telegram_id >= :base'), {'base': PROBE_USER_BASE})
+
+async def main(args):
+    if args.clean:
+        await clean()
+    else:
+        probe_sizes = [int(size) for size in args.probe_sizes.split(',') if size]
+        manifest = await seed(args.users, args.records, args.years, probe_sizes, args.batch, args.seed)
+        with open(args.manifest, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+    await engine.dispose()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Генерация синтетических данных продуктивности")
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--records', type=int, default=5_000_000, help="всего записей потока и спринтов")
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--probe-sizes', default='10,100,1000,10000,100000')
+    parser.add_argument('--batch', type=int, default=50_000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--manifest', default='seed_manifest.json')
+    parser.add_argument('--clean', action='store_true', help="удалить сгенерированные данные")
+    asyncio.run(main(parser.parse_args()))
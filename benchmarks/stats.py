@@ -0,0 +1,88 @@
+"""Замер расчёта /stats (analytics.compute_stats) на длинной истории.
+
+Без аргументов считает статистику по синтетической дневной сводке за --years лет (без БД):
+время построения массивов и расчёта, p50/p95/p99.
+С --manifest (см. python -m benchmarks.seed) меряет полный путь без кэша для пробных пользователей:
+запрос дневной сводки, перцентили длительности в SQL и расчёт.
+
+    python -m benchmarks.stats --years 6 --iterations 1000
+    python -m benchmarks.stats --manifest seed_manifest.json --iterations 50
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import date, timedelta
+
+from analytics import compute_stats, daily_arrays
+from benchmarks.load_test import percentiles
+
+BUDGET_MS = 50.0
+
+def synthetic_rows(years: int, active_share: float, seed: int) -> list[tuple[date, int, int]]:
+    rng = random.Random(seed)
+    today = date.today()
+    start = today - timedelta(days=365 * years)
+    return [
+        (start + timedelta(days=i), rng.randrange(10, 480), rng.randrange(1, 6))
+        for i in range(365 * years + 1)
+        if rng.random() < active_share
+    ]
+
+def bench_synthetic(years: int, iterations: int, active_share: float, seed: int) -> dict:
+    rows = synthetic_rows(years, active_share, seed)
+    today = date.today()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        days, minutes = daily_arrays(rows)
+        compute_stats(days, minutes, today)
+        samples.append(time.perf_counter() - start)
+    return {'mode': 'synthetic', 'years': years, 'days_with_data': len(rows), 'latency': percentiles(samples)}
+
+async def bench_db(manifest: str, iterations: int) -> dict:
+    from database import AsyncSessionLocal, engine, get_daily_series, get_session_percentiles
+
+    with open(manifest, encoding='utf-8') as f:
+        probes = json.load(f)['probes']
+    report = {}
+    for size, user_id in sorted(probes.items(), key=lambda item: int(item[0])):
+        samples = []
+        days_with_data = 0
+        for i in range(iterations + 1):
+            async with AsyncSessionLocal() as session:
+                start = time.perf_counter()
+                rows = await get_daily_series(session, user_id)
+                p50, p90 = await get_session_percentiles(session, user_id)
+                days, minutes = daily_arrays(rows)
+                compute_stats(days, minutes, date.today(), p50, p90)
+                elapsed = time.perf_counter() - start
+            days_with_data = len(rows)
+            # первый прогон — прогрев кэша планов и страниц
+            if i:
+                samples.append(elapsed)
+        report[size] = {'days_with_data': days_with_data, 'latency': percentiles(samples)}
+    await engine.dispose()
+    return {'mode': 'db', 'probes': report}
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк расчёта /stats")
+    parser.add_argument('--years', type=int, default=6)
+    parser.add_argument('--active-share', type=float, default=0.8, help="доля дней с записями")
+    parser.add_argument('--iterations', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--manifest', help="манифест benchmarks.seed: замер с запросами к БД")
+    args = parser.parse_args()
+    if args.manifest:
+        report = asyncio.run(bench_db(args.manifest, args.iterations))
+        worst = max(result['latency']['p99_ms'] for result in report['probes'].values())
+    else:
+        report = bench_synthetic(args.years, args.iterations, args.active_share, args.seed)
+        worst = report['latency']['p99_ms']
+    report['budget_ms'] = BUDGET_MS
+    report['within_budget'] = worst < BUDGET_MS
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,2 @@
+from .sender import SendQueue
+from .broadcaster import Broadcaster
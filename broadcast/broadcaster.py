@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import time
+from datetime import date, datetime, timedelta, timezone
+
+from database import AsyncSessionLocal, claim_broadcast_run, get_broadcast_batch
+from lexicon import LEXICON_RU
+from metrics import registry
+from .sender import SendQueue
+
+logger = logging.getLogger(__name__)
+
+broadcast_batch_duration = registry.histogram(
+    'bot_broadcast_batch_duration_seconds', 'Время обработки пачки пользователей рассылки', ('kind',),
+    buckets=(0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0),
+)
+broadcast_users = registry.counter(
+    'bot_broadcast_users_total', 'Пользователи, пройденные рассылкой', ('kind',)
+)
+
+def _digest_text(minutes: int) -> str | None:
+    # Сводку за вчера шлём только тем, кто вчера что-то записал
+    if minutes <= 0:
+        return None
+    hours, minutes = divmod(minutes, 60)
+    return LEXICON_RU['digest_text'].format(hours=hours, minutes=minutes)
+
+def _reminder_text(minutes: int) -> str | None:
+    if minutes <= 0:
+        return LEXICON_RU['reminder_text_empty']
+    hours, minutes = divmod(minutes, 60)
+    return LEXICON_RU['reminder_text'].format(hours=hours, minutes=minutes)
+
+class Broadcaster:
+    """
+    Ежедневные рассылки: сводка за вчера (digest) всем пользователям и напоминание (reminder)
+    подписавшимся. Пользователи обходятся пачками по users.id, минуты пачки берутся одним запросом.
+    После каждой пачки контрольная точка в broadcast_runs сдвигается, поэтому после перезапуска
+    рассылка продолжается с места остановки (пачка, прерванная на середине, отправится повторно).
+    """
+
+    def __init__(self, queue: SendQueue, batch_size: int, digest_hour: int, reminder_hour: int):
+        self.queue = queue
+        self.batch_size = batch_size
+        self.schedule = (('digest', digest_hour), ('reminder', reminder_hour))
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        self.queue.start()
+        registry.register_collector(self._collect)
+        self._task = asyncio.create_task(self._run_scheduler())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.queue.close()
+
+    def _collect(self):
+        return [('bot_broadcast_queue_depth', 'gauge', 'Сообщения рассылок в очереди', [({}, len(self.queue))])]
+
+    async def _run_scheduler(self) -> None:
+        done: set[tuple[str, date]] = set()
+        while True:
+            now = datetime.now()
+            today = now.date()
+            done = {key for key in done if key[1] == today}
+            for kind, hour in self.schedule:
+                if now.hour < hour or (kind, today) in done:
+                    continue
+                try:
+                    if await self.run(kind, today):
+                        done.add((kind, today))
+                except Exception:
+                    logger.exception("Broadcast %s for %s failed", kind, today)
+            await asyncio.sleep(60)
+
+    async def run(self, kind: str, run_date: date) -> bool:
+        """Проводит рассылку kind за run_date с контрольной точки. Возвращает True, если она завершена."""
+        day = run_date - timedelta(days=1) if kind == 'digest' else run_date
+        render = _digest_text if kind == 'digest' else _reminder_text
+        started = time.perf_counter()
+        users = 0
+        while True:
+            batch_started = time.perf_counter()
+            async with AsyncSessionLocal() as session:
+                # Строка контрольной точки заблокирована до commit: второй процесс её пропустит
+                checkpoint = await claim_broadcast_run(session, kind, run_date)
+                if checkpoint is None:
+                    return False
+                if checkpoint.finished_at is not None:
+                    await session.commit()
+                    return True
+
+                batch = await get_broadcast_batch(
+                    session, checkpoint.last_user_id, day, self.batch_size, reminders_only=kind == 'reminder',
+                )
+                if not batch:
+                    checkpoint.finished_at = datetime.now(timezone.utc)
+                    await session.commit()
+                    elapsed = time.perf_counter() - started
+                    logger.info(
+                        "Broadcast %s for %s finished: %s users in %.1fs (%.1f users/s), sent %s, failed %s",
+                        kind, run_date, users, elapsed, users / elapsed if elapsed else 0.0,
+                        checkpoint.sent, checkpoint.failed,
+                    )
+                    return True
+
+                before = dict(self.queue.results)
+                for _, telegram_id, minutes in batch:
+                    text = render(minutes)
+                    if text is not None:
+                        self.queue.put(telegram_id, text, kind)
+                await self.queue.join()
+
+                results = self.queue.results
+                checkpoint.last_user_id = batch[-1][0]
+                checkpoint.sent += results['sent'] - before['sent']
+                checkpoint.failed += (
+                    results['failed'] - before['failed'] + results['blocked'] - before['blocked']
+                )
+                await session.commit()
+
+            users += len(batch)
+            broadcast_users.inc(kind, amount=len(batch))
+            broadcast_batch_duration.observe(time.perf_counter() - batch_started, kind)
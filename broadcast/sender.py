@@ -0,0 +1,95 @@
+import asyncio
+import logging
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+
+from messaging import mark_background
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+broadcast_messages = registry.counter(
+    'bot_broadcast_messages_total', 'Сообщения рассылок по результату', ('kind', 'result')
+)
+
+class SendQueue:
+    """
+    Очередь отправки рассылок: workers задач отправляют сообщения не чаще rate в секунду.
+    На TelegramRetryAfter все отправки приостанавливаются на указанное время, а сообщение
+    возвращается в очередь (не больше max_retries раз).
+    """
+
+    def __init__(self, bot: Bot, rate: float, workers: int = 8, max_retries: int = 3):
+        self.bot = bot
+        self.rate = rate
+        self.max_retries = max_retries
+        self._workers_count = workers
+        self._queue: asyncio.Queue[tuple[int, str, str, int]] = asyncio.Queue()
+        self._workers: list[asyncio.Task] = []
+        self._tokens = rate
+        self._tokens_updated = 0.0
+        self._blocked_until = 0.0
+        # Итоги по результатам: sent, failed, blocked, retried
+        self.results: dict[str, int] = {'sent': 0, 'failed': 0, 'blocked': 0, 'retried': 0}
+
+    def __len__(self) -> int:
+        return self._queue.qsize()
+
+    def start(self) -> None:
+        self._tokens_updated = asyncio.get_running_loop().time()
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self._workers_count)]
+
+    async def close(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def put(self, chat_id: int, text: str, kind: str) -> None:
+        self._queue.put_nowait((chat_id, text, kind, 0))
+
+    async def join(self) -> None:
+        """Ждёт, пока будут обработаны все сообщения в очереди (включая повторы)."""
+        await self._queue.join()
+
+    async def _acquire(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            if now < self._blocked_until:
+                await asyncio.sleep(self._blocked_until - now)
+                continue
+            self._tokens = min(self.rate, self._tokens + (now - self._tokens_updated) * self.rate)
+            self._tokens_updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    async def _work(self) -> None:
+        mark_background()
+        while True:
+            chat_id, text, kind, attempt = await self._queue.get()
+            try:
+                await self._acquire()
+                try:
+                    await self.bot.send_message(chat_id, text)
+                    result = 'sent'
+                except TelegramRetryAfter as e:
+                    self._blocked_until = asyncio.get_running_loop().time() + e.retry_after
+                    if attempt < self.max_retries:
+                        self._queue.put_nowait((chat_id, text, kind, attempt + 1))
+                        result = 'retried'
+                    else:
+                        result = 'failed'
+                except TelegramForbiddenError:
+                    # Пользователь заблокировал бота
+                    result = 'blocked'
+                except Exception:
+                    logger.exception("Broadcast send to %s failed", chat_id)
+                    result = 'failed'
+                self.results[result] += 1
+                broadcast_messages.inc(kind, result)
+            finally:
+                self._queue.task_done()
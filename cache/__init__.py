@@ -0,0 +1,18 @@
+from config import conf
+from .history_cache import HistoryCache
+from .known_users import KnownUserCache
+
+history_cache = HistoryCache(max_size=conf.HISTORY_CACHE_SIZE, ttl=conf.HISTORY_CACHE_TTL)
+known_users = KnownUserCache(max_size=conf.KNOWN_USERS_CACHE_SIZE)
+# Тексты /stats: живут до следующей записи пользователя (ключ содержит дату, поэтому TTL большой)
+stats_cache = HistoryCache(max_size=conf.STATS_CACHE_SIZE, ttl=conf.STATS_CACHE_TTL)
+
+def invalidate_user(user_id: int) -> None:
+    """Сбрасывает все кэши, зависящие от записей пользователя (вызывается после записи в БД)."""
+    history_cache.invalidate_user(user_id)
+    stats_cache.invalidate_user(user_id)
+
+def invalidate_all() -> None:
+    """Сбрасывает кэши всех пользователей."""
+    history_cache.clear()
+    stats_cache.clear()
@@ -0,0 +1,83 @@
+import time
+from collections import OrderedDict
+from typing import Hashable
+
+class HistoryCache:
+    """
+    LRU-кэш готовых текстов истории с ограничением размера и временем жизни записей.
+
+    Ключ: (user_id, mode, offset, local_date). Инвалидация пользователя не обходит кэш,
+    а увеличивает его "поколение": записи прошлых поколений считаются промахом
+    и вытесняются по LRU/TTL.
+    """
+    def __init__(self, max_size: int = 10000, ttl: float = 300.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items: OrderedDict[tuple, tuple[float, int, str]] = OrderedDict()
+        self._generations: dict[int, int] = {}
+        self._epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.prefetches = 0
+
+    @staticmethod
+    def make_key(user_id: int, mode: str, offset: int, local_date: Hashable) -> tuple:
+        return (user_id, mode, offset, local_date)
+
+    def generation(self, user_id: int) -> int:
+        """Текущее поколение данных пользователя (фиксируется перед построением текста)."""
+        return self._epoch + self._generations.get(user_id, 0)
+
+    def get(self, key: tuple) -> str | None:
+        item = self._items.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        expires_at, generation, text = item
+        if expires_at < time.monotonic() or generation != self.generation(key[0]):
+            del self._items[key]
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return text
+
+    def put(self, key: tuple, text: str, generation: int) -> None:
+        """Сохраняет текст, если данные пользователя не менялись с момента чтения."""
+        if generation != self.generation(key[0]):
+            return
+        self._items[key] = (time.monotonic() + self.ttl, generation, text)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+            self.evictions += 1
+
+    def __contains__(self, key: tuple) -> bool:
+        item = self._items.get(key)
+        return (
+            item is not None
+            and item[0] >= time.monotonic()
+            and item[1] == self.generation(key[0])
+        )
+
+    def invalidate_user(self, user_id: int) -> None:
+        self._generations[user_id] = self._generations.get(user_id, 0) + 1
+        self.invalidations += 1
+
+    def clear(self) -> None:
+        """Сбрасывает кэш целиком (например, после пересчёта сводки для всех пользователей)."""
+        self._items.clear()
+        self._epoch += 1
+        self.invalidations += 1
+
+    def stats(self) -> dict[str, int]:
+        return {
+            'size': len(self._items),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'prefetches': self.prefetches,
+        }
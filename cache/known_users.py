@@ -0,0 +1,38 @@
+from collections import OrderedDict
+
+class KnownUserCache:
+    """
+    Ограниченный LRU-кэш уже сохранённых пользователей: telegram_id -> User.
+    Позволяет не обращаться к таблице users, пока username не изменился.
+    """
+    def __init__(self, max_size: int = 100_000):
+        self.max_size = max_size
+        self._users: OrderedDict[int, object] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, telegram_id: int, username: str | None):
+        """Возвращает пользователя, если он известен и его username не менялся."""
+        user = self._users.get(telegram_id)
+        if user is None or user.username != username:
+            self.misses += 1
+            return None
+        self._users.move_to_end(telegram_id)
+        self.hits += 1
+        return user
+
+    def peek(self, telegram_id: int):
+        """Возвращает пользователя без проверки username (для полей, не зависящих от него)."""
+        user = self._users.get(telegram_id)
+        if user is not None:
+            self._users.move_to_end(telegram_id)
+        return user
+
+    def put(self, user) -> None:
+        self._users[user.telegram_id] = user
+        self._users.move_to_end(user.telegram_id)
+        while len(self._users) > self.max_size:
+            self._users.popitem(last=False)
+
+    def stats(self) -> dict[str, int]:
+        return {'size': len(self._users), 'hits': self.hits, 'misses': self.misses}
@@ -1,12 +1,29 @@
-from .connection import get_async_session, create_db_and_tables,  engine, AsyncSessionLocal
-from .models import Base, User, FlowRecord, SprintRecord
+from .connection import get_async_session, create_db_and_tables,  engine, AsyncSessionLocal, get_pool_stats
+from .models import Base, User, FlowRecord, SprintRecord, DailyProductivity, FsmState, BroadcastRun, leaderboard, leaderboard_refresh, productivity_records
 from .db import (
     get_or_create_user,
+    get_user_timezone,
+    set_user_timezone,
     add_flow_record,
     add_sprint_record,
+    add_records_batch,
+    import_user_records,
     get_user_productivity_history,
+    stream_user_records,
     get_productivity_sum_by_day,
     get_productivity_sum_for_month,
     get_all_months_with_data,
     get_total_productivity,
+    get_months_with_total,
+    get_daily_series,
+    get_session_percentiles,
+    rebuild_daily_productivity,
+    toggle_reminders,
+    claim_broadcast_run,
+    get_broadcast_batch,
+    get_leaderboard_top,
+    get_leaderboard_rank,
 )
+from .write_behind import RecordWriter, record_writer
+from .leaderboard import LeaderboardRefresher, leaderboard_refresher
+from .routing import ReplicaRouter, replica_engine, replica_read, replica_router
@@ -0,0 +1,27 @@
+"""Заполнение дневной сводки daily_productivity по уже накопленным записям.
+
+Запуск: python -m database.backfill [--user TELEGRAM_ID]
+"""
+import argparse
+import asyncio
+import logging
+
+from database.connection import AsyncSessionLocal, create_db_and_tables, engine
+from database.db import rebuild_daily_productivity
+
+logger = logging.getLogger(__name__)
+
+async def main(user_id: int | None = None):
+    # Таблица сводки могла ещё не существовать в старой БД
+    await create_db_and_tables()
+    async with AsyncSessionLocal() as session:
+        rows = await rebuild_daily_productivity(session, user_id=user_id)
+    await engine.dispose()
+    logger.info("daily_productivity rebuilt: %s rows", rows)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Пересчёт дневной сводки продуктивности")
+    parser.add_argument('--user', type=int, default=None, help="telegram_id пользователя (по умолчанию все)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(args.user))
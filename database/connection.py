@@ -1,13 +1,38 @@
+from uuid import uuid4
+
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from config import conf
+from database.pool import InstrumentedAsyncPool, pool_stats
 
 # Асинхронный движок SQLAlchemy
 DATABASE_URL = (
     f"postgresql+asyncpg://{conf.DB_USER}:{conf.DB_PASS}@"
     f"{conf.DB_HOST}:{conf.DB_PORT}/{conf.DB_NAME}"
+    f"?prepared_statement_cache_size={0 if conf.DB_PGBOUNCER else conf.DB_STATEMENT_CACHE_SIZE}"
 )
 
-engine = create_async_engine(DATABASE_URL, echo=False)
+def _connect_args() -> dict:
+    if not conf.DB_PGBOUNCER:
+        return {}
+    # PgBouncer в режиме transaction: подготовленные выражения не переживают смену соединения,
+    # поэтому отключаем их кэш и делаем имена уникальными
+    return {
+        "statement_cache_size": 0,
+        "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+    }
+
+engine = create_async_engine(
+    DATABASE_URL,
+    echo=False,
+    poolclass=InstrumentedAsyncPool,
+    pool_size=conf.DB_POOL_SIZE,
+    max_overflow=conf.DB_MAX_OVERFLOW,
+    pool_timeout=conf.DB_POOL_TIMEOUT,
+    pool_recycle=conf.DB_POOL_RECYCLE,
+    pool_pre_ping=conf.DB_POOL_PRE_PING,
+    query_cache_size=conf.DB_QUERY_CACHE_SIZE,
+    connect_args=_connect_args(),
+)
 
 #фабрика асинхронных сессий
 AsyncSessionLocal = async_sessionmaker(
@@ -21,8 +46,19 @@ async def get_async_session() -> AsyncSession:
     async with AsyncSessionLocal() as session:
         yield session
 
+def get_pool_stats() -> dict[str, float]:
+    """Метрики пула соединений: занято, в очереди, время и таймауты выдачи."""
+    return pool_stats.snapshot(engine.pool)
+
 async def create_db_and_tables():
     """Создает таблицы в базе данных"""
+    from sqlalchemy import inspect
     from database.models import Base
+    from database.migrate import apply_on_create_migrations, stamp_migrations
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
\ No newline at end of file
+        is_new_db = not await conn.run_sync(lambda sync_conn: inspect(sync_conn).has_table('flow_records'))
+        await conn.run_sync(Base.metadata.create_all)
+        # Свежая БД сразу создана по актуальным моделям, миграции ей не нужны
+        if is_new_db:
+            await apply_on_create_migrations(conn)
+            await stamp_migrations(conn)
@@ -1,41 +1,292 @@
-from sqlalchemy import select, func
+from sqlalchemy import bindparam, select, func, delete, case, text, tuple_, update
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from database.models import User, FlowRecord, SprintRecord
-from datetime import datetime, timedelta
+from cache import invalidate_all, invalidate_user, known_users
+from config import conf
+from metrics import timed_query
+from database.routing import replica_read, replica_router
+from database.models import User, FlowRecord, SprintRecord, DailyProductivity, BroadcastRun, leaderboard, leaderboard_refresh, productivity_records
+from datetime import date, datetime, timezone
+from typing import AsyncIterator
+from zoneinfo import ZoneInfo
 
+async def _upsert_users(session: AsyncSession, users: dict[int, str | None]) -> list[User]:
+    """Создаёт пользователей или обновляет их username одним запросом (без commit)."""
+    now = datetime.now(timezone.utc)
+    stmt = insert(User).values([
+        {'telegram_id': telegram_id, 'username': username, 'created_at': now}
+        for telegram_id, username in users.items()
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[User.telegram_id],
+        set_={'username': stmt.excluded.username},
+    )
+    result = await session.scalars(stmt.returning(User), execution_options={'populate_existing': True})
+    return list(result.all())
+
+async def _lock_user_records(session: AsyncSession, user_id: int) -> None:
+    """Блокирует строку пользователя до конца транзакции (FOR UPDATE).
+
+    Вставка записей проверяет внешний ключ на users (FOR KEY SHARE), поэтому новые записи пользователя
+    ждут конца транзакции, а она — уже начатых записей. Записи остальных пользователей не блокируются.
+    """
+    await session.execute(select(User.telegram_id).where(User.telegram_id == user_id).with_for_update())
+
+@timed_query
 async def get_or_create_user(session: AsyncSession, telegram_id: int, username: str | None = None) -> User:
     """Получает пользователя из БД или создает нового, если его нет."""
-    result = await session.execute(select(User).filter_by(telegram_id=telegram_id))
-    user = result.scalars().first()
-    if not user:
-        user = User(telegram_id=telegram_id, username=username)
-        session.add(user)
-        await session.commit()
-        await session.refresh(user)
-    else:
-        # Обновляем username, если он изменился
-        if user.username != username:
-            user.username = username
-            await session.commit()
-            await session.refresh(user)
+    user = known_users.get(telegram_id, username)
+    if user is not None:
+        return user
+    (user,) = await _upsert_users(session, {telegram_id: username})
+    await session.commit()
+    known_users.put(user)
     return user
 
+@timed_query
+async def get_user_timezone(session: AsyncSession, telegram_id: int) -> str:
+    """Возвращает часовой пояс пользователя (для неизвестного пользователя — пояс по умолчанию)."""
+    user = known_users.peek(telegram_id)
+    if user is None:
+        user = await session.scalar(select(User).where(User.telegram_id == telegram_id))
+        if user is None:
+            return conf.DEFAULT_TIMEZONE
+        known_users.put(user)
+    return user.timezone
+
+@timed_query
+async def set_user_timezone(session: AsyncSession, telegram_id: int, tz: str, username: str | None = None) -> None:
+    """Меняет часовой пояс пользователя и пересчитывает local_date его записей и дневную сводку."""
+    await get_or_create_user(session, telegram_id, username)
+    # Записи, которые появятся во время пересчёта, посчитали бы день по старому поясу
+    await _lock_user_records(session, telegram_id)
+    user = await session.scalar(
+        update(User)
+        .where(User.telegram_id == telegram_id)
+        .values(timezone=tz)
+        .returning(User),
+        execution_options={'populate_existing': True},
+    )
+    for model in (FlowRecord, SprintRecord):
+        await session.execute(
+            update(model)
+            .where(model.user_id == telegram_id)
+            .values(local_date=func.date(func.timezone(tz, model.recorded_at)))
+        )
+    # Пересчёт сводки пользователя идёт по индексу (user_id, local_date) и фиксирует транзакцию
+    await rebuild_daily_productivity(session, user_id=telegram_id)
+    known_users.put(user)
+
+async def _bump_daily_productivity(session: AsyncSession, daily: dict[tuple[int, date], list[int]]) -> None:
+    """Прибавляет минуты и количество записей к дневной сводке (в текущей транзакции).
+
+    daily: {(user_id, day): [flow_minutes, sprint_minutes, flow_count, sprint_count]}
+    """
+    stmt = insert(DailyProductivity).values([
+        {
+            'user_id': user_id,
+            'day': day,
+            'flow_minutes': flow_minutes,
+            'sprint_minutes': sprint_minutes,
+            'flow_count': flow_count,
+            'sprint_count': sprint_count,
+        }
+        for (user_id, day), (flow_minutes, sprint_minutes, flow_count, sprint_count) in daily.items()
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DailyProductivity.user_id, DailyProductivity.day],
+        set_={
+            'flow_minutes': DailyProductivity.flow_minutes + stmt.excluded.flow_minutes,
+            'sprint_minutes': DailyProductivity.sprint_minutes + stmt.excluded.sprint_minutes,
+            'flow_count': DailyProductivity.flow_count + stmt.excluded.flow_count,
+            'sprint_count': DailyProductivity.sprint_count + stmt.excluded.sprint_count,
+        },
+    )
+    await session.execute(stmt)
+
+def _accumulate_daily(daily: dict[tuple[int, date], list[int]], user_id: int, kind: str,
+                      local_date: date, duration_minutes: int) -> None:
+    totals = daily.setdefault((user_id, local_date), [0, 0, 0, 0])
+    if kind == 'flow':
+        totals[0] += duration_minutes
+        totals[2] += 1
+    else:
+        totals[1] += duration_minutes
+        totals[3] += 1
+
+@timed_query
+async def add_records_batch(session: AsyncSession, rows: list[dict]) -> list[FlowRecord | SprintRecord]:
+    """Сохраняет пачку записей потока и спринтов одной транзакцией.
+
+    rows: словари с ключами kind ('flow'/'sprint'), user_id, duration_minutes, username,
+    recorded_at (с часовым поясом). Возвращает записи в порядке rows.
+    """
+    # Записи ссылаются на users.telegram_id: неизвестных пользователей создаём в той же транзакции
+    zones: dict[int, ZoneInfo] = {}
+    unknown_users = {}
+    for row in rows:
+        user = known_users.get(row['user_id'], row['username'])
+        if user is None:
+            unknown_users[row['user_id']] = row['username']
+        else:
+            zones[user.telegram_id] = ZoneInfo(user.timezone)
+    users = await _upsert_users(session, unknown_users) if unknown_users else []
+    zones.update((user.telegram_id, ZoneInfo(user.timezone)) for user in users)
+    # День записи считается в поясе пользователя один раз и хранится в local_date
+    local_dates = [row['recorded_at'].astimezone(zones[row['user_id']]).date() for row in rows]
+
+    records: list = [None] * len(rows)
+    for kind, model in (('flow', FlowRecord), ('sprint', SprintRecord)):
+        positions = [i for i, row in enumerate(rows) if row['kind'] == kind]
+        if not positions:
+            continue
+        params = [
+            {
+                'user_id': rows[i]['user_id'],
+                'duration_minutes': rows[i]['duration_minutes'],
+                'username': rows[i]['username'],
+                'recorded_at': rows[i]['recorded_at'],
+                'local_date': local_dates[i],
+            }
+            for i in positions
+        ]
+        inserted = await session.scalars(insert(model).returning(model, sort_by_parameter_order=True), params)
+        for i, record in zip(positions, inserted.all()):
+            records[i] = record
+
+    daily: dict[tuple[int, date], list[int]] = {}
+    for row, local_date in zip(rows, local_dates):
+        _accumulate_daily(daily, row['user_id'], row['kind'], local_date, row['duration_minutes'])
+    await _bump_daily_productivity(session, daily)
+    await session.commit()
+
+    for user in users:
+        known_users.put(user)
+    for user_id in {row['user_id'] for row in rows}:
+        replica_router.mark_written(user_id)
+        invalidate_user(user_id)
+    return records
+
+async def _add_record(session: AsyncSession, kind: str, user_id: int, duration_minutes: int, username: str | None):
+    from database.write_behind import record_writer
+    row = {
+        'kind': kind,
+        'user_id': user_id,
+        'duration_minutes': duration_minutes,
+        'username': username,
+        'recorded_at': datetime.now(timezone.utc),
+    }
+    # При включённой отложенной записи запись попадёт в БД общей пачкой
+    if record_writer.running:
+        return await record_writer.submit(row)
+    (record,) = await add_records_batch(session, [row])
+    return record
+
+@timed_query
 async def add_flow_record(session: AsyncSession, user_id: int, duration_minutes: int, username: str | None = None) -> FlowRecord:
     """Добавляет запись о времени в состоянии потока."""
-    flow_record = FlowRecord(user_id=user_id, duration_minutes=duration_minutes, username=username)
-    session.add(flow_record)
-    await session.commit()
-    await session.refresh(flow_record)
-    return flow_record
+    return await _add_record(session, 'flow', user_id, duration_minutes, username)
 
+@timed_query
 async def add_sprint_record(session: AsyncSession, user_id: int, duration_minutes: int, username: str | None = None) -> SprintRecord:
     """Добавляет запись о спринте."""
-    sprint_record = SprintRecord(user_id=user_id, duration_minutes=duration_minutes, username=username)
-    session.add(sprint_record)
+    return await _add_record(session, 'sprint', user_id, duration_minutes, username)
+
+_COPY_COLUMNS = ('user_id', 'duration_minutes', 'recorded_at', 'local_date', 'username')
+_IMPORT_DAYS_PER_STATEMENT = 5000
+
+@timed_query
+async def import_user_records(
+    session: AsyncSession,
+    user_id: int,
+    username: str | None,
+    chunks: AsyncIterator[list[tuple[str, datetime, int]]],
+) -> int:
+    """Загружает записи пользователя через COPY одной транзакцией.
+
+    chunks: пачки кортежей (kind, recorded_at, duration_minutes), recorded_at с часовым поясом.
+    Сводка и кэши обновляются один раз после загрузки всех пачек. Возвращает число записей.
+    """
+    user = known_users.get(user_id, username)
+    users = [] if user is not None else await _upsert_users(session, {user_id: username})
+    zone = ZoneInfo((user or users[0]).timezone)
+
+    # COPY идёт через соединение asyncpg в той же транзакции, что и остальные запросы сессии
+    connection = await session.connection()
+    raw = (await connection.get_raw_connection()).driver_connection
+
+    daily: dict[tuple[int, date], list[int]] = {}
+    total = 0
+    async for chunk in chunks:
+        by_kind: dict[str, list[tuple]] = {'flow': [], 'sprint': []}
+        for kind, recorded_at, duration_minutes in chunk:
+            local_date = recorded_at.astimezone(zone).date()
+            by_kind[kind].append((user_id, duration_minutes, recorded_at, local_date, username))
+            _accumulate_daily(daily, user_id, kind, local_date, duration_minutes)
+        for kind, records in by_kind.items():
+            if records:
+                await raw.copy_records_to_table(f'{kind}_records', records=records, columns=_COPY_COLUMNS)
+        total += len(chunk)
+
+    # Дни пишем частями, чтобы не упереться в лимит параметров одного запроса
+    days = list(daily.items())
+    for start in range(0, len(days), _IMPORT_DAYS_PER_STATEMENT):
+        await _bump_daily_productivity(session, dict(days[start:start + _IMPORT_DAYS_PER_STATEMENT]))
     await session.commit()
-    await session.refresh(sprint_record)
-    return sprint_record
 
+    for user in users:
+        known_users.put(user)
+    if total:
+        replica_router.mark_written(user_id)
+        invalidate_user(user_id)
+    return total
+
+@timed_query
+async def rebuild_daily_productivity(session: AsyncSession, user_id: int | None = None) -> int:
+    """Пересчитывает дневную сводку из сырых записей (для всех или одного пользователя).
+
+    Возвращает количество записанных строк сводки.
+    """
+    if user_id is None:
+        # Блокируем сводку от параллельных записей до конца транзакции, чтение при этом не блокируется
+        await session.execute(text("LOCK TABLE daily_productivity IN EXCLUSIVE MODE"))
+    else:
+        await _lock_user_records(session, user_id)
+
+    records = productivity_records
+    is_flow = records.c.kind == 'flow'
+    aggregated = (
+        select(
+            records.c.user_id,
+            records.c.local_date,
+            func.sum(case((is_flow, records.c.duration_minutes), else_=0)),
+            func.sum(case((is_flow, 0), else_=records.c.duration_minutes)),
+            func.count().filter(is_flow),
+            func.count().filter(~is_flow),
+        )
+        .group_by(records.c.user_id, records.c.local_date)
+    )
+    delete_stmt = delete(DailyProductivity)
+    if user_id is not None:
+        aggregated = aggregated.where(records.c.user_id == user_id)
+        delete_stmt = delete_stmt.where(DailyProductivity.user_id == user_id)
+    await session.execute(delete_stmt)
+    result = await session.execute(
+        insert(DailyProductivity).from_select(
+            ['user_id', 'day', 'flow_minutes', 'sprint_minutes', 'flow_count', 'sprint_count'],
+            aggregated,
+        )
+    )
+    await session.commit()
+    replica_router.mark_written(user_id)
+    if user_id is not None:
+        invalidate_user(user_id)
+    else:
+        invalidate_all()
+    return result.rowcount
+
+@timed_query
+@replica_read
 async def get_user_productivity_history(session: AsyncSession, user_id: int, limit: int = 10):
     """Получает последние записи о продуктивности пользователя (поток и спринты)."""
     flow_history = await session.execute(
@@ -52,6 +303,71 @@ async def get_user_productivity_history(session: AsyncSession, user_id: int, lim
     )
     return flow_history.scalars().all(), sprint_history.scalars().all()
 
+@timed_query
+async def stream_user_records(
+    session: AsyncSession,
+    user_id: int,
+    chunk_size: int = 1000,
+) -> AsyncIterator[list[tuple[datetime, str, int]]]:
+    """Отдаёт все записи пользователя (поток и спринты) по времени пачками кортежей
+    (recorded_at, kind, duration_minutes) через серверный курсор, без ORM-объектов."""
+    records = productivity_records
+    stmt = (
+        select(records.c.recorded_at, records.c.kind, records.c.duration_minutes)
+        .where(records.c.user_id == user_id)
+        .order_by(records.c.recorded_at, records.c.kind, records.c.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    result = await session.stream(stmt)
+    async for partition in result.partitions(chunk_size):
+        yield [tuple(row) for row in partition]
+
+# Горячие запросы истории собраны один раз: при выполнении меняются только параметры,
+# а скомпилированный SQL берётся из кэша движка
+_DAY_TOTAL = DailyProductivity.flow_minutes + DailyProductivity.sprint_minutes
+_YEAR = func.extract('year', DailyProductivity.day)
+_MONTH = func.extract('month', DailyProductivity.day)
+
+_SUM_BY_DAY_STMT = (
+    select(DailyProductivity.day, _DAY_TOTAL)
+    .where(
+        DailyProductivity.user_id == bindparam('user_id'),
+        DailyProductivity.day >= bindparam('start_day'),
+        DailyProductivity.day <= bindparam('end_day'),
+    )
+)
+
+_SUM_FOR_PERIOD_STMT = (
+    select(func.coalesce(func.sum(_DAY_TOTAL), 0))
+    .where(
+        DailyProductivity.user_id == bindparam('user_id'),
+        DailyProductivity.day >= bindparam('start_day'),
+        DailyProductivity.day < bindparam('end_day'),
+    )
+)
+
+_MONTHS_STMT = (
+    select(_YEAR.label('year'), _MONTH.label('month'), func.coalesce(func.sum(_DAY_TOTAL), 0).label('minutes'))
+    .where(DailyProductivity.user_id == bindparam('user_id'))
+    .group_by(_YEAR, _MONTH)
+    .order_by(_YEAR.desc(), _MONTH.desc())
+)
+
+_TOTAL_STMT = (
+    select(func.coalesce(func.sum(_DAY_TOTAL), 0))
+    .where(DailyProductivity.user_id == bindparam('user_id'))
+)
+
+_MONTHS_WITH_TOTAL_STMT = (
+    select(_YEAR.label('year'), _MONTH.label('month'), func.coalesce(func.sum(_DAY_TOTAL), 0).label('minutes'))
+    .where(DailyProductivity.user_id == bindparam('user_id'))
+    # строка с пустым набором группировки — итог за всю историю
+    .group_by(func.grouping_sets(tuple_(_YEAR, _MONTH), text('()')))
+    .order_by(_YEAR.desc().nulls_last(), _MONTH.desc().nulls_last())
+)
+
+@timed_query
+@replica_read
 async def get_productivity_sum_by_day(
     session: AsyncSession,
     user_id: int,
@@ -59,36 +375,14 @@ async def get_productivity_sum_by_day(
     end_dt: datetime,
 ) -> dict:
     """Возвращает словарь {date: total_minutes} по дням для диапазона [start_dt, end_dt]."""
-    # Поток по дням
-    flow_stmt = (
-        select(func.date(FlowRecord.recorded_at), func.coalesce(func.sum(FlowRecord.duration_minutes), 0))
-        .where(
-            FlowRecord.user_id == user_id,
-            FlowRecord.recorded_at >= start_dt,
-            FlowRecord.recorded_at <= end_dt,
-        )
-        .group_by(func.date(FlowRecord.recorded_at))
-    )
-    flow_rows = (await session.execute(flow_stmt)).all()
-    # Спринты по дням
-    sprint_stmt = (
-        select(func.date(SprintRecord.recorded_at), func.coalesce(func.sum(SprintRecord.duration_minutes), 0))
-        .where(
-            SprintRecord.user_id == user_id,
-            SprintRecord.recorded_at >= start_dt,
-            SprintRecord.recorded_at <= end_dt,
-        )
-        .group_by(func.date(SprintRecord.recorded_at))
-    )
-    sprint_rows = (await session.execute(sprint_stmt)).all()
-
-    totals: dict = {}
-    for d, minutes in flow_rows:
-        totals[d] = totals.get(d, 0) + int(minutes or 0)
-    for d, minutes in sprint_rows:
-        totals[d] = totals.get(d, 0) + int(minutes or 0)
-    return totals
+    rows = (await session.execute(
+        _SUM_BY_DAY_STMT,
+        {'user_id': user_id, 'start_day': start_dt.date(), 'end_day': end_dt.date()},
+    )).all()
+    return {d: int(minutes or 0) for d, minutes in rows}
 
+@timed_query
+@replica_read
 async def get_productivity_sum_for_month(
     session: AsyncSession,
     user_id: int,
@@ -97,83 +391,166 @@ async def get_productivity_sum_for_month(
 ) -> int:
     """Возвращает суммарные минуты продуктивности за конкретный месяц."""
     # начало месяца
-    start_dt = datetime(year=year, month=month, day=1)
+    start_day = date(year=year, month=month, day=1)
     # вычисляем начало следующего месяца
     if month == 12:
-        next_month = datetime(year=year + 1, month=1, day=1)
+        next_month = date(year=year + 1, month=1, day=1)
     else:
-        next_month = datetime(year=year, month=month + 1, day=1)
-
-    flow_stmt = (
-        select(func.coalesce(func.sum(FlowRecord.duration_minutes), 0))
-        .where(
-            FlowRecord.user_id == user_id,
-            FlowRecord.recorded_at >= start_dt,
-            FlowRecord.recorded_at < next_month,
-        )
-    )
-    sprint_stmt = (
-        select(func.coalesce(func.sum(SprintRecord.duration_minutes), 0))
-        .where(
-            SprintRecord.user_id == user_id,
-            SprintRecord.recorded_at >= start_dt,
-            SprintRecord.recorded_at < next_month,
-        )
+        next_month = date(year=year, month=month + 1, day=1)
+
+    result = await session.execute(
+        _SUM_FOR_PERIOD_STMT,
+        {'user_id': user_id, 'start_day': start_day, 'end_day': next_month},
     )
-    flow_sum = (await session.execute(flow_stmt)).scalar() or 0
-    sprint_sum = (await session.execute(sprint_stmt)).scalar() or 0
-    return int(flow_sum) + int(sprint_sum)
+    return int(result.scalar() or 0)
 
+@timed_query
+@replica_read
 async def get_all_months_with_data(session: AsyncSession, user_id: int) -> list[tuple[int, int, int]]:
     """Возвращает список кортежей (year, month, total_minutes) для всех месяцев с данными, отсортированных по дате (новые сначала)."""
-    # Получаем уникальные месяцы из flow_records
-    flow_stmt = (
-        select(
-            func.extract('year', FlowRecord.recorded_at).label('year'),
-            func.extract('month', FlowRecord.recorded_at).label('month'),
-            func.coalesce(func.sum(FlowRecord.duration_minutes), 0).label('minutes')
-        )
-        .where(FlowRecord.user_id == user_id)
-        .group_by(func.extract('year', FlowRecord.recorded_at), func.extract('month', FlowRecord.recorded_at))
-    )
-    flow_rows = (await session.execute(flow_stmt)).all()
-    
-    # Получаем уникальные месяцы из sprint_records
-    sprint_stmt = (
-        select(
-            func.extract('year', SprintRecord.recorded_at).label('year'),
-            func.extract('month', SprintRecord.recorded_at).label('month'),
-            func.coalesce(func.sum(SprintRecord.duration_minutes), 0).label('minutes')
-        )
-        .where(SprintRecord.user_id == user_id)
-        .group_by(func.extract('year', SprintRecord.recorded_at), func.extract('month', SprintRecord.recorded_at))
-    )
-    sprint_rows = (await session.execute(sprint_stmt)).all()
-    
-    # Объединяем данные
-    totals: dict[tuple[int, int], int] = {}
-    for year, month, minutes in flow_rows:
-        key = (int(year), int(month))
-        totals[key] = totals.get(key, 0) + int(minutes or 0)
-    for year, month, minutes in sprint_rows:
-        key = (int(year), int(month))
-        totals[key] = totals.get(key, 0) + int(minutes or 0)
-    
-    # Сортируем по дате (новые сначала)
-    result = [(year, month, minutes) for (year, month), minutes in totals.items()]
-    result.sort(key=lambda x: (x[0], x[1]), reverse=True)
-    return result
+    rows = (await session.execute(_MONTHS_STMT, {'user_id': user_id})).all()
+    return [(int(year), int(month), int(minutes or 0)) for year, month, minutes in rows]
 
+@timed_query
+@replica_read
 async def get_total_productivity(session: AsyncSession, user_id: int) -> int:
     """Возвращает суммарные минуты продуктивности за всю историю пользователя."""
-    flow_stmt = (
-        select(func.coalesce(func.sum(FlowRecord.duration_minutes), 0))
-        .where(FlowRecord.user_id == user_id)
+    return int((await session.execute(_TOTAL_STMT, {'user_id': user_id})).scalar() or 0)
+
+@timed_query
+@replica_read
+async def get_months_with_total(session: AsyncSession, user_id: int) -> tuple[list[tuple[int, int, int]], int]:
+    """Возвращает месяцы с данными (как get_all_months_with_data) и общий итог одним запросом."""
+    months: list[tuple[int, int, int]] = []
+    total = 0
+    for year, month, minutes in (await session.execute(_MONTHS_WITH_TOTAL_STMT, {'user_id': user_id})).all():
+        if year is None:
+            total = int(minutes or 0)
+        else:
+            months.append((int(year), int(month), int(minutes or 0)))
+    return months, total
+
+_DAILY_SERIES_STMT = (
+    select(
+        DailyProductivity.day,
+        DailyProductivity.flow_minutes + DailyProductivity.sprint_minutes,
+        DailyProductivity.flow_count + DailyProductivity.sprint_count,
+    )
+    .where(DailyProductivity.user_id == bindparam('user_id'))
+    .order_by(DailyProductivity.day)
+)
+
+_SESSION_PERCENTILES_STMT = (
+    select(
+        func.percentile_cont(0.5).within_group(productivity_records.c.duration_minutes),
+        func.percentile_cont(0.9).within_group(productivity_records.c.duration_minutes),
+    )
+    .where(productivity_records.c.user_id == bindparam('user_id'), productivity_records.c.duration_minutes > 0)
+)
+
+@timed_query
+@replica_read
+async def get_daily_series(session: AsyncSession, user_id: int) -> list[tuple[date, int, int]]:
+    """Возвращает все дни пользователя из дневной сводки: (day, минуты, записей), по возрастанию дня."""
+    return [tuple(row) for row in await session.execute(_DAILY_SERIES_STMT, {'user_id': user_id})]
+
+@timed_query
+@replica_read
+async def get_session_percentiles(session: AsyncSession, user_id: int) -> tuple[float | None, float | None]:
+    """Возвращает медиану и 90-й перцентиль длительности записей пользователя в минутах."""
+    p50, p90 = (await session.execute(_SESSION_PERCENTILES_STMT, {'user_id': user_id})).one()
+    return p50, p90
+
+@timed_query
+async def toggle_reminders(session: AsyncSession, telegram_id: int, username: str | None = None) -> bool:
+    """Включает или выключает ежедневное напоминание пользователя, возвращает новое значение."""
+    await get_or_create_user(session, telegram_id, username)
+    enabled = await session.scalar(
+        update(User)
+        .where(User.telegram_id == telegram_id)
+        .values(reminders_enabled=~User.reminders_enabled)
+        .returning(User.reminders_enabled)
+    )
+    await session.commit()
+    return bool(enabled)
+
+@timed_query
+async def claim_broadcast_run(session: AsyncSession, kind: str, run_date: date) -> BroadcastRun | None:
+    """Создаёт контрольную точку рассылки, если её нет, и блокирует её до конца транзакции (без commit).
+
+    Возвращает None, если рассылку сейчас ведёт другой процесс.
+    """
+    await session.execute(
+        insert(BroadcastRun)
+        .values(kind=kind, run_date=run_date, started_at=datetime.now(timezone.utc))
+        .on_conflict_do_nothing()
+    )
+    return await session.scalar(
+        select(BroadcastRun)
+        .where(BroadcastRun.kind == kind, BroadcastRun.run_date == run_date)
+        .with_for_update(skip_locked=True)
+        .execution_options(populate_existing=True)
+    )
+
+# Пачка пользователей после after_id (keyset по users.id) с их минутами за день одним запросом
+_BROADCAST_BATCH_STMT = (
+    select(
+        User.id,
+        User.telegram_id,
+        func.coalesce(func.sum(DailyProductivity.flow_minutes + DailyProductivity.sprint_minutes), 0),
     )
-    sprint_stmt = (
-        select(func.coalesce(func.sum(SprintRecord.duration_minutes), 0))
-        .where(SprintRecord.user_id == user_id)
+    .outerjoin(
+        DailyProductivity,
+        (DailyProductivity.user_id == User.telegram_id) & (DailyProductivity.day == bindparam('day')),
     )
-    flow_sum = (await session.execute(flow_stmt)).scalar() or 0
-    sprint_sum = (await session.execute(sprint_stmt)).scalar() or 0
-    return int(flow_sum) + int(sprint_sum)
+    .where(User.id > bindparam('after_id'))
+    .group_by(User.id)
+    .order_by(User.id)
+    .limit(bindparam('limit'))
+)
+_REMINDER_BATCH_STMT = _BROADCAST_BATCH_STMT.where(User.reminders_enabled)
+
+@timed_query
+async def get_broadcast_batch(
+    session: AsyncSession,
+    after_id: int,
+    day: date,
+    limit: int,
+    reminders_only: bool = False,
+) -> list[tuple[int, int, int]]:
+    """Возвращает до limit кортежей (users.id, telegram_id, минуты за day) с users.id > after_id."""
+    stmt = _REMINDER_BATCH_STMT if reminders_only else _BROADCAST_BATCH_STMT
+    rows = await session.execute(stmt, {'after_id': after_id, 'day': day, 'limit': limit})
+    return [(int(user_id), int(telegram_id), int(minutes)) for user_id, telegram_id, minutes in rows]
+
+_LEADERBOARD_TOP_STMT = (
+    select(
+        leaderboard.c.rank,
+        leaderboard.c.user_id,
+        User.username,
+        leaderboard.c.minutes,
+        select(leaderboard_refresh.c.refreshed_at).scalar_subquery(),
+    )
+    .join(User, User.telegram_id == leaderboard.c.user_id)
+    .where(leaderboard.c.period == bindparam('period'))
+    .order_by(leaderboard.c.rank, leaderboard.c.user_id)
+    .limit(bindparam('limit'))
+)
+
+_LEADERBOARD_RANK_STMT = (
+    select(leaderboard.c.rank, leaderboard.c.total, leaderboard.c.minutes)
+    .where(leaderboard.c.period == bindparam('period'), leaderboard.c.user_id == bindparam('user_id'))
+)
+
+@timed_query
+@replica_read
+async def get_leaderboard_top(session: AsyncSession, period: str, limit: int = 10) -> list[tuple[int, int, str | None, int, datetime]]:
+    """Возвращает первые места рейтинга за период ('week', 'month', 'all'): (место, user_id, username, минуты, время обновления)."""
+    return [tuple(row) for row in await session.execute(_LEADERBOARD_TOP_STMT, {'period': period, 'limit': limit})]
+
+@timed_query
+@replica_read
+async def get_leaderboard_rank(session: AsyncSession, period: str, user_id: int) -> tuple[int, int, int] | None:
+    """Возвращает (место, участников, минуты) пользователя в рейтинге за период или None."""
+    row = (await session.execute(_LEADERBOARD_RANK_STMT, {'period': period, 'user_id': user_id})).first()
+    return tuple(row) if row is not None else None
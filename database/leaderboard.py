@@ -0,0 +1,85 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects.postgresql import insert
+
+from config import conf
+from database.connection import engine
+from database.models import leaderboard_refresh
+
+logger = logging.getLogger(__name__)
+
+class LeaderboardRefresher:
+    """
+    Фоновое обновление материализованного представления leaderboard раз в interval секунд.
+
+    REFRESH ... CONCURRENTLY не блокирует чтение рейтинга на время пересчёта. Время обновления
+    записывается в leaderboard_refresh в той же транзакции.
+    """
+    def __init__(self, interval: float = 300.0):
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+        self.refreshed_at: datetime | None = None
+        self.last_duration = 0.0
+        self.refreshes = 0
+        self.errors = 0
+        self.duration_total = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def age_seconds(self) -> float | None:
+        """Сколько секунд прошло с последнего обновления рейтинга (None, если время неизвестно)."""
+        if self.refreshed_at is None:
+            return None
+        return (datetime.now(timezone.utc) - self.refreshed_at).total_seconds()
+
+    async def refresh(self) -> None:
+        start = time.perf_counter()
+        async with engine.begin() as conn:
+            await conn.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY leaderboard"))
+            stmt = insert(leaderboard_refresh).values(id=True, refreshed_at=func.now())
+            stmt = stmt.on_conflict_do_update(index_elements=[leaderboard_refresh.c.id], set_={'refreshed_at': func.now()})
+            self.refreshed_at = await conn.scalar(stmt.returning(leaderboard_refresh.c.refreshed_at))
+        self.last_duration = time.perf_counter() - start
+        self.duration_total += self.last_duration
+        self.refreshes += 1
+        logger.info("Leaderboard refreshed in %.2fs", self.last_duration)
+
+    async def _run(self) -> None:
+        # После перезапуска узнаём возраст уже посчитанного рейтинга, чтобы не пересчитывать его сразу
+        try:
+            async with engine.connect() as conn:
+                self.refreshed_at = await conn.scalar(select(leaderboard_refresh.c.refreshed_at))
+        except Exception:
+            logger.exception("Failed to read leaderboard refresh time")
+        while True:
+            age = self.age_seconds()
+            if age is not None and age < self.interval:
+                await asyncio.sleep(self.interval - age)
+            try:
+                await self.refresh()
+            except Exception:
+                self.errors += 1
+                logger.exception("Leaderboard refresh failed")
+                await asyncio.sleep(self.interval)
+
+leaderboard_refresher = LeaderboardRefresher(interval=conf.LEADERBOARD_REFRESH_INTERVAL)
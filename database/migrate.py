@@ -0,0 +1,180 @@
+"""Версионированные изменения схемы из каталога migrations/.
+
+Запуск: python -m database.migrate [--file PATH] [--stamp]
+
+Файлы NNNN_*.sql применяются по порядку, применённые версии хранятся в schema_migrations.
+Файл с пометкой "-- migrate: no-transaction" выполняется по одному оператору вне общей
+транзакции (нужно для CREATE INDEX CONCURRENTLY и пакетных переносов данных).
+Файл с пометкой "-- migrate: on-create" создаёт объекты, которых нет в моделях (например,
+материализованные представления), поэтому выполняется и при создании новой БД.
+В файлах no-transaction операторы между "-- migrate: if <условие SQL>" и "-- migrate: end if"
+выполняются, только если условие истинно (например, чтобы перезапуск пропускал уже сделанное).
+"""
+import argparse
+import asyncio
+import logging
+from pathlib import Path
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from database.connection import engine
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent / 'migrations'
+NO_TRANSACTION_MARK = '-- migrate: no-transaction'
+ON_CREATE_MARK = '-- migrate: on-create'
+IF_MARK = '-- migrate: if '
+END_IF_MARK = '-- migrate: end if'
+
+def list_migrations() -> list[Path]:
+    """Возвращает обязательные миграции в порядке применения."""
+    return sorted(MIGRATIONS_DIR.glob('[0-9]*.sql'))
+
+def _has_mark(sql: str, mark: str) -> bool:
+    return any(line.strip() == mark for line in sql.splitlines())
+
+def split_statements(sql: str) -> list[str]:
+    """Делит SQL-скрипт на операторы с учётом строк, комментариев и $$-блоков."""
+    statements: list[str] = []
+    current: list[str] = []
+    i, n = 0, len(sql)
+    while i < n:
+        ch = sql[i]
+        if sql.startswith('--', i):
+            end = sql.find('\n', i)
+            i = n if end == -1 else end + 1
+            continue
+        if ch == "'":
+            end = i + 1
+            while end < n:
+                if sql[end] == "'" and sql[end + 1:end + 2] != "'":
+                    break
+                end += 2 if sql[end] == "'" else 1
+            current.append(sql[i:end + 1])
+            i = end + 1
+            continue
+        if ch == '$':
+            tag_end = sql.find('$', i + 1)
+            tag = sql[i:tag_end + 1] if tag_end != -1 else ''
+            if tag and (tag == '$$' or tag[1:-1].isidentifier()):
+                end = sql.find(tag, tag_end + 1)
+                end = n if end == -1 else end + len(tag)
+                current.append(sql[i:end])
+                i = end
+                continue
+        if ch == ';':
+            statement = ''.join(current).strip()
+            if statement:
+                statements.append(statement)
+            current = []
+        else:
+            current.append(ch)
+        i += 1
+    statement = ''.join(current).strip()
+    if statement:
+        statements.append(statement)
+    return statements
+
+def split_sections(sql: str) -> list[tuple[str | None, str]]:
+    """Делит скрипт на части (условие или None, текст) по строкам -- migrate: if / end if."""
+    sections: list[tuple[str | None, str]] = []
+    condition: str | None = None
+    current: list[str] = []
+    for line in sql.splitlines(keepends=True):
+        stripped = line.strip()
+        if stripped.startswith(IF_MARK) or stripped == END_IF_MARK:
+            if stripped.startswith(IF_MARK) and condition is not None:
+                raise ValueError("Nested '-- migrate: if' is not supported")
+            if stripped == END_IF_MARK and condition is None:
+                raise ValueError("'-- migrate: end if' without '-- migrate: if'")
+            sections.append((condition, ''.join(current)))
+            condition = stripped[len(IF_MARK):].strip() if stripped.startswith(IF_MARK) else None
+            current = []
+        else:
+            current.append(line)
+    if condition is not None:
+        raise ValueError("'-- migrate: if' without '-- migrate: end if'")
+    sections.append((None, ''.join(current)))
+    return sections
+
+async def _ensure_version_table(conn: AsyncConnection) -> None:
+    await conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        " version varchar(255) PRIMARY KEY,"
+        " applied_at timestamp NOT NULL DEFAULT now())"
+    ))
+
+async def _applied_versions() -> set[str]:
+    async with engine.begin() as conn:
+        await _ensure_version_table(conn)
+        rows = await conn.execute(text("SELECT version FROM schema_migrations"))
+        return {row[0] for row in rows}
+
+async def stamp_migrations(conn: AsyncConnection) -> None:
+    """Отмечает все миграции применёнными (для БД, созданной сразу по актуальным моделям)."""
+    await _ensure_version_table(conn)
+    for path in list_migrations():
+        await conn.execute(
+            text("INSERT INTO schema_migrations (version) VALUES (:version) ON CONFLICT DO NOTHING"),
+            {"version": path.stem},
+        )
+
+async def apply_on_create_migrations(conn: AsyncConnection) -> None:
+    """Выполняет миграции с пометкой on-create в транзакции conn (для новой БД перед stamp_migrations)."""
+    for path in list_migrations():
+        sql = path.read_text(encoding='utf-8')
+        if _has_mark(sql, ON_CREATE_MARK):
+            for statement in split_statements(sql):
+                await conn.exec_driver_sql(statement)
+
+async def apply_migration(path: Path) -> None:
+    """Применяет один файл миграции и записывает его версию."""
+    sql = path.read_text(encoding='utf-8')
+    if _has_mark(sql, NO_TRANSACTION_MARK):
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level='AUTOCOMMIT')
+            raw = await conn.get_raw_connection()
+            for condition, section in split_sections(sql):
+                if condition is not None and not await raw.driver_connection.fetchval(f"SELECT {condition}"):
+                    logger.info("%s: skipped, condition is false: %s", path.name, condition)
+                    continue
+                for statement in split_statements(section):
+                    logger.info("%s: %s", path.name, statement.splitlines()[0])
+                    # простой протокол asyncpg: нужен для CALL с COMMIT внутри процедуры
+                    await raw.driver_connection.execute(statement)
+    else:
+        async with engine.begin() as conn:
+            raw = await conn.get_raw_connection()
+            await raw.driver_connection.execute(sql)
+    async with engine.begin() as conn:
+        # При --file на новой БД таблицы версий может ещё не быть
+        await _ensure_version_table(conn)
+        await conn.execute(
+            text("INSERT INTO schema_migrations (version) VALUES (:version) ON CONFLICT DO NOTHING"),
+            {"version": path.stem},
+        )
+
+async def main(file: str | None = None, stamp: bool = False):
+    if stamp:
+        async with engine.begin() as conn:
+            await stamp_migrations(conn)
+    elif file:
+        await apply_migration(Path(file))
+    else:
+        applied = await _applied_versions()
+        for path in list_migrations():
+            if path.stem in applied:
+                continue
+            logger.info("Applying migration %s", path.name)
+            await apply_migration(path)
+    await engine.dispose()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Применение миграций схемы БД")
+    parser.add_argument('--file', default=None, help="применить один файл (например, из migrations/optional)")
+    parser.add_argument('--stamp', action='store_true', help="отметить все миграции применёнными")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(args.file, args.stamp))
@@ -1,16 +1,29 @@
-from sqlalchemy import BigInteger, Column, DateTime, Integer, String, ForeignKey
+from sqlalchemy import BigInteger, Boolean, Column, Date, DateTime, Identity, Index, Integer, String, ForeignKey, MetaData, Table, literal, select, text, union_all
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from sqlalchemy.ext.declarative import declarative_base
-from datetime import datetime
+from datetime import date, datetime, timezone
+
+from config import conf
 
 Base = declarative_base()
 
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
 class User(Base):
     __tablename__ = 'users'
+    __table_args__ = (
+        # Частичный индекс для обхода подписчиков напоминаний по id
+        Index('ix_users_reminders_enabled', 'id', postgresql_where=text('reminders_enabled')),
+    )
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
     telegram_id: Mapped[int] = mapped_column(BigInteger, unique=True, index=True)
     username: Mapped[str | None] = mapped_column(String(255), nullable=True)
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=_utcnow)
+    # Часовой пояс IANA: по нему считаются дни записей и "сегодня" пользователя
+    timezone: Mapped[str] = mapped_column(String(64), default=conf.DEFAULT_TIMEZONE, server_default=conf.DEFAULT_TIMEZONE)
+    reminders_enabled: Mapped[bool] = mapped_column(Boolean, default=False, server_default='false')
 
     flows: Mapped[list["FlowRecord"]] = relationship("FlowRecord", back_populates="user", cascade="all, delete-orphan")
     sprints: Mapped[list["SprintRecord"]] = relationship("SprintRecord", back_populates="user", cascade="all, delete-orphan")
@@ -20,11 +33,19 @@ class User(Base):
 
 class FlowRecord(Base):
     __tablename__ = 'flow_records'
-    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    __table_args__ = (
+        # Покрывающий индекс для выборок истории пользователя за период
+        Index('ix_flow_records_user_recorded', 'user_id', 'recorded_at', postgresql_include=['duration_minutes']),
+        # По локальной дате строится дневная сводка, индекс избавляет её пересчёт от полного сканирования
+        Index('ix_flow_records_user_local_date', 'user_id', 'local_date', postgresql_include=['duration_minutes']),
+    )
+    id: Mapped[int] = mapped_column(BigInteger, Identity(cache=50), primary_key=True)
     user_id: Mapped[int] = mapped_column(BigInteger, ForeignKey('users.telegram_id'))
     username: Mapped[str | None] = mapped_column(String(255), nullable=True)
     duration_minutes: Mapped[int] = mapped_column(Integer)
-    recorded_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+    recorded_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=_utcnow)
+    # День записи в часовом поясе пользователя на момент записи
+    local_date: Mapped[date] = mapped_column(Date)
 
     user: Mapped["User"] = relationship("User", back_populates="flows")
 
@@ -33,13 +54,107 @@ class FlowRecord(Base):
 
 class SprintRecord(Base):
     __tablename__ = 'sprint_records'
-    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    __table_args__ = (
+        # Покрывающий индекс для выборок истории пользователя за период
+        Index('ix_sprint_records_user_recorded', 'user_id', 'recorded_at', postgresql_include=['duration_minutes']),
+        # По локальной дате строится дневная сводка, индекс избавляет её пересчёт от полного сканирования
+        Index('ix_sprint_records_user_local_date', 'user_id', 'local_date', postgresql_include=['duration_minutes']),
+    )
+    id: Mapped[int] = mapped_column(BigInteger, Identity(cache=50), primary_key=True)
     user_id: Mapped[int] = mapped_column(BigInteger, ForeignKey('users.telegram_id'))
     username: Mapped[str | None] = mapped_column(String(255), nullable=True)
     duration_minutes: Mapped[int] = mapped_column(Integer)
-    recorded_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+    recorded_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=_utcnow)
+    # День записи в часовом поясе пользователя на момент записи
+    local_date: Mapped[date] = mapped_column(Date)
 
     user: Mapped["User"] = relationship("User", back_populates="sprints")
 
     def __repr__(self):
         return f"<SprintRecord(id={self.id}, user_id={self.user_id}, duration={self.duration_minutes})>"
+
+
+class DailyProductivity(Base):
+    """Дневная сводка продуктивности пользователя, обновляется при каждой записи."""
+    __tablename__ = 'daily_productivity'
+    user_id: Mapped[int] = mapped_column(BigInteger, ForeignKey('users.telegram_id'), primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    flow_minutes: Mapped[int] = mapped_column(Integer, default=0, server_default='0')
+    sprint_minutes: Mapped[int] = mapped_column(Integer, default=0, server_default='0')
+    flow_count: Mapped[int] = mapped_column(Integer, default=0, server_default='0')
+    sprint_count: Mapped[int] = mapped_column(Integer, default=0, server_default='0')
+
+    def __repr__(self):
+        return (
+            f"<DailyProductivity(user_id={self.user_id}, day={self.day}, "
+            f"flow={self.flow_minutes}, sprint={self.sprint_minutes})>"
+        )
+
+class FsmState(Base):
+    """Состояние и данные FSM aiogram (см. storage.PostgresStorage)."""
+    __tablename__ = 'fsm_states'
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    state: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    data: Mapped[dict] = mapped_column(JSONB, default=dict)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=_utcnow)
+
+    def __repr__(self):
+        return f"<FsmState(key='{self.key}', state='{self.state}')>"
+
+class BroadcastRun(Base):
+    """Контрольная точка ежедневной рассылки: до какого users.id она дошла."""
+    __tablename__ = 'broadcast_runs'
+    kind: Mapped[str] = mapped_column(String(32), primary_key=True)
+    run_date: Mapped[date] = mapped_column(Date, primary_key=True)
+    last_user_id: Mapped[int] = mapped_column(BigInteger, default=0, server_default='0')
+    sent: Mapped[int] = mapped_column(Integer, default=0, server_default='0')
+    failed: Mapped[int] = mapped_column(Integer, default=0, server_default='0')
+    started_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=_utcnow)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return f"<BroadcastRun(kind='{self.kind}', run_date={self.run_date}, last_user_id={self.last_user_id})>"
+
+# Единый набор записей продуктивности (поток + спринты) для запросов в одну команду.
+# Условия по user_id/recorded_at/local_date PostgreSQL проталкивает внутрь каждой ветки UNION ALL,
+# поэтому индексы таблиц записей продолжают использоваться.
+productivity_records = union_all(
+    select(
+        literal('flow').label('kind'),
+        FlowRecord.id.label('id'),
+        FlowRecord.user_id.label('user_id'),
+        FlowRecord.duration_minutes.label('duration_minutes'),
+        FlowRecord.recorded_at.label('recorded_at'),
+        FlowRecord.local_date.label('local_date'),
+    ),
+    select(
+        literal('sprint').label('kind'),
+        SprintRecord.id.label('id'),
+        SprintRecord.user_id.label('user_id'),
+        SprintRecord.duration_minutes.label('duration_minutes'),
+        SprintRecord.recorded_at.label('recorded_at'),
+        SprintRecord.local_date.label('local_date'),
+    ),
+).subquery('productivity_records')
+
+# Материализованное представление рейтинга и время его обновления (migrations/0006_leaderboard.sql).
+# Отдельные метаданные: create_all не должен создавать представление как таблицу.
+_leaderboard_metadata = MetaData()
+
+leaderboard = Table(
+    'leaderboard',
+    _leaderboard_metadata,
+    Column('period', String),
+    Column('user_id', BigInteger),
+    Column('minutes', BigInteger),
+    Column('rank', BigInteger),
+    Column('total', BigInteger),
+)
+
+# Одна строка (id = true)
+leaderboard_refresh = Table(
+    'leaderboard_refresh',
+    _leaderboard_metadata,
+    Column('id', Boolean, primary_key=True),
+    Column('refreshed_at', DateTime(timezone=True)),
+)
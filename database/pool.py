@@ -0,0 +1,55 @@
+import time
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+class PoolStats:
+    """Счётчики выдачи соединений из пула."""
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.waiting = 0
+        self.checkout_seconds_total = 0.0
+        self.checkout_seconds_max = 0.0
+
+    def snapshot(self, pool) -> dict[str, float]:
+        return {
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'overflow': pool.overflow(),
+            'waiting': self.waiting,
+            'checkouts': self.checkouts,
+            'timeouts': self.timeouts,
+            'checkout_seconds_total': self.checkout_seconds_total,
+            'checkout_seconds_max': self.checkout_seconds_max,
+        }
+
+pool_stats = PoolStats()
+replica_pool_stats = PoolStats()
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    """Пул asyncpg, который замеряет ожидание соединения и считает таймауты."""
+
+    stats = pool_stats
+
+    def _do_get(self):
+        pool_stats = self.stats
+        pool_stats.waiting += 1
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_stats.timeouts += 1
+            raise
+        finally:
+            pool_stats.waiting -= 1
+            elapsed = time.perf_counter() - start
+            pool_stats.checkout_seconds_total += elapsed
+            pool_stats.checkout_seconds_max = max(pool_stats.checkout_seconds_max, elapsed)
+        pool_stats.checkouts += 1
+        return connection
+
+class ReplicaAsyncPool(InstrumentedAsyncPool):
+    """Пул реплики для чтения: счётчики отдельно от основной БД."""
+
+    stats = replica_pool_stats
@@ -0,0 +1,214 @@
+import asyncio
+import functools
+import inspect
+import logging
+import time
+from collections import OrderedDict, deque
+
+from sqlalchemy import make_url, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from config import conf
+from database.connection import _connect_args, engine
+from database.pool import ReplicaAsyncPool, replica_pool_stats
+
+logger = logging.getLogger(__name__)
+
+# Необязательная реплика для чтения: история, статистика и рейтинг
+replica_engine = None
+ReplicaSessionLocal = None
+if conf.DB_REPLICA_URL:
+    replica_engine = create_async_engine(
+        make_url(conf.DB_REPLICA_URL).update_query_dict({
+            'prepared_statement_cache_size': str(0 if conf.DB_PGBOUNCER else conf.DB_STATEMENT_CACHE_SIZE),
+        }),
+        echo=False,
+        poolclass=ReplicaAsyncPool,
+        pool_size=conf.DB_REPLICA_POOL_SIZE,
+        max_overflow=conf.DB_MAX_OVERFLOW,
+        pool_timeout=conf.DB_REPLICA_POOL_TIMEOUT,
+        pool_recycle=conf.DB_POOL_RECYCLE,
+        pool_pre_ping=conf.DB_POOL_PRE_PING,
+        query_cache_size=conf.DB_QUERY_CACHE_SIZE,
+        connect_args=_connect_args(),
+    )
+    ReplicaSessionLocal = async_sessionmaker(bind=replica_engine, class_=AsyncSession, expire_on_commit=False)
+
+# Позиции WAL в байтах: pg_lsn напрямую asyncpg не декодирует
+_PRIMARY_LSN = text("SELECT pg_current_wal_lsn() - '0/0'::pg_lsn")
+# На сервере, который не является репликой, NULL
+_REPLAY_LSN = text("SELECT pg_last_wal_replay_lsn() - '0/0'::pg_lsn")
+
+class ReplicaRouter:
+    """
+    Выбор БД для чтения: реплика или основная.
+
+    Раз в check_interval секунд сравниваются позиция WAL основной БД и позиция, которую воспроизвела реплика.
+    Так известен момент caught_up_at: всё, что зафиксировано на основной БД до него, уже видно на реплике.
+    Пользователь читает с реплики, только если его последняя запись (mark_written) старше caught_up_at
+    (read-your-writes), реплика отвечает и отстаёт не больше чем на max_lag секунд. Иначе — основная БД.
+    """
+
+    def __init__(self, enabled: bool, max_lag: float = 5.0, check_interval: float = 1.0, max_users: int = 100000):
+        self.enabled = enabled
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.max_users = max_users
+        self._task: asyncio.Task | None = None
+        # (время замера, позиция WAL основной БД), которые реплика ещё не воспроизвела
+        self._samples: deque[tuple[float, int]] = deque(maxlen=1000)
+        # user_id -> время последней записи, в порядке записи
+        self._written: OrderedDict[int, float] = OrderedDict()
+        # Время записи, которая касается всех пользователей (и вытесненных из _written)
+        self._all_written_at = 0.0
+        self.caught_up_at: float | None = None
+        self.available = False
+        self.lag_bytes = 0
+        self.reads = {'replica': 0, 'primary': 0}
+        # Причины чтения с основной БД: unavailable, lag, written, error
+        self.fallbacks = {'unavailable': 0, 'lag': 0, 'written': 0, 'error': 0}
+        self.check_errors = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if self.enabled and not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self.available = False
+
+    def lag_seconds(self) -> float | None:
+        """Насколько реплика отстаёт от основной БД по времени (None, если неизвестно)."""
+        if self.caught_up_at is None:
+            return None
+        return time.monotonic() - self.caught_up_at
+
+    def mark_written(self, user_id: int | None = None) -> None:
+        """Отмечает зафиксированную запись пользователя (None — запись, которая касается всех)."""
+        now = time.monotonic()
+        if user_id is None:
+            self._all_written_at = now
+            self._written.clear()
+            return
+        self._written.pop(user_id, None)
+        self._written[user_id] = now
+        if len(self._written) > self.max_users:
+            _, written_at = self._written.popitem(last=False)
+            self._all_written_at = max(self._all_written_at, written_at)
+
+    def choose(self, user_id: int | None) -> str:
+        """Возвращает 'replica' или причину чтения с основной БД."""
+        if not self.available or self.caught_up_at is None:
+            return 'unavailable'
+        if time.monotonic() - self.caught_up_at > self.max_lag:
+            return 'lag'
+        written_at = self._all_written_at
+        if user_id is not None:
+            written_at = max(written_at, self._written.get(user_id, 0.0))
+        if written_at >= self.caught_up_at:
+            return 'written'
+        return 'replica'
+
+    def replica_failed(self) -> None:
+        """Запрос к реплике не удался: до следующей удачной проверки читаем с основной БД."""
+        if self.available:
+            logger.warning("Read replica query failed, reading from primary", exc_info=True)
+        self.available = False
+        self.fallbacks['error'] += 1
+
+    async def check(self) -> None:
+        # Время берём до запроса: всё, что зафиксировано раньше, имеет позицию не больше полученной
+        now = time.monotonic()
+        async with engine.connect() as conn:
+            primary_lsn = int(await conn.scalar(_PRIMARY_LSN))
+        self._samples.append((now, primary_lsn))
+        async with replica_engine.connect() as conn:
+            replay_lsn = await conn.scalar(_REPLAY_LSN)
+        replay_lsn = primary_lsn if replay_lsn is None else int(replay_lsn)
+        while self._samples and self._samples[0][1] <= replay_lsn:
+            self.caught_up_at = self._samples.popleft()[0]
+        self.lag_bytes = max(0, primary_lsn - replay_lsn)
+        # Записи старше caught_up_at уже видны на реплике
+        while (
+            self.caught_up_at is not None
+            and self._written
+            and next(iter(self._written.values())) < self.caught_up_at
+        ):
+            self._written.popitem(last=False)
+        if not self.available:
+            logger.info("Read replica available")
+        self.available = True
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.check()
+            except Exception:
+                self.check_errors += 1
+                if self.available:
+                    logger.exception("Read replica check failed, reading from primary")
+                self.available = False
+            await asyncio.sleep(self.check_interval)
+
+    def pool_stats(self) -> dict[str, float]:
+        """Метрики пула соединений реплики (как get_pool_stats для основной БД)."""
+        return replica_pool_stats.snapshot(replica_engine.pool)
+
+    def stats(self) -> dict[str, float]:
+        return {
+            'available': int(self.available),
+            'lag_bytes': self.lag_bytes,
+            'written_users': len(self._written),
+            'check_errors': self.check_errors,
+        }
+
+replica_router = ReplicaRouter(
+    enabled=replica_engine is not None,
+    max_lag=conf.DB_REPLICA_MAX_LAG,
+    check_interval=conf.DB_REPLICA_CHECK_INTERVAL,
+)
+
+def replica_read(func):
+    """
+    Декоратор функций чтения database/db.py: функция выполняется в своей сессии реплики, если
+    replica_router разрешает чтение для её user_id, иначе — в переданной сессии основной БД.
+    Если реплика не ответила, запрос повторяется на основной БД.
+    """
+    params = list(inspect.signature(func).parameters)
+    # Позиция user_id среди аргументов после session
+    user_index = params.index('user_id') - 1 if 'user_id' in params else None
+
+    @functools.wraps(func)
+    async def wrapper(session, *args, **kwargs):
+        if not replica_router.enabled:
+            return await func(session, *args, **kwargs)
+        user_id = kwargs.get('user_id')
+        if user_id is None and user_index is not None and user_index < len(args):
+            user_id = args[user_index]
+        target = replica_router.choose(user_id)
+        if target == 'replica':
+            try:
+                async with ReplicaSessionLocal() as replica_session:
+                    result = await func(replica_session, *args, **kwargs)
+                replica_router.reads['replica'] += 1
+                return result
+            except (SQLAlchemyError, OSError, asyncio.TimeoutError):
+                replica_router.replica_failed()
+        else:
+            replica_router.fallbacks[target] += 1
+        replica_router.reads['primary'] += 1
+        return await func(session, *args, **kwargs)
+
+    return wrapper
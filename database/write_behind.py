@@ -0,0 +1,94 @@
+import asyncio
+import logging
+
+from config import conf
+from database.connection import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+class RecordWriter:
+    """
+    Отложенная пакетная запись flow/sprint записей.
+
+    Вставки копятся до batch_size штук или linger_ms миллисекунд и сохраняются одной
+    транзакцией (многострочный INSERT ... RETURNING + одно обновление дневной сводки).
+    Вызывающий ждёт future, который завершается, когда его запись зафиксирована.
+    """
+    def __init__(self, batch_size: int = 100, linger_ms: float = 5.0):
+        self.batch_size = batch_size
+        self.linger = linger_ms / 1000
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+        self._closing = False
+        self.batches = 0
+        self.rows = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done() and not self._closing
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._closing = False
+        self._task = asyncio.create_task(self._run())
+
+    async def submit(self, row: dict):
+        """Ставит запись в очередь и ждёт её сохранения; возвращает ORM-объект записи."""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((row, future))
+        return await future
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = loop.time() + self.linger
+            stop = False
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+            if stop:
+                return
+
+    async def _flush(self, batch: list[tuple[dict, asyncio.Future]]) -> None:
+        from database.db import add_records_batch
+        try:
+            async with AsyncSessionLocal() as session:
+                records = await add_records_batch(session, [row for row, _ in batch])
+        except Exception as e:
+            logger.exception("Record batch of %s rows failed", len(batch))
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.batches += 1
+        self.rows += len(batch)
+        for (_, future), record in zip(batch, records):
+            if not future.done():
+                future.set_result(record)
+
+    async def close(self) -> None:
+        """Дописывает всё, что уже в очереди, и останавливает запись."""
+        if not self.running:
+            return
+        # новые записи с этого момента пишутся напрямую, минуя очередь
+        self._closing = True
+        await self._queue.put(None)
+        await self._task
+
+record_writer = RecordWriter(batch_size=conf.RECORD_BATCH_SIZE, linger_ms=conf.RECORD_BATCH_LINGER_MS)
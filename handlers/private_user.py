@@ -1,30 +1,53 @@
+import asyncio
+import csv
+import gzip
+import logging
+import os
 import random
+import tempfile
+import time
 from aiogram import Router, F
-from aiogram.filters import Command, CommandStart, StateFilter
-from aiogram.types import Message, ReplyKeyboardRemove, CallbackQuery
+from aiogram.filters import Command, CommandObject, CommandStart, StateFilter
+from aiogram.types import Message, ReplyKeyboardRemove, CallbackQuery, FSInputFile
 from aiogram.fsm.context import FSMContext
 from sqlalchemy.ext.asyncio import AsyncSession
-from datetime import datetime, timedelta
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
+from analytics import UserStats, compute_stats, daily_arrays
+from cache import history_cache, stats_cache
+from config import conf
+from importer import ImportFileError, ImportResult, import_file
 from lexicon import LEXICON_RU, MOTIVATIONAL_MESSAGES
 from database import (
+    AsyncSessionLocal,
     get_or_create_user,
+    get_user_timezone,
+    set_user_timezone,
     add_flow_record,
     add_sprint_record,
-    get_user_productivity_history,
     get_productivity_sum_by_day,
-    get_productivity_sum_for_month,
-    get_all_months_with_data,
-    get_total_productivity,
+    get_months_with_total,
+    get_daily_series,
+    get_session_percentiles,
+    get_leaderboard_top,
+    get_leaderboard_rank,
+    stream_user_records,
+    toggle_reminders,
 )
+from messaging import message_editor
 from keyboards import create_cancel_keyboard, create_flow_active_kb, create_flow_paused_kb, create_history_inline_kb
 from states import RecordStates
+from timers import flow_ticker
+
+logger = logging.getLogger(__name__)
 
 router = Router()
 
 # Обработчик команды /start
 @router.message(CommandStart())
 async def process_start_command(message: Message, session: AsyncSession, state: FSMContext):
+    await _stop_flow_timer(state)
     await state.clear() # Очищаем состояние, если пользователь перезапускает бота
     user_data = message.from_user
     user = await get_or_create_user(
@@ -32,13 +55,14 @@ async def process_start_command(message: Message, session: AsyncSession, state:
         telegram_id=user_data.id,
         username=user_data.username
     )
+    await session.close()
     if user.created_at == user.created_at: # Простая проверка на нового/вернувшегося пользователя
         await message.answer(LEXICON_RU['/start'])
     else:
         await message.answer(LEXICON_RU['welcome_back'])
 
 # Обработчик команды /help
-@router.message(Command(commands='/start'))
+@router.message(Command(commands='/start'), flags={'throttling': 'light'})
 async def process_help_command(message: Message):
     await message.answer(LEXICON_RU['/start'])
 
@@ -55,6 +79,13 @@ async def process_record_flow_command(message: Message, state: FSMContext):
         flow_chat_id=sent.chat.id,
     )
     await state.set_state(RecordStates.flow_active)
+    flow_ticker.track(sent.chat.id, sent.message_id, 0)
+
+async def _stop_flow_timer(state: FSMContext) -> None:
+    # Живой таймер мог остаться от незавершённого потока
+    data = await state.get_data()
+    if data.get('flow_message_id') is not None:
+        await flow_ticker.untrack(data['flow_chat_id'], data['flow_message_id'])
 
 def _format_hh_mm(total_seconds: int) -> tuple[int, int]:
     minutes = total_seconds // 60
@@ -72,7 +103,8 @@ async def on_flow_pause(callback: CallbackQuery, state: FSMContext):
     if start_ts is not None:
         accumulated += max(0, now_ts - int(start_ts))
     await state.update_data(flow_accumulated_sec=accumulated, flow_is_paused=True, flow_start_ts=None)
-    await callback.message.edit_reply_markup(reply_markup=create_flow_paused_kb())
+    await flow_ticker.untrack(callback.message.chat.id, callback.message.message_id)
+    await message_editor.edit_message_markup(callback.message, create_flow_paused_kb())
     await callback.answer(LEXICON_RU['flow_paused'], show_alert=False)
     await state.set_state(RecordStates.flow_paused)
 
@@ -80,8 +112,9 @@ async def on_flow_pause(callback: CallbackQuery, state: FSMContext):
 @router.callback_query(StateFilter(RecordStates.flow_paused), F.data == 'flow_resume')
 async def on_flow_resume(callback: CallbackQuery, state: FSMContext):
     now_ts = int(datetime.utcnow().timestamp())
-    await state.update_data(flow_start_ts=now_ts, flow_is_paused=False)
-    await callback.message.edit_reply_markup(reply_markup=create_flow_active_kb())
+    data = await state.update_data(flow_start_ts=now_ts, flow_is_paused=False)
+    flow_ticker.track(callback.message.chat.id, callback.message.message_id, int(data.get('flow_accumulated_sec', 0)))
+    await message_editor.edit_message_markup(callback.message, create_flow_active_kb())
     await callback.answer(LEXICON_RU['flow_resumed'], show_alert=False)
     await state.set_state(RecordStates.flow_active)
 
@@ -96,6 +129,7 @@ async def on_flow_finish(callback: CallbackQuery, state: FSMContext, session: As
         accumulated += max(0, now_ts - int(start_ts))
 
     total_seconds = max(0, accumulated)
+    await flow_ticker.untrack(callback.message.chat.id, callback.message.message_id)
     hours, minutes = _format_hh_mm(total_seconds)
     total_minutes = total_seconds // 60
 
@@ -104,7 +138,7 @@ async def on_flow_finish(callback: CallbackQuery, state: FSMContext, session: As
 
     # Скрываем клавиатуру под сообщением таймера
     try:
-        await callback.message.edit_reply_markup(reply_markup=None)
+        await message_editor.edit_message_markup(callback.message, None)
     except Exception:
         pass
 
@@ -126,8 +160,9 @@ async def on_flow_finish(callback: CallbackQuery, state: FSMContext, session: As
 # Отмена
 @router.callback_query(StateFilter('*'), F.data == 'flow_cancel')
 async def on_flow_cancel(callback: CallbackQuery, state: FSMContext):
+    await flow_ticker.untrack(callback.message.chat.id, callback.message.message_id)
     try:
-        await callback.message.edit_reply_markup(reply_markup=None)
+        await message_editor.edit_message_markup(callback.message, None)
     except Exception:
         pass
     await state.clear()
@@ -194,8 +229,12 @@ def _history_kb(mode: str, weeks_offset: int = 0, month_offset: int = 0):
         kb.row(InlineKeyboardButton(text=LEXICON_RU['btn_hist_days'], callback_data=f'hist:days:0:0'))
     return kb.as_markup()
 
-async def _render_history_days(session: AsyncSession, user_id: int, weeks_offset: int = 0) -> str:
-    today = datetime.utcnow().replace(hour=23, minute=59, second=59, microsecond=0)
+async def _local_today(session: AsyncSession, user_id: int) -> date:
+    """Сегодняшняя дата в часовом поясе пользователя."""
+    return datetime.now(ZoneInfo(await get_user_timezone(session, user_id))).date()
+
+async def _render_history_days(session: AsyncSession, user_id: int, local_today: date, weeks_offset: int = 0) -> str:
+    today = datetime.combine(local_today, dt_time(23, 59, 59))
     window_start = today - timedelta(days=13)
     shift_days = weeks_offset * 14
     start_dt = window_start - timedelta(days=shift_days)
@@ -223,8 +262,8 @@ async def _render_history_days(session: AsyncSession, user_id: int, weeks_offset
     return "\n".join(lines)
 
 async def _render_history_month(session: AsyncSession, user_id: int, month_offset: int = 0) -> str:
-    # Получаем все месяцы с данными
-    months_data = await get_all_months_with_data(session, user_id)
+    # Все месяцы с данными и итог за всю историю одним запросом
+    months_data, total_all_minutes = await get_months_with_total(session, user_id)
     
     lines = [LEXICON_RU['history_months_header']]
     
@@ -247,26 +286,70 @@ async def _render_history_month(session: AsyncSession, user_id: int, month_offse
             lines.append(f"- {h} часов {m} минут ({month_name} {year})")
     
     # Итоговая статистика за всю историю
-    total_all_minutes = await get_total_productivity(session, user_id)
     h_tot, m_tot = _format_hours_minutes(total_all_minutes)
     lines.append(f"Итого: {h_tot} часов {m_tot} минут")
     
     return "\n".join(lines)
 
+# Фоновые предзагрузки соседних окон истории: ключ кэша -> задача
+_prefetch_tasks: dict[tuple, asyncio.Task] = {}
+
+async def _get_history_text(session: AsyncSession, user_id: int, mode: str, offset: int = 0) -> str:
+    """Возвращает текст истории из кэша или строит его, заодно предзагружая соседние окна."""
+    today = await _local_today(session, user_id)
+    key = history_cache.make_key(user_id, mode, offset, today)
+    text = history_cache.get(key)
+    if text is None:
+        generation = history_cache.generation(user_id)
+        if mode == 'days':
+            text = await _render_history_days(session, user_id=user_id, local_today=today, weeks_offset=offset)
+        else:
+            text = await _render_history_month(session, user_id=user_id, month_offset=offset)
+        history_cache.put(key, text, generation)
+    if mode == 'days':
+        _schedule_history_prefetch(user_id, offset, today)
+    return text
+
+def _schedule_history_prefetch(user_id: int, weeks_offset: int, today: date) -> None:
+    for offset in (weeks_offset + 1, weeks_offset - 1):
+        if offset < 0:
+            continue
+        key = history_cache.make_key(user_id, 'days', offset, today)
+        if key in history_cache or key in _prefetch_tasks:
+            continue
+        task = asyncio.create_task(_prefetch_history_days(key))
+        _prefetch_tasks[key] = task
+        task.add_done_callback(lambda _, key=key: _prefetch_tasks.pop(key, None))
+
+async def _prefetch_history_days(key: tuple) -> None:
+    user_id, _, weeks_offset, today = key
+    generation = history_cache.generation(user_id)
+    try:
+        async with AsyncSessionLocal() as session:
+            text = await _render_history_days(session, user_id=user_id, local_today=today, weeks_offset=weeks_offset)
+    except Exception:
+        logger.exception("History prefetch failed for user %s", user_id)
+        return
+    history_cache.put(key, text, generation)
+    history_cache.prefetches += 1
+
 # Обработчик команды /history
-@router.message(Command(commands='history'))
+@router.message(Command(commands='history'), flags={'throttling': 'heavy'})
 async def process_history_command(message: Message, session: AsyncSession):
-    text = await _render_history_days(session, user_id=message.from_user.id, weeks_offset=0)
+    text = await _get_history_text(session, user_id=message.from_user.id, mode='days', offset=0)
+    # Возвращаем соединение в пул до обращения к Telegram
+    await session.close()
     await message.answer(text, reply_markup=_history_kb('days', weeks_offset=0))
 
 # Обработчик inline-кнопки "История"
-@router.callback_query(F.data == 'show_history')
+@router.callback_query(F.data == 'show_history', flags={'throttling': 'heavy'})
 async def process_history_inline_button(callback: CallbackQuery, session: AsyncSession):
-    text = await _render_history_days(session, user_id=callback.from_user.id, weeks_offset=0)
+    text = await _get_history_text(session, user_id=callback.from_user.id, mode='days', offset=0)
+    await session.close()
     await callback.message.answer(text, reply_markup=_history_kb('days', weeks_offset=0))
     await callback.answer()
 
-@router.callback_query(F.data.startswith('hist:'))
+@router.callback_query(F.data.startswith('hist:'), flags={'throttling': 'heavy'})
 async def on_history_pagination(callback: CallbackQuery, session: AsyncSession):
     # Формат колбэка: hist:{mode}:{weeks_offset}:{month_offset}
     try:
@@ -278,17 +361,276 @@ async def on_history_pagination(callback: CallbackQuery, session: AsyncSession):
         return
 
     if mode == 'days':
-        text = await _render_history_days(session, user_id=callback.from_user.id, weeks_offset=weeks_offset)
-        await callback.message.edit_text(text)
-        await callback.message.edit_reply_markup(reply_markup=_history_kb('days', weeks_offset=weeks_offset))
+        text = await _get_history_text(session, user_id=callback.from_user.id, mode='days', offset=weeks_offset)
+        markup = _history_kb('days', weeks_offset=weeks_offset)
     else:
-        text = await _render_history_month(session, user_id=callback.from_user.id, month_offset=month_offset)
-        await callback.message.edit_text(text)
-        await callback.message.edit_reply_markup(reply_markup=_history_kb('months', month_offset=month_offset))
+        text = await _get_history_text(session, user_id=callback.from_user.id, mode='months', offset=month_offset)
+        markup = _history_kb('months', month_offset=month_offset)
+    await session.close()
+    # Текст и клавиатура одним вызовом; то же окно повторно не отправляется
+    await message_editor.edit_message(callback.message, text, markup)
     await callback.answer()
 
+_WEEKDAY_NAMES = ("понедельник", "вторник", "среда", "четверг", "пятница", "суббота", "воскресенье")
+
+def _render_stats(stats: UserStats) -> str:
+    def hm(minutes: float) -> dict:
+        hours, minutes = _format_hours_minutes(round(minutes))
+        return {'hours': hours, 'minutes': minutes}
+
+    if stats.avg_7 > stats.avg_7_prev:
+        trend = LEXICON_RU['stats_trend_up']
+    elif stats.avg_7 < stats.avg_7_prev:
+        trend = LEXICON_RU['stats_trend_down']
+    else:
+        trend = LEXICON_RU['stats_trend_same']
+    lines = [
+        LEXICON_RU['stats_header'],
+        LEXICON_RU['stats_streak'].format(current=stats.current_streak, longest=stats.longest_streak),
+        LEXICON_RU['stats_avg_7'].format(trend=trend, **hm(stats.avg_7)),
+        LEXICON_RU['stats_avg_30'].format(**hm(stats.avg_30)),
+        LEXICON_RU['stats_best_week'].format(**hm(stats.best_week_avg)),
+    ]
+    if stats.best_weekday is not None:
+        lines.append(LEXICON_RU['stats_best_weekday'].format(
+            weekday=_WEEKDAY_NAMES[stats.best_weekday], **hm(stats.best_weekday_avg),
+        ))
+    if stats.session_p50 is not None:
+        lines.append(LEXICON_RU['stats_sessions'].format(p50=round(stats.session_p50), p90=round(stats.session_p90)))
+    lines.append(LEXICON_RU['stats_active_days'].format(days=stats.active_days))
+    return "\n".join(lines)
+
+async def _get_stats_text(session: AsyncSession, user_id: int) -> str:
+    """Возвращает текст /stats из кэша или считает его по дневной сводке пользователя."""
+    today = await _local_today(session, user_id)
+    key = stats_cache.make_key(user_id, 'stats', 0, today)
+    text = stats_cache.get(key)
+    if text is None:
+        generation = stats_cache.generation(user_id)
+        rows = await get_daily_series(session, user_id)
+        if not rows:
+            return LEXICON_RU['stats_no_data']
+        p50, p90 = await get_session_percentiles(session, user_id)
+        days, minutes = daily_arrays(rows)
+        text = _render_stats(compute_stats(days, minutes, today, p50, p90))
+        stats_cache.put(key, text, generation)
+    return text
+
+# Обработчик команды /stats
+@router.message(Command(commands='stats'), flags={'throttling': 'heavy'})
+async def process_stats_command(message: Message, session: AsyncSession):
+    text = await _get_stats_text(session, message.from_user.id)
+    await session.close()
+    await message.answer(text)
+
+_LEADERBOARD_PERIODS = ('week', 'month', 'all')
+
+def _leaderboard_kb(period: str):
+    from aiogram.utils.keyboard import InlineKeyboardBuilder
+    from aiogram.types import InlineKeyboardButton
+    kb = InlineKeyboardBuilder()
+    kb.row(*(
+        InlineKeyboardButton(text=LEXICON_RU[f'btn_lb_{p}'], callback_data=f'lb:{p}')
+        for p in _LEADERBOARD_PERIODS if p != period
+    ))
+    return kb.as_markup()
+
+async def _render_leaderboard(session: AsyncSession, user_id: int, period: str) -> str:
+    top = await get_leaderboard_top(session, period, conf.LEADERBOARD_SIZE)
+    # Место пользователя ищется по уникальному индексу (period, user_id)
+    own = await get_leaderboard_rank(session, period, user_id)
+
+    lines = [LEXICON_RU[f'leaderboard_header_{period}']]
+    if not top:
+        lines.append(LEXICON_RU['leaderboard_empty'])
+    for rank, _, username, minutes, _ in top:
+        h, m = _format_hours_minutes(int(minutes))
+        name = f"@{username}" if username else LEXICON_RU['leaderboard_anonymous']
+        lines.append(LEXICON_RU['leaderboard_line'].format(rank=rank, name=name, hours=h, minutes=m))
+    lines.append('')
+    if own is not None:
+        rank, total, minutes = own
+        h, m = _format_hours_minutes(int(minutes))
+        lines.append(LEXICON_RU['leaderboard_you'].format(rank=rank, total=total, hours=h, minutes=m))
+    else:
+        lines.append(LEXICON_RU['leaderboard_you_none'])
+    if top:
+        age = datetime.now(timezone.utc) - top[0][4]
+        lines.append(LEXICON_RU['leaderboard_updated'].format(minutes=int(age.total_seconds() // 60)))
+    return "\n".join(lines)
+
+# Обработчик команды /leaderboard
+@router.message(Command(commands='leaderboard'))
+async def process_leaderboard_command(message: Message, session: AsyncSession):
+    text = await _render_leaderboard(session, message.from_user.id, 'week')
+    await session.close()
+    await message.answer(text, reply_markup=_leaderboard_kb('week'))
+
+@router.callback_query(F.data.startswith('lb:'))
+async def on_leaderboard_period(callback: CallbackQuery, session: AsyncSession):
+    period = callback.data.split(':', 1)[1]
+    if period not in _LEADERBOARD_PERIODS:
+        await callback.answer()
+        return
+    text = await _render_leaderboard(session, callback.from_user.id, period)
+    await session.close()
+    await message_editor.edit_message(callback.message, text, _leaderboard_kb(period))
+    await callback.answer()
+
+# Обработчик команды /timezone: без аргумента показывает текущий пояс, с аргументом меняет его
+@router.message(Command(commands='timezone'), flags={'throttling': 'heavy'})
+async def process_timezone_command(message: Message, command: CommandObject, session: AsyncSession):
+    name = (command.args or '').strip()
+    if not name:
+        current = await get_user_timezone(session, message.from_user.id)
+        await session.close()
+        await message.answer(LEXICON_RU['timezone_current'].format(timezone=current))
+        return
+    try:
+        name = ZoneInfo(name).key
+    except (ZoneInfoNotFoundError, ValueError):
+        await session.close()
+        await message.answer(LEXICON_RU['timezone_invalid'].format(timezone=name))
+        return
+    await set_user_timezone(session, message.from_user.id, name, message.from_user.username)
+    await session.close()
+    await message.answer(LEXICON_RU['timezone_set'].format(
+        timezone=name, time=f"{datetime.now(ZoneInfo(name)):%H:%M}",
+    ))
+
+async def _write_export_file(session: AsyncSession, user_id: int, zone: ZoneInfo) -> tuple[str, int]:
+    """Пишет записи пользователя во временный .csv.gz по мере чтения из курсора.
+    Время выгружается в поясе zone. Возвращает путь к файлу и число строк."""
+    fd, path = tempfile.mkstemp(suffix='.csv.gz')
+    os.close(fd)
+    rows = 0
+    try:
+        with gzip.open(path, 'wt', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(('recorded_at', 'kind', 'duration_minutes'))
+            async for chunk in stream_user_records(session, user_id):
+                # сжатие и запись на диск не должны задерживать остальные апдейты
+                await asyncio.to_thread(writer.writerows, ((r.astimezone(zone).isoformat(sep=' '), k, d) for r, k, d in chunk))
+                rows += len(chunk)
+    except BaseException:
+        # Ошибка БД или отмена: недописанный файл вызывающий уже не удалит
+        os.unlink(path)
+        raise
+    return path, rows
+
+# Обработчик команды /export
+@router.message(Command(commands='export'), flags={'throttling': 'heavy'})
+async def process_export_command(message: Message, session: AsyncSession):
+    zone = ZoneInfo(await get_user_timezone(session, message.from_user.id))
+    path, rows = await _write_export_file(session, message.from_user.id, zone)
+    await session.close()
+    try:
+        if rows == 0:
+            await message.answer(LEXICON_RU['export_no_data'])
+            return
+        filename = f"productivity_{datetime.now(zone):%Y%m%d}.csv.gz"
+        await message.answer_document(
+            FSInputFile(path, filename=filename),
+            caption=LEXICON_RU['export_caption'].format(rows=rows),
+        )
+    finally:
+        os.remove(path)
+
+# Как часто обновлять сообщение с прогрессом импорта, секунды
+_IMPORT_PROGRESS_INTERVAL = 3.0
+
+async def _edit_quietly(message: Message, text: str) -> None:
+    try:
+        await message_editor.edit_message(message, text)
+    except Exception:
+        pass
+
+def _make_import_progress(progress: Message):
+    """Возвращает колбэк прогресса, который правит сообщение не чаще раза в _IMPORT_PROGRESS_INTERVAL."""
+    last_edit = time.monotonic()
+    pending: asyncio.Task | None = None
+
+    async def report(result: ImportResult) -> None:
+        nonlocal last_edit, pending
+        now = time.monotonic()
+        if now - last_edit < _IMPORT_PROGRESS_INTERVAL or (pending is not None and not pending.done()):
+            return
+        last_edit = now
+        # Правим в фоне: соединение с БД во время импорта занято транзакцией
+        text = LEXICON_RU['import_progress'].format(imported=result.imported, rejected=result.rejected)
+        pending = asyncio.create_task(_edit_quietly(progress, text))
+
+    return report
+
+def _format_import_result(result: ImportResult) -> str:
+    lines = [LEXICON_RU['import_done'].format(imported=result.imported, rejected=result.rejected)]
+    if result.errors:
+        lines.append(LEXICON_RU['import_rejected_header'])
+        for line, reason in result.errors:
+            lines.append(LEXICON_RU['import_rejected_line'].format(line=line, reason=LEXICON_RU[f'import_reason_{reason}']))
+        if result.rejected > len(result.errors):
+            lines.append('...')
+    return "\n".join(lines)
+
+# Обработчик команды /import
+@router.message(Command(commands='import'), StateFilter(None))
+async def process_import_command(message: Message, state: FSMContext):
+    await message.answer(LEXICON_RU['/import'], reply_markup=create_cancel_keyboard())
+    await state.set_state(RecordStates.waiting_for_import_file)
+
+# Обработчик файла для импорта
+@router.message(StateFilter(RecordStates.waiting_for_import_file), flags={'throttling': 'heavy'})
+async def process_import_file(message: Message, state: FSMContext, session: AsyncSession):
+    if message.text == LEXICON_RU['cancel_button']:
+        await state.clear()
+        await message.answer(LEXICON_RU['cancel_action'], reply_markup=ReplyKeyboardRemove())
+        return
+
+    document = message.document
+    if document is None:
+        await message.answer(LEXICON_RU['import_send_file'])
+        return
+    if document.file_size and document.file_size > conf.IMPORT_MAX_FILE_SIZE:
+        await message.answer(LEXICON_RU['import_file_too_large'].format(max_mb=conf.IMPORT_MAX_FILE_SIZE // (1024 * 1024)))
+        return
+
+    progress = await message.answer(LEXICON_RU['import_started'])
+    fd, path = tempfile.mkstemp(suffix='.import')
+    os.close(fd)
+    try:
+        await message.bot.download(document, destination=path)
+        result = await import_file(
+            session,
+            user_id=message.from_user.id,
+            username=message.from_user.username,
+            path=path,
+            chunk_size=conf.IMPORT_CHUNK_SIZE,
+            on_progress=_make_import_progress(progress),
+        )
+    except ImportFileError:
+        await session.close()
+        await _edit_quietly(progress, LEXICON_RU['import_bad_file'])
+        return
+    finally:
+        os.remove(path)
+    await session.close()
+
+    await state.clear()
+    try:
+        await progress.delete()
+    except Exception:
+        pass
+    await message.answer(_format_import_result(result), reply_markup=ReplyKeyboardRemove())
+
+# Обработчик команды /reminders
+@router.message(Command(commands='reminders'))
+async def process_reminders_command(message: Message, session: AsyncSession):
+    enabled = await toggle_reminders(session, message.from_user.id, message.from_user.username)
+    await session.close()
+    await message.answer(LEXICON_RU['reminders_on'] if enabled else LEXICON_RU['reminders_off'])
+
 # Обработчик команды /motivate
-@router.message(Command(commands='motivate'))
+@router.message(Command(commands='motivate'), flags={'throttling': 'light'})
 async def process_motivate_command(message: Message):
     motivation_message = random.choice(MOTIVATIONAL_MESSAGES)
     await message.answer(LEXICON_RU['/motivate'].format(message=motivation_message))
@@ -296,10 +638,11 @@ async def process_motivate_command(message: Message):
 # Обработчик отмены для любого состояния
 @router.message(StateFilter('*'), F.text == LEXICON_RU['cancel_button'])
 async def process_cancel_command_state(message: Message, state: FSMContext):
+    await _stop_flow_timer(state)
     await state.clear()
     await message.answer(LEXICON_RU['cancel_action'], reply_markup=ReplyKeyboardRemove())
 
 # Обработчик для неопознанных команд
-@router.message()
+@router.message(flags={'throttling': 'light'})
 async def send_unknown_message(message: Message):
     await message.answer(LEXICON_RU['unknown_command'])
@@ -0,0 +1,2 @@
+from .parser import ImportFileError, ParsedRecord, RejectedLine, parse_file
+from .loader import ImportResult, import_file
@@ -0,0 +1,57 @@
+import asyncio
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Iterator
+from zoneinfo import ZoneInfo
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import get_user_timezone, import_user_records
+from .parser import ParsedRecord, RejectedLine, parse_file
+
+MAX_REPORTED_ERRORS = 10
+
+@dataclass
+class ImportResult:
+    imported: int = 0
+    rejected: int = 0
+    errors: list[RejectedLine] = field(default_factory=list)  # первые MAX_REPORTED_ERRORS отклонённых строк
+
+def _take_chunk(rows: Iterator[ParsedRecord | RejectedLine], size: int, result: ImportResult) -> list[tuple]:
+    chunk = []
+    for row in rows:
+        if isinstance(row, RejectedLine):
+            result.rejected += 1
+            if len(result.errors) < MAX_REPORTED_ERRORS:
+                result.errors.append(row)
+            continue
+        chunk.append((row.kind, row.recorded_at, row.duration_minutes))
+        if len(chunk) >= size:
+            break
+    return chunk
+
+async def import_file(
+    session: AsyncSession,
+    user_id: int,
+    username: str | None,
+    path: str,
+    chunk_size: int,
+    on_progress: Callable[[ImportResult], Awaitable[None]] | None = None,
+) -> ImportResult:
+    """Импортирует записи из файла пачками по chunk_size одной транзакцией.
+
+    При ошибке формата файла (ImportFileError) ничего не сохраняется.
+    Время без часового пояса считается временем в поясе пользователя.
+    """
+    result = ImportResult()
+    rows = parse_file(path, ZoneInfo(await get_user_timezone(session, user_id)))
+
+    async def chunks():
+        # Разбор идёт в отдельном потоке, чтобы не задерживать остальные апдейты
+        while chunk := await asyncio.to_thread(_take_chunk, rows, chunk_size, result):
+            yield chunk
+            result.imported += len(chunk)
+            if on_progress is not None:
+                await on_progress(result)
+
+    await import_user_records(session, user_id, username, chunks())
+    return result
@@ -0,0 +1,170 @@
+import csv
+import gzip
+import json
+from datetime import datetime, timezone, tzinfo
+from typing import Iterator, NamedTuple, TextIO
+
+KINDS = ('flow', 'sprint')
+MAX_DURATION_MINUTES = 24 * 60
+_READ_SIZE = 64 * 1024
+_WHITESPACE = ' \t\r\n'
+
+class ParsedRecord(NamedTuple):
+    line: int
+    kind: str
+    recorded_at: datetime
+    duration_minutes: int
+
+class RejectedLine(NamedTuple):
+    line: int
+    reason: str  # код причины: format, kind, recorded_at, future, duration
+
+class ImportFileError(Exception):
+    """Файл целиком не подходит для импорта (неизвестный формат, нет нужных колонок, битый JSON)."""
+
+def parse_file(path: str, tz: tzinfo = timezone.utc) -> Iterator[ParsedRecord | RejectedLine]:
+    """Построчно разбирает файл импорта: CSV с заголовком, NDJSON или JSON-массив объектов.
+
+    Файл может быть сжат gzip (как выгрузка /export). Он не читается в память целиком;
+    строки с ошибками возвращаются как RejectedLine. Время без часового пояса считается
+    временем в поясе tz.
+    """
+    now = datetime.now(timezone.utc)
+    with _open_text(path) as f:
+        first = _peek_first_char(f)
+        if first == '[':
+            raw_rows = _iter_json_array(f)
+        elif first == '{':
+            raw_rows = _iter_ndjson(f)
+        else:
+            raw_rows = _iter_csv(f)
+        for line, raw in raw_rows:
+            if not isinstance(raw, dict):
+                yield RejectedLine(line, 'format')
+                continue
+            try:
+                yield ParsedRecord(line, *_parse_row(raw, now, tz))
+            except ValueError as e:
+                yield RejectedLine(line, str(e))
+
+def _parse_row(raw: dict, now: datetime, tz: tzinfo) -> tuple[str, datetime, int]:
+    # Без колонки kind считаем запись спринтом
+    kind = str(raw.get('kind') or raw.get('type') or 'sprint').strip().lower()
+    if kind not in KINDS:
+        raise ValueError('kind')
+
+    try:
+        recorded_at = datetime.fromisoformat(str(raw['recorded_at']).strip())
+    except (KeyError, ValueError):
+        raise ValueError('recorded_at')
+    if recorded_at.tzinfo is None:
+        recorded_at = recorded_at.replace(tzinfo=tz)
+    if recorded_at > now:
+        raise ValueError('future')
+
+    value = raw.get('duration_minutes')
+    try:
+        if isinstance(value, bool) or isinstance(value, float):
+            raise ValueError
+        duration = value if isinstance(value, int) else int(str(value).strip())
+    except ValueError:
+        raise ValueError('duration')
+    if not 0 < duration <= MAX_DURATION_MINUTES:
+        raise ValueError('duration')
+    return kind, recorded_at, duration
+
+def _open_text(path: str) -> TextIO:
+    with open(path, 'rb') as f:
+        compressed = f.read(2) == b'\x1f\x8b'
+    if compressed:
+        return gzip.open(path, 'rt', encoding='utf-8-sig', newline='')
+    return open(path, encoding='utf-8-sig', newline='')
+
+def _peek_first_char(f: TextIO) -> str:
+    while True:
+        ch = f.read(1)
+        if not ch:
+            raise ImportFileError('empty')
+        if ch not in _WHITESPACE:
+            f.seek(0)
+            return ch
+
+def _iter_csv(f: TextIO) -> Iterator[tuple[int, dict]]:
+    header = f.readline()
+    # Excel в русской локали сохраняет CSV через точку с запятой
+    delimiter = ';' if header.count(';') > header.count(',') else ','
+    f.seek(0)
+    reader = csv.DictReader(f, delimiter=delimiter)
+    fields = {name.strip().lower() for name in reader.fieldnames or ()}
+    if not {'recorded_at', 'duration_minutes'} <= fields:
+        raise ImportFileError('header')
+    for row in reader:
+        if None in row:
+            # Лишние значения в строке
+            yield reader.line_num, None
+            continue
+        yield reader.line_num, {(k or '').strip().lower(): v for k, v in row.items()}
+
+def _iter_ndjson(f: TextIO) -> Iterator[tuple[int, dict]]:
+    for line, text in enumerate(f, 1):
+        if not text.strip():
+            continue
+        try:
+            yield line, json.loads(text)
+        except json.JSONDecodeError:
+            yield line, None
+
+def _iter_json_array(f: TextIO) -> Iterator[tuple[int, dict]]:
+    """Разбирает JSON-массив по одному элементу, дочитывая файл кусками по _READ_SIZE."""
+    decoder = json.JSONDecoder()
+    # Пробелы перед '[' могут занять весь первый кусок
+    buf = ''
+    while not buf:
+        chunk = f.read(_READ_SIZE)
+        if not chunk:
+            raise ImportFileError('json')
+        buf = chunk.lstrip(_WHITESPACE)
+    pos = 1  # после '['
+    index = 0
+    expect_value = True
+    while True:
+        # Пропускаем пробелы, при необходимости дочитывая файл
+        while True:
+            while pos < len(buf) and buf[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buf):
+                break
+            buf, pos = f.read(_READ_SIZE), 0
+            if not buf:
+                raise ImportFileError('json')
+
+        ch = buf[pos]
+        if ch == ']':
+            return
+        if not expect_value:
+            if ch != ',':
+                raise ImportFileError('json')
+            pos += 1
+            expect_value = True
+            continue
+
+        # Элемент может оказаться разрезан границей куска: дочитываем, пока не разберётся целиком.
+        # Число в самом конце буфера тоже может быть обрезано, поэтому требуем символ после значения.
+        while True:
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+                if end < len(buf):
+                    break
+            except json.JSONDecodeError:
+                end = None
+            chunk = f.read(_READ_SIZE)
+            if not chunk:
+                if end is None:
+                    raise ImportFileError('json')
+                break
+            buf, pos = buf[pos:] + chunk, 0
+
+        index += 1
+        yield index, value
+        pos = end
+        expect_value = False
@@ -9,6 +9,12 @@ async def set_main_menu(bot: Bot):
         BotCommand(command='/record_flow', description='Записать время потока'),
         BotCommand(command='/record_sprint', description='Записать время спринта'),
         BotCommand(command='/history', description='Посмотреть историю'),
+        BotCommand(command='/stats', description='Статистика и серии'),
+        BotCommand(command='/leaderboard', description='Рейтинг'),
+        BotCommand(command='/export', description='Выгрузить записи в CSV'),
+        BotCommand(command='/import', description='Загрузить историю из файла'),
+        BotCommand(command='/reminders', description='Ежедневное напоминание'),
+        BotCommand(command='/timezone', description='Часовой пояс'),
         BotCommand(command='/motivate', description='Мотивация'),
     ]
     await bot.set_my_commands(main_menu_commands)
@@ -4,8 +4,15 @@ LEXICON_RU: dict[str, str] = {
              '/record_flow - Запустить таймер состояния потока\n'
              '/record_sprint - Записать время спринта\n'
              '/history - Посмотреть историю продуктивности\n'
+             '/stats - Серии, средние и лучший день недели\n'
+             '/leaderboard - Рейтинг по времени фокуса\n'
+             '/export - Выгрузить все записи в CSV\n'
+             '/import - Загрузить историю из CSV или JSON\n'
+             '/reminders - Включить или выключить ежедневное напоминание\n'
+             '/timezone - Часовой пояс для подсчёта дней\n'
              '/motivate - Получить мотивационное сообщение',
     '/record_flow': 'Запуск! Вы находитесь в состоянии концентрации 💻',
+    'flow_timer_live': 'Запуск! Вы находитесь в состоянии концентрации 💻\n⏱ {hours} ч {minutes:02d} мин',
     'flow_recorded': 'Записано! Ты был в состоянии потока продуктивности {duration} минут.',
     'invalid_flow_duration': 'Пожалуйста, введи длительность в минутах в виде целого числа.',
     '/record_sprint': 'Сколько минут длился твой спринт? (например, "30")',
@@ -40,6 +47,68 @@ LEXICON_RU: dict[str, str] = {
     'btn_hist_days': 'По дням',
     'btn_hist_months': 'По месяцам',
     'history_button': 'История 📊',
+    # Статистика /stats
+    'stats_header': '📈 Твоя статистика:',
+    'stats_no_data': 'Пока нет записей для статистики. Запусти /record_flow или /record_sprint!',
+    'stats_streak': '🔥 Серия: {current} дн. подряд (рекорд — {longest} дн.)',
+    'stats_avg_7': '- В среднем за 7 дней: {hours} ч {minutes} мин в день ({trend})',
+    'stats_avg_30': '- В среднем за 30 дней: {hours} ч {minutes} мин в день',
+    'stats_best_week': '- Лучшая неделя: {hours} ч {minutes} мин в день',
+    'stats_best_weekday': '- Самый продуктивный день: {weekday} ({hours} ч {minutes} мин в среднем)',
+    'stats_sessions': '- Длительность записи: медиана {p50} мин, 90% записей — до {p90} мин',
+    'stats_active_days': '- Дней с записями: {days}',
+    'stats_trend_up': '▲ к прошлой неделе',
+    'stats_trend_down': '▼ к прошлой неделе',
+    'stats_trend_same': 'как на прошлой неделе',
+    # Рейтинг /leaderboard
+    'leaderboard_header_week': '🏆 Рейтинг за неделю:',
+    'leaderboard_header_month': '🏆 Рейтинг за месяц:',
+    'leaderboard_header_all': '🏆 Рейтинг за всё время:',
+    'leaderboard_line': '{rank}. {name} — {hours} ч {minutes} мин',
+    'leaderboard_anonymous': 'Аноним',
+    'leaderboard_empty': 'За этот период пока никто ничего не записал.',
+    'leaderboard_you': 'Ты на {rank} месте из {total} ({hours} ч {minutes} мин)',
+    'leaderboard_you_none': 'Тебя пока нет в рейтинге за этот период.',
+    'leaderboard_updated': 'Обновлено {minutes} мин назад',
+    'btn_lb_week': 'Неделя',
+    'btn_lb_month': 'Месяц',
+    'btn_lb_all': 'Всё время',
+    # Выгрузка
+    'export_caption': 'Все твои записи продуктивности: {rows} шт. 📁',
+    'export_no_data': 'У тебя пока нет записей для выгрузки.',
+    # Рассылки
+    'reminders_on': 'Ежедневное напоминание включено 🔔',
+    'reminders_off': 'Ежедневное напоминание выключено 🔕',
+    # Часовой пояс
+    'timezone_current': 'Твой часовой пояс: {timezone}.\n'
+                        'Чтобы сменить, пришли /timezone и название пояса, например: /timezone Asia/Yekaterinburg',
+    'timezone_set': 'Часовой пояс изменён на {timezone}, у тебя сейчас {time}. История пересчитана 🌍',
+    'timezone_invalid': 'Не знаю часового пояса «{timezone}». Пример: Europe/Moscow, Asia/Novosibirsk, UTC.',
+    'digest_text': 'Вчера ты был в фокусе {hours} ч {minutes} мин. Так держать! 💪',
+    'reminder_text': 'Сегодня ты уже в фокусе {hours} ч {minutes} мин. Не забудь записать остальное! ⏱',
+    'reminder_text_empty': 'Сегодня ещё нет записей. Самое время запустить /record_flow! ⏱',
+    # Ограничение частоты
+    'throttled': 'Слишком часто, подожди пару секунд ⏳',
+    'overloaded': 'Бот сейчас перегружен, попробуй через минуту 🙏',
+    # Импорт
+    '/import': 'Пришли файл CSV или JSON с историей (до 20 МБ).\n'
+               'CSV: заголовок recorded_at,duration_minutes и необязательная колонка kind (flow или sprint, '
+               'по умолчанию sprint). Подойдёт и файл из /export.\n'
+               'JSON: массив объектов или по объекту на строку с теми же полями.\n'
+               'Время — в формате 2024-01-31 18:30, без указания пояса считается по твоему часовому поясу.',
+    'import_send_file': 'Пришли файл документом или нажми «Отмена».',
+    'import_file_too_large': 'Файл слишком большой, максимум — {max_mb} МБ.',
+    'import_started': 'Загружаю файл... ⏳',
+    'import_progress': 'Обработано записей: {imported}, отклонено строк: {rejected} ⏳',
+    'import_bad_file': 'Не получилось разобрать файл, ничего не загружено. Проверь формат и попробуй ещё раз.',
+    'import_done': 'Готово! Загружено записей: {imported}, отклонено строк: {rejected}.',
+    'import_rejected_header': 'Отклонённые строки:',
+    'import_rejected_line': '- №{line}: {reason}',
+    'import_reason_format': 'неверный формат строки',
+    'import_reason_kind': 'тип должен быть flow или sprint',
+    'import_reason_recorded_at': 'не распознано время',
+    'import_reason_future': 'время в будущем',
+    'import_reason_duration': 'длительность должна быть целым числом минут от 1 до 1440',
 }
 
 MOTIVATIONAL_MESSAGES = [
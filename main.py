@@ -2,40 +2,107 @@ import asyncio
 import logging
 
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.fsm.storage.base import BaseStorage
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import PRODUCTION, TelegramAPIServer
 
+from broadcast import Broadcaster, SendQueue
 from config import conf
-from database import create_db_and_tables
+from database import create_db_and_tables, engine, leaderboard_refresher, record_writer, replica_engine, replica_router
 from handlers import private_user_router
 from keyboards import set_main_menu
-from middlewares import DbSessionMiddleware
+from messaging import QueuedSession
+from metrics import ApiMetricsMiddleware, MetricsMiddleware, instrument_engine, registry, start_metrics_server
+from metrics.collectors import register_default_collectors
+from metrics.instruments import db_replica_statement_duration
+from middlewares import DbSessionMiddleware, ThrottleLimit, ThrottlingMiddleware
+from storage import create_storage
+from timers import flow_ticker
+from web import run_webhook
+from workers import Supervisor
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
 
-async def main():
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(filename)s:%(lineno)d #%(levelname)-8s '
-               '[%(asctime)s] - %(name)s - %(message)s'
-    )
+def create_bot() -> Bot:
+    api = TelegramAPIServer.from_base(conf.API_SERVER_URL) if conf.API_SERVER_URL else PRODUCTION
+    if conf.API_QUEUE_ENABLED:
+        session = QueuedSession(
+            global_rate=conf.API_GLOBAL_RATE,
+            chat_rate=conf.API_CHAT_RATE,
+            chat_burst=conf.API_CHAT_BURST,
+            max_in_flight=conf.API_MAX_IN_FLIGHT,
+            max_retries=conf.API_MAX_RETRIES,
+            max_chats=conf.API_MAX_CHATS,
+            api=api,
+        )
+        registry.register_collector(session.collect)
+    else:
+        session = AiohttpSession(api=api)
+    bot = Bot(token=conf.BOT_TOKEN, session=session, default=DefaultBotProperties(parse_mode='HTML'))
+    bot.session.middleware(ApiMetricsMiddleware())
+    return bot
 
-    logger.info("Starting bot...")
+async def setup_metrics(port: int) -> None:
+    """Включает замеры SQL и коллекторы, поднимает эндпоинт /metrics (если METRICS_ENABLED)."""
+    instrument_engine(engine)
+    if replica_engine is not None:
+        instrument_engine(replica_engine, db_replica_statement_duration)
+    register_default_collectors()
+    if conf.METRICS_ENABLED:
+        await start_metrics_server(conf.METRICS_HOST, port)
 
-    storage = MemoryStorage()
+def create_throttling_middleware() -> ThrottlingMiddleware:
+    """Собирает мидлварь ограничения частоты с профилями из конфигурации."""
+    return ThrottlingMiddleware(
+        limits={
+            'default': ThrottleLimit(conf.THROTTLE_DEFAULT_RATE, conf.THROTTLE_DEFAULT_BURST),
+            'light': ThrottleLimit(conf.THROTTLE_LIGHT_RATE, conf.THROTTLE_LIGHT_BURST, shed=False),
+            'heavy': ThrottleLimit(conf.THROTTLE_HEAVY_RATE, conf.THROTTLE_HEAVY_BURST),
+        },
+        global_limit=ThrottleLimit(conf.THROTTLE_GLOBAL_RATE, conf.THROTTLE_GLOBAL_BURST),
+        shed_queue_depth=conf.THROTTLE_SHED_QUEUE_DEPTH,
+        max_users=conf.THROTTLE_MAX_USERS,
+    )
 
-    # Инициализируем бота и диспетчера
-    bot = Bot(token=conf.BOT_TOKEN, default=DefaultBotProperties(parse_mode='HTML'))
+def create_dispatcher(storage: BaseStorage) -> Dispatcher:
+    """Собирает диспетчер с мидлварями и роутерами (общий для polling и webhook)."""
     dp = Dispatcher(storage=storage)
 
+    # Метрики обработчиков (снаружи остальных мидлварей, чтобы учитывать их время)
+    dp.message.middleware(MetricsMiddleware())
+    dp.callback_query.middleware(MetricsMiddleware())
+
+    # Ограничение частоты до создания сессии: отброшенные апдейты не доходят до БД
+    if conf.THROTTLE_ENABLED:
+        throttling = create_throttling_middleware()
+        dp.message.middleware(throttling)
+        dp.callback_query.middleware(throttling)
+
     # middleware для работы с БД
     dp.message.middleware(DbSessionMiddleware())
     dp.callback_query.middleware(DbSessionMiddleware())
 
     # Роутеры
     dp.include_router(private_user_router)
+    return dp
 
+async def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(filename)s:%(lineno)d #%(levelname)-8s '
+               '[%(asctime)s] - %(name)s - %(message)s'
+    )
+
+    logger.info("Starting bot...")
+
+    storage = create_storage()
+
+    # Инициализируем бота и диспетчера
+    bot = create_bot()
+    dp = create_dispatcher(storage)
+    await setup_metrics(conf.METRICS_PORT)
 
     # Установка команд меню
     await set_main_menu(bot)
@@ -45,10 +112,43 @@ async def main():
     await create_db_and_tables()
     logger.info("Database tables checked/created.")
 
+    if conf.RECORD_WRITE_BEHIND:
+        await record_writer.start()
+    if conf.FLOW_TIMER_ENABLED and conf.BOT_MODE != 'sharded':
+        flow_ticker.start(bot)
+    if conf.LEADERBOARD_REFRESH_INTERVAL > 0:
+        leaderboard_refresher.start()
+    replica_router.start()
+    broadcaster = None
+    if conf.BROADCAST_ENABLED:
+        broadcaster = Broadcaster(
+            SendQueue(bot, rate=conf.BROADCAST_RATE, workers=conf.BROADCAST_WORKERS),
+            batch_size=conf.BROADCAST_BATCH_SIZE,
+            digest_hour=conf.DIGEST_HOUR,
+            reminder_hour=conf.REMINDER_HOUR,
+        )
+        broadcaster.start()
 
-    # Пропускаем накопившиеся апдейты и запускаем polling
-    await bot.delete_webhook(drop_pending_updates=True)
-    await dp.start_polling(bot)
+    try:
+        if conf.BOT_MODE == 'webhook':
+            await run_webhook(dp, bot)
+        elif conf.BOT_MODE == 'sharded':
+            # Апдейты обрабатывают процессы-воркеры, этот процесс только раздаёт их
+            supervisor = Supervisor(bot, dp.resolve_used_update_types(), conf.BOT_WORKERS, conf.WORKER_QUEUE_SIZE)
+            await supervisor.run()
+        else:
+            # Пропускаем накопившиеся апдейты и запускаем polling
+            await bot.delete_webhook(drop_pending_updates=True)
+            await dp.start_polling(bot)
+    finally:
+        # Дописываем записи из очереди и сбрасываем несохранённые состояния FSM
+        if broadcaster is not None:
+            await broadcaster.close()
+        await leaderboard_refresher.close()
+        await replica_router.close()
+        await flow_ticker.close()
+        await record_writer.close()
+        await storage.close()
 
 if __name__ == '__main__':
     try:
@@ -0,0 +1,5 @@
+from config import conf
+from .editor import MessageEditor
+from .session import BACKGROUND, INTERACTIVE, QueuedSession, mark_background, request_priority
+
+message_editor = MessageEditor(max_size=conf.EDIT_CACHE_SIZE, ttl=conf.EDIT_CACHE_TTL)
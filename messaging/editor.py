@@ -0,0 +1,143 @@
+import hashlib
+import time
+from collections import OrderedDict
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import InlineKeyboardMarkup, Message
+
+_UNKNOWN = object()
+
+def _digest(value: str) -> bytes:
+    return hashlib.blake2b(value.encode(), digest_size=16).digest()
+
+def _markup_digest(markup: InlineKeyboardMarkup | None) -> bytes:
+    return _digest(markup.model_dump_json(exclude_none=True) if markup is not None else '')
+
+def _not_modified(e: TelegramBadRequest) -> bool:
+    return 'message is not modified' in e.message
+
+class MessageEditor:
+    """
+    Правки сообщений бота без лишних вызовов Bot API: текст и клавиатура уходят одним
+    edit_message_text, а правка, которая ничего не меняет, не отправляется вовсе.
+
+    Для этого по (chat_id, message_id) ttl секунд хранятся хеши последнего текста и клавиатуры
+    (не больше max_size сообщений, вытеснение по LRU). Ответ "message is not modified" не считается ошибкой.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 600.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        # (chat_id, message_id) -> (срок, хеш текста или None, если текст неизвестен, хеш клавиатуры)
+        self._shown: OrderedDict[tuple[int, int], tuple[float, bytes | None, bytes]] = OrderedDict()
+        self.sent = 0
+        self.skipped = 0
+        self.merged = 0
+        self.not_modified = 0
+
+    def __len__(self) -> int:
+        return len(self._shown)
+
+    def _get(self, key: tuple[int, int]) -> tuple[bytes | None, bytes | None]:
+        entry = self._shown.get(key)
+        if entry is None:
+            return None, None
+        expires, text_digest, markup_digest = entry
+        if expires < time.monotonic():
+            del self._shown[key]
+            return None, None
+        return text_digest, markup_digest
+
+    def _store(self, key: tuple[int, int], text_digest: bytes | None, markup_digest: bytes) -> None:
+        self._shown[key] = (time.monotonic() + self.ttl, text_digest, markup_digest)
+        self._shown.move_to_end(key)
+        while len(self._shown) > self.max_size:
+            self._shown.popitem(last=False)
+
+    def forget(self, chat_id: int, message_id: int) -> None:
+        self._shown.pop((chat_id, message_id), None)
+
+    async def edit_text(
+        self,
+        bot: Bot,
+        chat_id: int,
+        message_id: int,
+        text: str,
+        reply_markup: InlineKeyboardMarkup | None = None,
+    ) -> bool:
+        """Ставит сообщению текст и клавиатуру (None убирает её) одним вызовом.
+
+        Возвращает False, если сообщение уже показывает то же самое и вызов не понадобился.
+        """
+        key = (chat_id, message_id)
+        shown_text, shown_markup = self._get(key)
+        text_digest, markup_digest = _digest(text), _markup_digest(reply_markup)
+        if shown_text == text_digest and shown_markup == markup_digest:
+            self.skipped += 1
+            return False
+        try:
+            await bot.edit_message_text(text=text, chat_id=chat_id, message_id=message_id, reply_markup=reply_markup)
+        except TelegramBadRequest as e:
+            if not _not_modified(e):
+                raise
+            self.not_modified += 1
+        else:
+            self.sent += 1
+            # Отдельный edit_reply_markup, который понадобился бы без объединения
+            if reply_markup is not None and shown_markup != markup_digest:
+                self.merged += 1
+        self._store(key, text_digest, markup_digest)
+        return True
+
+    async def edit_reply_markup(
+        self,
+        bot: Bot,
+        chat_id: int,
+        message_id: int,
+        reply_markup: InlineKeyboardMarkup | None,
+        current: InlineKeyboardMarkup | None = _UNKNOWN,
+    ) -> bool:
+        """Меняет только клавиатуру сообщения (None убирает её).
+
+        current — клавиатура, которую сообщение показывает сейчас (например, из апдейта), если хеша ещё нет.
+        Возвращает False, если клавиатура уже такая и вызов не понадобился.
+        """
+        key = (chat_id, message_id)
+        shown_text, shown_markup = self._get(key)
+        if shown_markup is None and current is not _UNKNOWN:
+            shown_markup = _markup_digest(current)
+        markup_digest = _markup_digest(reply_markup)
+        if shown_markup == markup_digest:
+            self.skipped += 1
+            return False
+        try:
+            await bot.edit_message_reply_markup(chat_id=chat_id, message_id=message_id, reply_markup=reply_markup)
+        except TelegramBadRequest as e:
+            if not _not_modified(e):
+                raise
+            self.not_modified += 1
+        else:
+            self.sent += 1
+        self._store(key, shown_text, markup_digest)
+        return True
+
+    async def edit_message(self, message: Message, text: str, reply_markup: InlineKeyboardMarkup | None = None) -> bool:
+        """edit_text для сообщения из апдейта."""
+        return await self.edit_text(message.bot, message.chat.id, message.message_id, text, reply_markup)
+
+    async def edit_message_markup(self, message: Message, reply_markup: InlineKeyboardMarkup | None) -> bool:
+        """edit_reply_markup для сообщения из апдейта: его текущая клавиатура известна из апдейта."""
+        return await self.edit_reply_markup(
+            message.bot, message.chat.id, message.message_id, reply_markup,
+            current=getattr(message, 'reply_markup', _UNKNOWN),
+        )
+
+    def stats(self) -> dict[str, int]:
+        return {
+            'size': len(self._shown),
+            'sent': self.sent,
+            'skipped': self.skipped,
+            'merged': self.merged,
+            'not_modified': self.not_modified,
+        }
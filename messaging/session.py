@@ -0,0 +1,245 @@
+import asyncio
+import itertools
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiohttp import ClientSession
+
+from metrics import registry
+
+# Приоритеты запросов: меньше — раньше
+INTERACTIVE = 0
+BACKGROUND = 1
+_PRIORITY_NAMES = ('interactive', 'background')
+
+request_priority: ContextVar[int] = ContextVar('request_priority', default=INTERACTIVE)
+
+api_queue_wait = registry.histogram(
+    'bot_api_queue_wait_seconds', 'Ожидание запроса к Bot API в очереди', ('priority',)
+)
+api_queue_retries = registry.counter(
+    'bot_api_queue_retries_total', 'Повторы запросов к Bot API после TelegramRetryAfter', ('method',)
+)
+
+def mark_background() -> None:
+    """Запросы текущей задачи (и задач, созданных из неё) уходят после интерактивных ответов."""
+    request_priority.set(BACKGROUND)
+
+class _Request:
+    __slots__ = ('bot', 'method', 'timeout', 'chat_id', 'priority', 'future', 'enqueued', 'attempt', 'reserved')
+
+    def __init__(self, bot: Bot, method: TelegramMethod, timeout: int | None, chat_id: Any, priority: int, enqueued: float):
+        self.bot = bot
+        self.method = method
+        self.timeout = timeout
+        self.chat_id = chat_id
+        self.priority = priority
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.enqueued = enqueued
+        self.attempt = 0
+        self.reserved = False
+
+class QueuedSession(AiohttpSession):
+    """
+    Сессия Bot API, которая пропускает запросы в чаты (методы с chat_id) через общую очередь с приоритетами.
+
+    В один чат уходит не больше chat_rate запросов в секунду (с запасом chat_burst), во все чаты —
+    не больше global_rate. Интерактивные ответы обработчиков обгоняют фоновые запросы (рассылки, таймеры),
+    которые помечаются через mark_background(). На TelegramRetryAfter очередь приостанавливается
+    на указанное время, а запрос повторяется (не больше max_retries раз).
+    Остальные методы (getUpdates, answerCallbackQuery, ...) идут в обход очереди.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = 30.0,
+        chat_rate: float = 1.0,
+        chat_burst: float = 3.0,
+        max_in_flight: int = 50,
+        max_retries: int = 3,
+        max_chats: int = 100000,
+        **kwargs: Any,
+    ):
+        super().__init__(**kwargs)
+        self.global_rate = global_rate
+        self.max_retries = max_retries
+        self.max_chats = max_chats
+        self._chat_interval = 1 / chat_rate
+        self._chat_tolerance = (max(chat_burst, 1) - 1) * self._chat_interval
+        self._max_in_flight = max_in_flight
+        # (приоритет, порядковый номер, запрос): повтор сохраняет номер и место в очереди
+        self._queue: asyncio.PriorityQueue[tuple[int, int, _Request]] | None = None
+        self._seq = itertools.count()
+        # chat_id -> теоретическое время следующего запроса в чат (GCRA), в порядке последнего обращения
+        self._chats: OrderedDict[Any, float] = OrderedDict()
+        self._dispatcher: asyncio.Task | None = None
+        self._in_flight: asyncio.Semaphore | None = None
+        self._sending: set[asyncio.Task] = set()
+        # Запросы, отложенные до своего слота в чате
+        self._deferred: set[_Request] = set()
+        self._tokens = global_rate
+        self._tokens_updated = 0.0
+        self._blocked_until = 0.0
+        # Запросы, которые ждут отправки (в очереди или до своего слота в чате), по приоритетам
+        self._waiting = [0, 0]
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+
+    async def make_request(self, bot: Bot, method: TelegramMethod[TelegramType], timeout: int | None = None) -> TelegramType:
+        chat_id = getattr(method, 'chat_id', None)
+        if chat_id is None:
+            return await super().make_request(bot, method, timeout)
+        loop = asyncio.get_running_loop()
+        if self._dispatcher is None or self._dispatcher.done():
+            self._start(loop)
+        request = _Request(bot, method, timeout, chat_id, request_priority.get(), loop.time())
+        self._put(request, next(self._seq))
+        return await request.future
+
+    def _start(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._queue = asyncio.PriorityQueue()
+        self._in_flight = asyncio.Semaphore(self._max_in_flight)
+        self._tokens_updated = loop.time()
+        self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def create_session(self) -> ClientSession:
+        # Смена коннектора закрывает только HTTP-сессию: close() этого класса остановил бы и очередь
+        if self._should_reset_connector:
+            await super().close()
+            self._should_reset_connector = False
+        return await super().create_session()
+
+    async def close(self) -> None:
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            for task in self._sending:
+                task.cancel()
+            await asyncio.gather(self._dispatcher, *self._sending, return_exceptions=True)
+            self._dispatcher = None
+            # Отменяем запросы, которые так и не ушли
+            while not self._queue.empty():
+                self._queue.get_nowait()[2].future.cancel()
+            for request in self._deferred:
+                request.future.cancel()
+            self._deferred.clear()
+            self._waiting = [0, 0]
+        await super().close()
+
+    def _put(self, request: _Request, seq: int) -> None:
+        self._waiting[request.priority] += 1
+        self._queue.put_nowait((request.priority, seq, request))
+
+    def _reserve(self, chat_id: Any, now: float) -> float:
+        """Резервирует запросу слот в чате и возвращает момент, с которого его можно отправить."""
+        tat = self._chats.pop(chat_id, now)
+        self._chats[chat_id] = max(tat, now) + self._chat_interval
+        if len(self._chats) > self.max_chats:
+            self._chats.popitem(last=False)
+        return max(now, tat - self._chat_tolerance)
+
+    async def _acquire(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            if now < self._blocked_until:
+                await asyncio.sleep(self._blocked_until - now)
+                continue
+            self._tokens = min(self.global_rate, self._tokens + (now - self._tokens_updated) * self.global_rate)
+            self._tokens_updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.global_rate)
+
+    async def _dispatch(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            _, seq, request = await self._queue.get()
+            self._waiting[request.priority] -= 1
+            if request.future.done():
+                # Вызвавший перестал ждать ответа
+                continue
+            if not request.reserved:
+                request.reserved = True
+                now = loop.time()
+                start = self._reserve(request.chat_id, now)
+                if start > now:
+                    # Чат занят: запрос вернётся в очередь к своему слоту, не задерживая другие чаты
+                    self._waiting[request.priority] += 1
+                    self._deferred.add(request)
+                    loop.call_later(start - now, self._requeue, request, seq)
+                    continue
+            await self._in_flight.acquire()
+            await self._acquire()
+            task = asyncio.create_task(self._send(request, seq))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+
+    def _requeue(self, request: _Request, seq: int) -> None:
+        if request not in self._deferred:
+            # Сессию закрыли, пока запрос ждал
+            return
+        self._deferred.discard(request)
+        self._waiting[request.priority] -= 1
+        if not request.future.done():
+            self._put(request, seq)
+
+    async def _send(self, request: _Request, seq: int) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            if request.future.done():
+                return
+            api_queue_wait.observe(loop.time() - request.enqueued, _PRIORITY_NAMES[request.priority])
+            try:
+                result = await super().make_request(request.bot, request.method, request.timeout)
+            except TelegramRetryAfter as e:
+                self._blocked_until = max(self._blocked_until, loop.time() + e.retry_after)
+                if request.attempt < self.max_retries and not request.future.done():
+                    request.attempt += 1
+                    self.retried += 1
+                    api_queue_retries.inc(type(request.method).__name__)
+                    self._put(request, seq)
+                    return
+                self.failed += 1
+                if not request.future.done():
+                    request.future.set_exception(e)
+            except asyncio.CancelledError:
+                request.future.cancel()
+                raise
+            except Exception as e:
+                self.failed += 1
+                if not request.future.done():
+                    request.future.set_exception(e)
+            else:
+                self.sent += 1
+                if not request.future.done():
+                    request.future.set_result(result)
+        finally:
+            self._in_flight.release()
+
+    def stats(self) -> dict[str, float]:
+        return {
+            'interactive': self._waiting[INTERACTIVE],
+            'background': self._waiting[BACKGROUND],
+            'in_flight': len(self._sending),
+            'sent': self.sent,
+            'retried': self.retried,
+            'failed': self.failed,
+        }
+
+    def collect(self):
+        stats = self.stats()
+        return [
+            ('bot_api_queue_depth', 'gauge', 'Запросы к Bot API, ожидающие отправки',
+             [({'priority': name}, stats[name]) for name in _PRIORITY_NAMES]),
+            ('bot_api_queue_in_flight', 'gauge', 'Запросы к Bot API в процессе отправки', [({}, stats['in_flight'])]),
+            ('bot_api_queue_requests_total', 'counter', 'Запросы к Bot API через очередь по результату',
+             [({'result': result}, stats[result]) for result in ('sent', 'retried', 'failed')]),
+        ]
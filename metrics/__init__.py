@@ -0,0 +1,3 @@
+from .registry import Counter, Histogram, Registry, registry
+from .instruments import ApiMetricsMiddleware, MetricsMiddleware, instrument_engine, timed_query
+from .server import start_metrics_server
@@ -0,0 +1,121 @@
+from cache import history_cache, known_users, stats_cache
+from database import get_pool_stats, leaderboard_refresher, record_writer, replica_router
+from messaging import message_editor
+from middlewares import session_usage, throttle_stats
+from timers import flow_ticker
+from .registry import registry
+
+def _pool():
+    stats = get_pool_stats()
+    return [
+        ('bot_db_pool_size', 'gauge', 'Размер пула соединений', [({}, stats['size'])]),
+        ('bot_db_pool_checked_out', 'gauge', 'Выданные соединения', [({}, stats['checked_out'])]),
+        ('bot_db_pool_overflow', 'gauge', 'Соединения сверх pool_size', [({}, stats['overflow'])]),
+        ('bot_db_pool_waiting', 'gauge', 'Ожидающие соединения', [({}, stats['waiting'])]),
+        ('bot_db_pool_checkouts_total', 'counter', 'Выдачи соединений', [({}, stats['checkouts'])]),
+        ('bot_db_pool_timeouts_total', 'counter', 'Таймауты ожидания соединения', [({}, stats['timeouts'])]),
+        ('bot_db_pool_checkout_seconds_total', 'counter', 'Суммарное ожидание соединения', [({}, stats['checkout_seconds_total'])]),
+        ('bot_db_pool_checkout_seconds_max', 'gauge', 'Максимальное ожидание соединения', [({}, stats['checkout_seconds_max'])]),
+    ]
+
+def _caches():
+    families: dict[str, list] = {}
+    for cache_name, stats in (
+        ('history', history_cache.stats()),
+        ('stats', stats_cache.stats()),
+        ('known_users', known_users.stats()),
+    ):
+        for key, value in stats.items():
+            families.setdefault(key, []).append(({'cache': cache_name}, value))
+    return [
+        (f'bot_cache_{key}' if key == 'size' else f'bot_cache_{key}_total',
+         'gauge' if key == 'size' else 'counter',
+         f'Кэш: {key}',
+         samples)
+        for key, samples in families.items()
+    ]
+
+def _sessions():
+    return [
+        ('bot_handler_calls_total', 'counter', 'Вызовы обработчиков',
+         [({'handler': name}, calls) for name, (calls, _) in session_usage.items()]),
+        ('bot_handler_session_used_total', 'counter', 'Вызовы обработчиков с обращением к БД',
+         [({'handler': name}, used) for name, (_, used) in session_usage.items()]),
+    ]
+
+def _throttling():
+    return [
+        ('bot_throttled_total', 'counter', 'Апдейты, отброшенные ограничением частоты',
+         [({'handler': name, 'reason': reason}, count) for (name, reason), count in throttle_stats.items()]),
+    ]
+
+def _flow_ticker():
+    stats = flow_ticker.stats()
+    return [
+        ('bot_flow_timers_active', 'gauge', 'Активные живые таймеры потока', [({}, stats['active'])]),
+        ('bot_flow_timer_edits_total', 'counter', 'Правки сообщений таймеров', [({}, stats['edits'])]),
+        ('bot_flow_timer_skipped_total', 'counter', 'Тики без изменения текста', [({}, stats['skipped'])]),
+        ('bot_flow_timer_errors_total', 'counter', 'Ошибки правки сообщений таймеров', [({}, stats['errors'])]),
+        ('bot_flow_timer_lag_seconds_max', 'gauge', 'Максимальное опоздание тика', [({}, stats['lag_max_seconds'])]),
+    ]
+
+def _leaderboard():
+    refresher = leaderboard_refresher
+    metrics = [
+        ('bot_leaderboard_refreshes_total', 'counter', 'Обновления рейтинга', [({}, refresher.refreshes)]),
+        ('bot_leaderboard_refresh_errors_total', 'counter', 'Ошибки обновления рейтинга', [({}, refresher.errors)]),
+        ('bot_leaderboard_refresh_seconds_total', 'counter', 'Суммарное время обновления рейтинга', [({}, refresher.duration_total)]),
+        ('bot_leaderboard_refresh_last_seconds', 'gauge', 'Длительность последнего обновления рейтинга', [({}, refresher.last_duration)]),
+    ]
+    age = refresher.age_seconds()
+    if age is not None:
+        metrics.append(('bot_leaderboard_age_seconds', 'gauge', 'Возраст данных рейтинга', [({}, age)]))
+    return metrics
+
+def _message_editor():
+    stats = message_editor.stats()
+    return [
+        ('bot_message_edits_total', 'counter', 'Правки сообщений по результату',
+         [({'result': result}, stats[result]) for result in ('sent', 'skipped', 'not_modified')]),
+        ('bot_message_edit_calls_saved_total', 'counter', 'Вызовы Bot API, сэкономленные пропуском и объединением правок',
+         [({}, stats['skipped'] + stats['merged'])]),
+        ('bot_message_edit_cache_size', 'gauge', 'Сообщения с запомненным содержимым', [({}, stats['size'])]),
+    ]
+
+def _record_writer():
+    return [
+        ('bot_record_writer_batches_total', 'counter', 'Сохранённые пачки записей', [({}, record_writer.batches)]),
+        ('bot_record_writer_rows_total', 'counter', 'Сохранённые записи', [({}, record_writer.rows)]),
+    ]
+
+def _replica():
+    router = replica_router
+    stats = router.stats()
+    pool = router.pool_stats()
+    metrics = [
+        ('bot_db_replica_pool_size', 'gauge', 'Размер пула соединений реплики', [({}, pool['size'])]),
+        ('bot_db_replica_pool_checked_out', 'gauge', 'Выданные соединения реплики', [({}, pool['checked_out'])]),
+        ('bot_db_replica_pool_waiting', 'gauge', 'Ожидающие соединения реплики', [({}, pool['waiting'])]),
+        ('bot_db_replica_pool_checkouts_total', 'counter', 'Выдачи соединений реплики', [({}, pool['checkouts'])]),
+        ('bot_db_replica_pool_timeouts_total', 'counter', 'Таймауты ожидания соединения реплики', [({}, pool['timeouts'])]),
+        ('bot_db_replica_pool_checkout_seconds_total', 'counter', 'Суммарное ожидание соединения реплики', [({}, pool['checkout_seconds_total'])]),
+        ('bot_db_replica_available', 'gauge', 'Реплика отвечает и используется для чтения', [({}, stats['available'])]),
+        ('bot_db_replica_lag_bytes', 'gauge', 'Отставание реплики по WAL, байты', [({}, stats['lag_bytes'])]),
+        ('bot_db_replica_reads_total', 'counter', 'Функции чтения по выбранной БД',
+         [({'target': target}, count) for target, count in router.reads.items()]),
+        ('bot_db_replica_fallbacks_total', 'counter', 'Чтения с основной БД вместо реплики по причине',
+         [({'reason': reason}, count) for reason, count in router.fallbacks.items()]),
+        ('bot_db_replica_check_errors_total', 'counter', 'Неудачные проверки реплики', [({}, stats['check_errors'])]),
+    ]
+    lag = router.lag_seconds()
+    if lag is not None:
+        metrics.append(('bot_db_replica_lag_seconds', 'gauge', 'Отставание реплики по времени', [({}, lag)]))
+    return metrics
+
+def register_default_collectors() -> None:
+    """Подключает метрики пула, кэшей, сессий, ограничения частоты, таймеров, рейтинга, правок сообщений,
+    отложенной записи и реплики (если она настроена) к общему реестру."""
+    for collector in (_pool, _caches, _sessions, _throttling, _flow_ticker, _leaderboard, _message_editor, _record_writer):
+        registry.register_collector(collector)
+    if replica_router.enabled:
+        registry.register_collector(_replica)
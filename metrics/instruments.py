@@ -0,0 +1,143 @@
+import functools
+import inspect
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import TelegramObject
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from .registry import Histogram, registry
+
+handler_duration = registry.histogram(
+    'bot_handler_duration_seconds', 'Время выполнения обработчика', ('handler',)
+)
+handler_errors = registry.counter(
+    'bot_handler_errors_total', 'Исключения в обработчиках', ('handler',)
+)
+db_query_duration = registry.histogram(
+    'bot_db_query_duration_seconds', 'Время выполнения функции database/db.py', ('query',)
+)
+db_query_errors = registry.counter(
+    'bot_db_query_errors_total', 'Ошибки функций database/db.py', ('query',)
+)
+db_statement_duration = registry.histogram(
+    'bot_db_statement_duration_seconds', 'Время выполнения отдельного SQL-оператора', ('statement',)
+)
+db_replica_statement_duration = registry.histogram(
+    'bot_db_replica_statement_duration_seconds', 'Время выполнения SQL-оператора на реплике', ('statement',)
+)
+api_duration = registry.histogram(
+    'bot_telegram_api_duration_seconds', 'Время запроса к Telegram Bot API', ('method',)
+)
+api_errors = registry.counter(
+    'bot_telegram_api_errors_total', 'Ошибки запросов к Telegram Bot API', ('method', 'error')
+)
+
+class MetricsMiddleware(BaseMiddleware):
+    """Мидлварь, который замеряет время и ошибки каждого обработчика."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        handler_object = data.get("handler")
+        name = getattr(getattr(handler_object, "callback", None), "__name__", "unknown")
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            handler_errors.inc(name)
+            raise
+        finally:
+            handler_duration.observe(time.perf_counter() - start, name)
+
+class ApiMetricsMiddleware(BaseRequestMiddleware):
+    """Мидлварь сессии бота: замеряет время вызовов Telegram Bot API по методам."""
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ):
+        name = type(method).__name__
+        start = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            api_errors.inc(name, type(e).__name__)
+            raise
+        finally:
+            api_duration.observe(time.perf_counter() - start, name)
+
+def timed_query(func):
+    """Декоратор для функций database/db.py: время и ошибки по имени функции.
+
+    У асинхронных генераторов замеряется суммарное время внутри генератора, без обработки
+    пачек вызывающим."""
+    name = func.__name__
+
+    if inspect.isasyncgenfunction(func):
+        @functools.wraps(func)
+        async def gen_wrapper(*args, **kwargs):
+            elapsed = 0.0
+            gen = func(*args, **kwargs)
+            try:
+                while True:
+                    start = time.perf_counter()
+                    try:
+                        item = await gen.__anext__()
+                    except StopAsyncIteration:
+                        break
+                    except Exception:
+                        db_query_errors.inc(name)
+                        raise
+                    finally:
+                        elapsed += time.perf_counter() - start
+                    yield item
+            finally:
+                # Вызывающий мог прекратить чтение раньше: закрываем и курсор
+                await gen.aclose()
+                db_query_duration.observe(elapsed, name)
+
+        return gen_wrapper
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        except Exception:
+            db_query_errors.inc(name)
+            raise
+        finally:
+            db_query_duration.observe(time.perf_counter() - start, name)
+
+    return wrapper
+
+def instrument_engine(engine: AsyncEngine, histogram: Histogram = db_statement_duration) -> None:
+    """Замеряет каждый SQL-оператор движка (метка — первое слово оператора)."""
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, 'before_cursor_execute')
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, 'after_cursor_execute')
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info['query_start'].pop()
+        keyword = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'EMPTY'
+        histogram.observe(time.perf_counter() - start, keyword)
+
+    @event.listens_for(sync_engine, 'handle_error')
+    def _error(context):
+        starts = context.connection.info.get('query_start') if context.connection is not None else None
+        if starts:
+            starts.pop()
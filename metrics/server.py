@@ -0,0 +1,20 @@
+import logging
+
+from aiohttp import web
+
+from .registry import registry
+
+logger = logging.getLogger(__name__)
+
+async def _metrics(request: web.Request) -> web.Response:
+    return web.Response(text=registry.render(), content_type='text/plain', charset='utf-8')
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    """Запускает HTTP-эндпоинт /metrics; возвращает runner для остановки."""
+    app = web.Application()
+    app.router.add_get('/metrics', _metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info("Metrics endpoint on http://%s:%s/metrics", host, port)
+    return runner
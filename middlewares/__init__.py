@@ -1 +1,2 @@
-from .database import DbSessionMiddleware
+from .database import DbSessionMiddleware, LazySession, session_usage
+from .throttling import ThrottleLimit, ThrottlingMiddleware, TokenBucket, throttle_stats
@@ -1,9 +1,36 @@
+from collections import defaultdict
 from typing import Callable, Dict, Any, Awaitable
 from aiogram import BaseMiddleware
 from aiogram.types import TelegramObject
-from sqlalchemy.ext.asyncio import AsyncSession
 from database.connection import AsyncSessionLocal
 
+# Статистика по обработчикам: имя -> [вызовов, вызовов с обращением к БД]
+session_usage: defaultdict[str, list[int]] = defaultdict(lambda: [0, 0])
+
+class LazySession:
+    """
+    Прокси AsyncSession: настоящая сессия создаётся при первом обращении,
+    поэтому обработчики без работы с БД не трогают пул соединений.
+    После close() соединение возвращается в пул, а сессией можно пользоваться дальше.
+    """
+    __slots__ = ('_session',)
+
+    def __init__(self):
+        self._session = None
+
+    @property
+    def used(self) -> bool:
+        return self._session is not None
+
+    def __getattr__(self, name: str) -> Any:
+        if self._session is None:
+            self._session = AsyncSessionLocal()
+        return getattr(self._session, name)
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+
 class DbSessionMiddleware(BaseMiddleware):
     """
     Мидлварь, который добавляет асинхронную сессию SQLAlchemy в kwargs обработчика.
@@ -14,6 +41,14 @@ class DbSessionMiddleware(BaseMiddleware):
         event: TelegramObject,
         data: Dict[str, Any],
     ) -> Any:
-        async with AsyncSessionLocal() as session:
-            data["session"] = session
+        session = LazySession()
+        data["session"] = session
+        try:
             return await handler(event, data)
+        finally:
+            await session.close()
+            handler_object = data.get("handler")
+            name = getattr(getattr(handler_object, "callback", None), "__name__", "unknown")
+            stats = session_usage[name]
+            stats[0] += 1
+            stats[1] += session.used
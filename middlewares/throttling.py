@@ -0,0 +1,105 @@
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Awaitable, Callable, Dict, NamedTuple
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import CallbackQuery, Message, TelegramObject
+
+from database.pool import pool_stats
+from lexicon import LEXICON_RU
+
+# Отброшенные апдейты: (обработчик, причина) -> количество; причина: user, global, shed
+throttle_stats: defaultdict[tuple[str, str], int] = defaultdict(int)
+
+class ThrottleLimit(NamedTuple):
+    rate: float    # пополнение, токенов в секунду
+    burst: float   # ёмкость корзины
+    shed: bool = True  # отбрасывать при перегрузке пула соединений
+
+class TokenBucket:
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated', 'notified')
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+        self.notified = False
+
+    def consume(self, now: float) -> bool:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            self.notified = False
+            return True
+        return False
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Мидлварь ограничения частоты: корзина токенов на пользователя для каждого профиля
+    и общая корзина процесса. Профиль задаётся флагом обработчика flags={'throttling': 'heavy'}.
+    Когда соединения из пула ждут больше shed_queue_depth запросов, обработчики с БД отбрасываются.
+    """
+
+    def __init__(
+        self,
+        limits: dict[str, ThrottleLimit],
+        global_limit: ThrottleLimit,
+        shed_queue_depth: int,
+        max_users: int,
+    ):
+        self.limits = limits
+        self.shed_queue_depth = shed_queue_depth
+        self.max_users = max_users
+        self._global = TokenBucket(global_limit.rate, global_limit.burst, time.monotonic())
+        # (user_id, профиль) -> корзина, в порядке последнего обращения
+        self._buckets: OrderedDict[tuple[int, str], TokenBucket] = OrderedDict()
+
+    def _user_bucket(self, user_id: int, profile: str, limit: ThrottleLimit, now: float) -> TokenBucket:
+        key = (user_id, profile)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(limit.rate, limit.burst, now)
+            if len(self._buckets) > self.max_users:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        profile = get_flag(data, 'throttling', default='default')
+        limit = self.limits.get(profile, self.limits['default'])
+        now = time.monotonic()
+
+        user = data.get('event_from_user')
+        if user is not None:
+            bucket = self._user_bucket(user.id, profile, limit, now)
+            if not bucket.consume(now):
+                # Сообщением предупреждаем один раз за серию, на колбэк отвечаем всегда
+                notify = not bucket.notified
+                bucket.notified = True
+                return await self._reject(event, data, 'user', LEXICON_RU['throttled'], notify)
+
+        if limit.shed and pool_stats.waiting >= self.shed_queue_depth:
+            return await self._reject(event, data, 'shed', LEXICON_RU['overloaded'], True)
+        if not self._global.consume(now):
+            # При превышении общего лимита на сообщения не отвечаем, чтобы не добавлять нагрузки
+            return await self._reject(event, data, 'global', LEXICON_RU['overloaded'], False)
+        return await handler(event, data)
+
+    async def _reject(self, event: TelegramObject, data: Dict[str, Any], reason: str, text: str, notify: bool) -> None:
+        handler_object = data.get("handler")
+        name = getattr(getattr(handler_object, "callback", None), "__name__", "unknown")
+        throttle_stats[name, reason] += 1
+        # Колбэк нужно закрыть в любом случае, иначе у кнопки крутятся часики
+        if isinstance(event, CallbackQuery):
+            await event.answer(text)
+        elif notify and isinstance(event, Message):
+            await event.answer(text)
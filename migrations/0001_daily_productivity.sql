@@ -0,0 +1,12 @@
+-- Дневная сводка продуктивности (см. database.models.DailyProductivity).
+-- После применения сводку нужно заполнить: python -m database.backfill
+
+CREATE TABLE IF NOT EXISTS daily_productivity (
+    user_id bigint NOT NULL REFERENCES users (telegram_id),
+    day date NOT NULL,
+    flow_minutes integer NOT NULL DEFAULT 0,
+    sprint_minutes integer NOT NULL DEFAULT 0,
+    flow_count integer NOT NULL DEFAULT 0,
+    sprint_count integer NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day)
+);
@@ -0,0 +1,11 @@
+-- migrate: no-transaction
+-- Покрывающие индексы для выборок истории пользователя.
+-- Строятся CONCURRENTLY, поэтому запись в таблицы не блокируется.
+-- Если построение прервалось, останется невалидный индекс: удалите его
+-- (DROP INDEX CONCURRENTLY ...) и запустите миграцию заново.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_flow_records_user_recorded
+    ON flow_records (user_id, recorded_at) INCLUDE (duration_minutes);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_sprint_records_user_recorded
+    ON sprint_records (user_id, recorded_at) INCLUDE (duration_minutes);
@@ -0,0 +1,187 @@
+-- migrate: no-transaction
+-- Перевод id записей на BIGINT IDENTITY без долгой эксклюзивной блокировки.
+--
+-- Порядок для каждой таблицы:
+--   1. теневая колонка id_big + триггер, который заполняет её для новых строк;
+--   2. перенос старых id пачками (каждая пачка в своей транзакции);
+--   3. уникальный индекс CONCURRENTLY и проверка NOT NULL через NOT VALID/VALIDATE;
+--   4. короткая транзакция, подменяющая id на id_big и включающая IDENTITY.
+-- Шаги 1-3 можно безопасно перезапускать после сбоя. Таблица, у которой id уже BIGINT IDENTITY,
+-- пропускается целиком, поэтому после сбоя на второй таблице скрипт тоже можно перезапустить.
+-- Требуется PostgreSQL 12+.
+
+-- ---------------------------------------------------------------- flow_records
+-- migrate: if NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_schema = current_schema() AND table_name = 'flow_records' AND column_name = 'id' AND data_type = 'bigint' AND is_identity = 'YES')
+ALTER SEQUENCE flow_records_id_seq AS bigint CACHE 50;
+
+ALTER TABLE flow_records ADD COLUMN IF NOT EXISTS id_big bigint;
+
+CREATE OR REPLACE FUNCTION flow_records_sync_id_big() RETURNS trigger AS $$
+BEGIN
+    NEW.id_big := NEW.id;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS flow_records_sync_id_big ON flow_records;
+
+CREATE TRIGGER flow_records_sync_id_big
+    BEFORE INSERT OR UPDATE ON flow_records
+    FOR EACH ROW EXECUTE FUNCTION flow_records_sync_id_big();
+
+-- Переносим существующие id пачками, фиксируя каждую пачку отдельно
+CREATE OR REPLACE PROCEDURE flow_records_backfill_id_big(batch_size integer DEFAULT 10000) AS $$
+DECLARE
+    last_id bigint := 0;
+    max_id bigint;
+BEGIN
+    SELECT coalesce(max(id), 0) INTO max_id FROM flow_records;
+    WHILE last_id < max_id LOOP
+        UPDATE flow_records SET id_big = id
+        WHERE id > last_id AND id <= last_id + batch_size AND id_big IS NULL;
+        last_id := last_id + batch_size;
+        COMMIT;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+CALL flow_records_backfill_id_big();
+
+DROP PROCEDURE flow_records_backfill_id_big(integer);
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS flow_records_id_big_key ON flow_records (id_big);
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'flow_records_id_big_not_null') THEN
+        ALTER TABLE flow_records ADD CONSTRAINT flow_records_id_big_not_null CHECK (id_big IS NOT NULL) NOT VALID;
+    END IF;
+END;
+$$;
+
+ALTER TABLE flow_records VALIDATE CONSTRAINT flow_records_id_big_not_null;
+
+-- Короткая подмена колонки под эксклюзивной блокировкой: все тяжёлые шаги уже выполнены
+BEGIN;
+
+SET LOCAL lock_timeout = '5s';
+
+LOCK TABLE flow_records IN ACCESS EXCLUSIVE MODE;
+
+ALTER TABLE flow_records ALTER COLUMN id_big SET NOT NULL;
+
+ALTER TABLE flow_records DROP CONSTRAINT flow_records_id_big_not_null;
+
+DROP TRIGGER flow_records_sync_id_big ON flow_records;
+
+DROP FUNCTION flow_records_sync_id_big();
+
+ALTER TABLE flow_records DROP CONSTRAINT flow_records_pkey;
+
+-- Вместе с колонкой удаляется и принадлежащая ей последовательность flow_records_id_seq
+ALTER TABLE flow_records DROP COLUMN id;
+
+ALTER TABLE flow_records RENAME COLUMN id_big TO id;
+
+ALTER TABLE flow_records ADD CONSTRAINT flow_records_pkey PRIMARY KEY USING INDEX flow_records_id_big_key;
+
+DO $$
+BEGIN
+    EXECUTE format(
+        'ALTER TABLE flow_records ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY (START WITH %s CACHE 50)',
+        (SELECT coalesce(max(id), 0) + 1 FROM flow_records)
+    );
+END;
+$$;
+
+COMMIT;
+
+-- migrate: end if
+
+-- ---------------------------------------------------------------- sprint_records
+-- migrate: if NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_schema = current_schema() AND table_name = 'sprint_records' AND column_name = 'id' AND data_type = 'bigint' AND is_identity = 'YES')
+ALTER SEQUENCE sprint_records_id_seq AS bigint CACHE 50;
+
+ALTER TABLE sprint_records ADD COLUMN IF NOT EXISTS id_big bigint;
+
+CREATE OR REPLACE FUNCTION sprint_records_sync_id_big() RETURNS trigger AS $$
+BEGIN
+    NEW.id_big := NEW.id;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS sprint_records_sync_id_big ON sprint_records;
+
+CREATE TRIGGER sprint_records_sync_id_big
+    BEFORE INSERT OR UPDATE ON sprint_records
+    FOR EACH ROW EXECUTE FUNCTION sprint_records_sync_id_big();
+
+-- Переносим существующие id пачками, фиксируя каждую пачку отдельно
+CREATE OR REPLACE PROCEDURE sprint_records_backfill_id_big(batch_size integer DEFAULT 10000) AS $$
+DECLARE
+    last_id bigint := 0;
+    max_id bigint;
+BEGIN
+    SELECT coalesce(max(id), 0) INTO max_id FROM sprint_records;
+    WHILE last_id < max_id LOOP
+        UPDATE sprint_records SET id_big = id
+        WHERE id > last_id AND id <= last_id + batch_size AND id_big IS NULL;
+        last_id := last_id + batch_size;
+        COMMIT;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+CALL sprint_records_backfill_id_big();
+
+DROP PROCEDURE sprint_records_backfill_id_big(integer);
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS sprint_records_id_big_key ON sprint_records (id_big);
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'sprint_records_id_big_not_null') THEN
+        ALTER TABLE sprint_records ADD CONSTRAINT sprint_records_id_big_not_null CHECK (id_big IS NOT NULL) NOT VALID;
+    END IF;
+END;
+$$;
+
+ALTER TABLE sprint_records VALIDATE CONSTRAINT sprint_records_id_big_not_null;
+
+-- Короткая подмена колонки под эксклюзивной блокировкой: все тяжёлые шаги уже выполнены
+BEGIN;
+
+SET LOCAL lock_timeout = '5s';
+
+LOCK TABLE sprint_records IN ACCESS EXCLUSIVE MODE;
+
+ALTER TABLE sprint_records ALTER COLUMN id_big SET NOT NULL;
+
+ALTER TABLE sprint_records DROP CONSTRAINT sprint_records_id_big_not_null;
+
+DROP TRIGGER sprint_records_sync_id_big ON sprint_records;
+
+DROP FUNCTION sprint_records_sync_id_big();
+
+ALTER TABLE sprint_records DROP CONSTRAINT sprint_records_pkey;
+
+-- Вместе с колонкой удаляется и принадлежащая ей последовательность sprint_records_id_seq
+ALTER TABLE sprint_records DROP COLUMN id;
+
+ALTER TABLE sprint_records RENAME COLUMN id_big TO id;
+
+ALTER TABLE sprint_records ADD CONSTRAINT sprint_records_pkey PRIMARY KEY USING INDEX sprint_records_id_big_key;
+
+DO $$
+BEGIN
+    EXECUTE format(
+        'ALTER TABLE sprint_records ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY (START WITH %s CACHE 50)',
+        (SELECT coalesce(max(id), 0) + 1 FROM sprint_records)
+    );
+END;
+$$;
+
+COMMIT;
+
+-- migrate: end if
@@ -0,0 +1,8 @@
+-- Хранилище состояний FSM (FSM_STORAGE=postgres, см. storage.PostgresStorage).
+
+CREATE TABLE IF NOT EXISTS fsm_states (
+    key varchar(255) PRIMARY KEY,
+    state varchar(255),
+    data jsonb NOT NULL DEFAULT '{}'::jsonb,
+    updated_at timestamp NOT NULL DEFAULT now()
+);
@@ -0,0 +1,20 @@
+-- migrate: no-transaction
+-- Ежедневные рассылки: подписка на напоминания и контрольные точки рассылок.
+-- Столбец с константным DEFAULT добавляется без перезаписи таблицы (PostgreSQL 11+),
+-- частичный индекс для обхода подписчиков строится CONCURRENTLY.
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS reminders_enabled boolean NOT NULL DEFAULT false;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_reminders_enabled
+    ON users (id) WHERE reminders_enabled;
+
+CREATE TABLE IF NOT EXISTS broadcast_runs (
+    kind varchar(32) NOT NULL,
+    run_date date NOT NULL,
+    last_user_id bigint NOT NULL DEFAULT 0,
+    sent integer NOT NULL DEFAULT 0,
+    failed integer NOT NULL DEFAULT 0,
+    started_at timestamp NOT NULL DEFAULT now(),
+    finished_at timestamp,
+    PRIMARY KEY (kind, run_date)
+);
@@ -0,0 +1,39 @@
+-- migrate: on-create
+-- Рейтинг пользователей по минутам фокуса за неделю, месяц и всё время.
+-- Считается одним проходом по дневной сводке и обновляется фоновой задачей
+-- (REFRESH MATERIALIZED VIEW CONCURRENTLY, см. database/leaderboard.py).
+-- Уникальный индекс нужен для CONCURRENTLY и для поиска места пользователя.
+-- Время обновления хранится в отдельной таблице из одной строки: столбец now() в представлении
+-- менялся бы в каждой строке, и CONCURRENTLY переписывал бы всё представление вместо изменившихся строк.
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS leaderboard AS
+SELECT
+    p.period,
+    t.user_id,
+    p.minutes,
+    rank() OVER (PARTITION BY p.period ORDER BY p.minutes DESC) AS rank,
+    count(*) OVER (PARTITION BY p.period) AS total
+FROM (
+    SELECT
+        user_id,
+        sum(flow_minutes + sprint_minutes) AS all_minutes,
+        sum(flow_minutes + sprint_minutes) FILTER (WHERE day >= date_trunc('month', current_date)::date) AS month_minutes,
+        sum(flow_minutes + sprint_minutes) FILTER (WHERE day >= date_trunc('week', current_date)::date) AS week_minutes
+    FROM daily_productivity
+    GROUP BY user_id
+) t
+CROSS JOIN LATERAL (
+    VALUES ('week', t.week_minutes), ('month', t.month_minutes), ('all', t.all_minutes)
+) AS p (period, minutes)
+WHERE p.minutes > 0;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_leaderboard_period_user ON leaderboard (period, user_id);
+
+CREATE INDEX IF NOT EXISTS ix_leaderboard_period_rank ON leaderboard (period, rank) INCLUDE (user_id, minutes);
+
+CREATE TABLE IF NOT EXISTS leaderboard_refresh (
+    id boolean PRIMARY KEY DEFAULT true CHECK (id),
+    refreshed_at timestamptz NOT NULL
+);
+
+INSERT INTO leaderboard_refresh (refreshed_at) VALUES (now()) ON CONFLICT (id) DO NOTHING;
@@ -0,0 +1,258 @@
+-- migrate: no-transaction
+-- Часовой пояс пользователя, время записей в timestamptz и локальная дата записи.
+--
+-- Раньше время записей хранилось в timestamp без зоны (datetime.now() процесса бота), а дни
+-- считались как date(recorded_at). Теперь у пользователя есть users.timezone, у записей —
+-- recorded_at timestamptz и local_date (день в поясе пользователя на момент записи) с индексом
+-- (user_id, local_date), по которому строится дневная сводка.
+--
+-- Записи переводятся тем же способом, что и id в 0003: теневые колонки + триггер для новых строк,
+-- перенос пачками, индексы CONCURRENTLY, проверка NOT NULL через NOT VALID/VALIDATE и короткая
+-- подмена колонки. Шаги до подмены можно безопасно перезапускать после сбоя.
+-- После миграции нужна новая версия бота: старая не заполняет local_date.
+-- Запускать до необязательного секционирования (optional/partition_records_by_month.sql):
+-- колонку ключа секционирования заменить нельзя. Требуется PostgreSQL 12+.
+
+-- Пояс, в котором бот записывал время без зоны. В Docker-образе бота TZ не задан, это UTC;
+-- если бот работал в другом поясе, укажите его здесь.
+CREATE OR REPLACE FUNCTION migrate_0007_source_timezone() RETURNS text AS $$
+    SELECT 'UTC'::text;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- ---------------------------------------------------------------- users
+-- Столбец с константным DEFAULT добавляется без перезаписи таблицы (PostgreSQL 11+).
+-- Пояс по умолчанию должен совпадать с DEFAULT_TIMEZONE бота: иначе пользователи, созданные SQL или COPY,
+-- и пользователи, созданные ботом, окажутся в разных поясах. Если DEFAULT_TIMEZONE другой, замените
+-- 'Europe/Moscow' здесь (или потом выполните ALTER TABLE users ALTER COLUMN timezone SET DEFAULT '...').
+ALTER TABLE users ADD COLUMN IF NOT EXISTS timezone varchar(64) NOT NULL DEFAULT 'Europe/Moscow';
+
+DO $$
+BEGIN
+    IF (SELECT data_type FROM information_schema.columns
+        WHERE table_name = 'users' AND column_name = 'created_at') = 'timestamp without time zone' THEN
+        SET LOCAL lock_timeout = '5s';
+        ALTER TABLE users ALTER COLUMN created_at TYPE timestamptz
+            USING created_at AT TIME ZONE migrate_0007_source_timezone();
+    END IF;
+END;
+$$;
+
+-- ---------------------------------------------------------------- служебные таблицы
+DO $$
+BEGIN
+    SET LOCAL lock_timeout = '5s';
+    IF (SELECT data_type FROM information_schema.columns
+        WHERE table_name = 'fsm_states' AND column_name = 'updated_at') = 'timestamp without time zone' THEN
+        ALTER TABLE fsm_states ALTER COLUMN updated_at TYPE timestamptz
+            USING updated_at AT TIME ZONE migrate_0007_source_timezone();
+    END IF;
+    IF (SELECT data_type FROM information_schema.columns
+        WHERE table_name = 'broadcast_runs' AND column_name = 'started_at') = 'timestamp without time zone' THEN
+        ALTER TABLE broadcast_runs
+            ALTER COLUMN started_at TYPE timestamptz USING started_at AT TIME ZONE migrate_0007_source_timezone(),
+            ALTER COLUMN finished_at TYPE timestamptz USING finished_at AT TIME ZONE migrate_0007_source_timezone();
+    END IF;
+END;
+$$;
+
+-- ---------------------------------------------------------------- flow_records
+ALTER TABLE flow_records ADD COLUMN IF NOT EXISTS recorded_at_tz timestamptz;
+
+ALTER TABLE flow_records ADD COLUMN IF NOT EXISTS local_date date;
+
+-- Строки, которые старая версия бота вставляет во время миграции
+CREATE OR REPLACE FUNCTION flow_records_sync_local_time() RETURNS trigger AS $$
+BEGIN
+    NEW.recorded_at_tz := NEW.recorded_at AT TIME ZONE migrate_0007_source_timezone();
+    NEW.local_date := (NEW.recorded_at_tz AT TIME ZONE
+        (SELECT timezone FROM users WHERE telegram_id = NEW.user_id))::date;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS flow_records_sync_local_time ON flow_records;
+
+CREATE TRIGGER flow_records_sync_local_time
+    BEFORE INSERT ON flow_records
+    FOR EACH ROW EXECUTE FUNCTION flow_records_sync_local_time();
+
+-- Переносим существующие записи пачками, фиксируя каждую пачку отдельно
+CREATE OR REPLACE PROCEDURE flow_records_backfill_local_time(batch_size integer DEFAULT 10000) AS $$
+DECLARE
+    last_id bigint := 0;
+    max_id bigint;
+BEGIN
+    SELECT coalesce(max(id), 0) INTO max_id FROM flow_records;
+    WHILE last_id < max_id LOOP
+        UPDATE flow_records r
+        SET recorded_at_tz = r.recorded_at AT TIME ZONE migrate_0007_source_timezone(),
+            local_date = ((r.recorded_at AT TIME ZONE migrate_0007_source_timezone()) AT TIME ZONE u.timezone)::date
+        FROM users u
+        WHERE u.telegram_id = r.user_id
+          AND r.id > last_id AND r.id <= last_id + batch_size AND r.recorded_at_tz IS NULL;
+        last_id := last_id + batch_size;
+        COMMIT;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+CALL flow_records_backfill_local_time();
+
+DROP PROCEDURE flow_records_backfill_local_time(integer);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_flow_records_user_local_date
+    ON flow_records (user_id, local_date) INCLUDE (duration_minutes);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_flow_records_user_recorded_tz
+    ON flow_records (user_id, recorded_at_tz) INCLUDE (duration_minutes);
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'flow_records_local_time_not_null') THEN
+        ALTER TABLE flow_records ADD CONSTRAINT flow_records_local_time_not_null
+            CHECK (recorded_at_tz IS NOT NULL AND local_date IS NOT NULL) NOT VALID;
+    END IF;
+END;
+$$;
+
+ALTER TABLE flow_records VALIDATE CONSTRAINT flow_records_local_time_not_null;
+
+-- Короткая подмена колонки под эксклюзивной блокировкой: все тяжёлые шаги уже выполнены
+BEGIN;
+
+SET LOCAL lock_timeout = '5s';
+
+LOCK TABLE flow_records IN ACCESS EXCLUSIVE MODE;
+
+ALTER TABLE flow_records
+    ALTER COLUMN recorded_at_tz SET NOT NULL,
+    ALTER COLUMN local_date SET NOT NULL;
+
+ALTER TABLE flow_records DROP CONSTRAINT flow_records_local_time_not_null;
+
+DROP TRIGGER flow_records_sync_local_time ON flow_records;
+
+DROP FUNCTION flow_records_sync_local_time();
+
+-- Вместе со старой колонкой удаляется и индекс ix_flow_records_user_recorded
+ALTER TABLE flow_records DROP COLUMN recorded_at;
+
+ALTER TABLE flow_records RENAME COLUMN recorded_at_tz TO recorded_at;
+
+ALTER INDEX ix_flow_records_user_recorded_tz RENAME TO ix_flow_records_user_recorded;
+
+COMMIT;
+
+-- ---------------------------------------------------------------- sprint_records
+ALTER TABLE sprint_records ADD COLUMN IF NOT EXISTS recorded_at_tz timestamptz;
+
+ALTER TABLE sprint_records ADD COLUMN IF NOT EXISTS local_date date;
+
+-- Строки, которые старая версия бота вставляет во время миграции
+CREATE OR REPLACE FUNCTION sprint_records_sync_local_time() RETURNS trigger AS $$
+BEGIN
+    NEW.recorded_at_tz := NEW.recorded_at AT TIME ZONE migrate_0007_source_timezone();
+    NEW.local_date := (NEW.recorded_at_tz AT TIME ZONE
+        (SELECT timezone FROM users WHERE telegram_id = NEW.user_id))::date;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS sprint_records_sync_local_time ON sprint_records;
+
+CREATE TRIGGER sprint_records_sync_local_time
+    BEFORE INSERT ON sprint_records
+    FOR EACH ROW EXECUTE FUNCTION sprint_records_sync_local_time();
+
+-- Переносим существующие записи пачками, фиксируя каждую пачку отдельно
+CREATE OR REPLACE PROCEDURE sprint_records_backfill_local_time(batch_size integer DEFAULT 10000) AS $$
+DECLARE
+    last_id bigint := 0;
+    max_id bigint;
+BEGIN
+    SELECT coalesce(max(id), 0) INTO max_id FROM sprint_records;
+    WHILE last_id < max_id LOOP
+        UPDATE sprint_records r
+        SET recorded_at_tz = r.recorded_at AT TIME ZONE migrate_0007_source_timezone(),
+            local_date = ((r.recorded_at AT TIME ZONE migrate_0007_source_timezone()) AT TIME ZONE u.timezone)::date
+        FROM users u
+        WHERE u.telegram_id = r.user_id
+          AND r.id > last_id AND r.id <= last_id + batch_size AND r.recorded_at_tz IS NULL;
+        last_id := last_id + batch_size;
+        COMMIT;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+CALL sprint_records_backfill_local_time();
+
+DROP PROCEDURE sprint_records_backfill_local_time(integer);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_sprint_records_user_local_date
+    ON sprint_records (user_id, local_date) INCLUDE (duration_minutes);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_sprint_records_user_recorded_tz
+    ON sprint_records (user_id, recorded_at_tz) INCLUDE (duration_minutes);
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'sprint_records_local_time_not_null') THEN
+        ALTER TABLE sprint_records ADD CONSTRAINT sprint_records_local_time_not_null
+            CHECK (recorded_at_tz IS NOT NULL AND local_date IS NOT NULL) NOT VALID;
+    END IF;
+END;
+$$;
+
+ALTER TABLE sprint_records VALIDATE CONSTRAINT sprint_records_local_time_not_null;
+
+-- Короткая подмена колонки под эксклюзивной блокировкой: все тяжёлые шаги уже выполнены
+BEGIN;
+
+SET LOCAL lock_timeout = '5s';
+
+LOCK TABLE sprint_records IN ACCESS EXCLUSIVE MODE;
+
+ALTER TABLE sprint_records
+    ALTER COLUMN recorded_at_tz SET NOT NULL,
+    ALTER COLUMN local_date SET NOT NULL;
+
+ALTER TABLE sprint_records DROP CONSTRAINT sprint_records_local_time_not_null;
+
+DROP TRIGGER sprint_records_sync_local_time ON sprint_records;
+
+DROP FUNCTION sprint_records_sync_local_time();
+
+-- Вместе со старой колонкой удаляется и индекс ix_sprint_records_user_recorded
+ALTER TABLE sprint_records DROP COLUMN recorded_at;
+
+ALTER TABLE sprint_records RENAME COLUMN recorded_at_tz TO recorded_at;
+
+ALTER INDEX ix_sprint_records_user_recorded_tz RENAME TO ix_sprint_records_user_recorded;
+
+COMMIT;
+
+DROP FUNCTION migrate_0007_source_timezone();
+
+-- ---------------------------------------------------------------- daily_productivity
+-- Дневная сводка была посчитана по date(recorded_at): пересобираем её по локальным дням.
+-- Запись в сводку блокируется до конца транзакции, чтение — нет.
+BEGIN;
+
+LOCK TABLE daily_productivity IN EXCLUSIVE MODE;
+
+DELETE FROM daily_productivity;
+
+INSERT INTO daily_productivity (user_id, day, flow_minutes, sprint_minutes, flow_count, sprint_count)
+SELECT user_id, local_date,
+       coalesce(sum(duration_minutes) FILTER (WHERE kind = 'flow'), 0),
+       coalesce(sum(duration_minutes) FILTER (WHERE kind = 'sprint'), 0),
+       count(*) FILTER (WHERE kind = 'flow'),
+       count(*) FILTER (WHERE kind = 'sprint')
+FROM (
+    SELECT 'flow' AS kind, user_id, local_date, duration_minutes FROM flow_records
+    UNION ALL
+    SELECT 'sprint', user_id, local_date, duration_minutes FROM sprint_records
+) records
+GROUP BY user_id, local_date;
+
+COMMIT;
@@ -0,0 +1,195 @@
+-- Необязательная миграция: помесячное секционирование записей по recorded_at.
+-- Не применяется автоматически. Запуск после 0001-0007:
+--   python -m database.migrate --file migrations/optional/partition_records_by_month.sql
+--
+-- Текущая таблица становится секцией "всё до начала следующего месяца" без
+-- перезаписи данных: диапазон проверяется заранее через CHECK NOT VALID/VALIDATE,
+-- поэтому ATTACH PARTITION не сканирует таблицу. Не запускайте в последний день месяца.
+-- migrate: no-transaction
+
+-- Создаёт месячные секции на months_ahead месяцев вперёд (вызывать периодически, например раз в месяц)
+CREATE OR REPLACE FUNCTION create_record_partitions(parent text, months_ahead integer DEFAULT 3) RETURNS void AS $$
+DECLARE
+    month_start date := date_trunc('month', now())::date + interval '1 month';
+    partition_name text;
+BEGIN
+    FOR i IN 0..months_ahead - 1 LOOP
+        partition_name := format('%s_%s', parent, to_char(month_start, 'YYYY_MM'));
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                partition_name, parent, month_start, month_start + interval '1 month'
+            );
+            EXECUTE format(
+                'ALTER TABLE %I ADD FOREIGN KEY (user_id) REFERENCES users (telegram_id)',
+                partition_name
+            );
+        END IF;
+        month_start := month_start + interval '1 month';
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ---------------------------------------------------------------- flow_records
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS flow_records_id_recorded_key ON flow_records (id, recorded_at);
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'flow_records_legacy_range') THEN
+        EXECUTE format(
+            'ALTER TABLE flow_records ADD CONSTRAINT flow_records_legacy_range '
+            'CHECK (recorded_at IS NOT NULL AND recorded_at < %L) NOT VALID',
+            date_trunc('month', now()) + interval '1 month'
+        );
+    END IF;
+END;
+$$;
+
+ALTER TABLE flow_records VALIDATE CONSTRAINT flow_records_legacy_range;
+
+BEGIN;
+
+SET LOCAL lock_timeout = '5s';
+
+LOCK TABLE flow_records IN ACCESS EXCLUSIVE MODE;
+
+ALTER TABLE flow_records RENAME TO flow_records_legacy;
+
+ALTER INDEX ix_flow_records_user_recorded RENAME TO ix_flow_records_legacy_user_recorded;
+
+-- Имена индексов общие для схемы: освобождаем их для индексов секционированной таблицы
+ALTER INDEX ix_flow_records_user_local_date RENAME TO ix_flow_records_legacy_user_local_date;
+
+-- Ключ секции должен совпадать с ключом родителя (id, recorded_at), а имя flow_records_pkey займёт родитель.
+-- Уникальный индекс построен заранее, поэтому замена ключа не сканирует таблицу
+ALTER TABLE flow_records_legacy
+    DROP CONSTRAINT flow_records_pkey,
+    ADD CONSTRAINT flow_records_legacy_pkey PRIMARY KEY USING INDEX flow_records_id_recorded_key;
+
+-- IDENTITY нельзя перенести на секционированную таблицу (PostgreSQL < 17), используем обычную последовательность
+DO $$
+DECLARE
+    next_id bigint := (SELECT coalesce(max(id), 0) + 1 FROM flow_records_legacy);
+BEGIN
+    ALTER TABLE flow_records_legacy ALTER COLUMN id DROP IDENTITY IF EXISTS;
+    EXECUTE format('CREATE SEQUENCE flow_records_id_seq AS bigint START WITH %s CACHE 50', next_id);
+END;
+$$;
+
+CREATE TABLE flow_records (
+    id bigint NOT NULL DEFAULT nextval('flow_records_id_seq'),
+    user_id bigint NOT NULL,
+    duration_minutes integer NOT NULL,
+    recorded_at timestamp with time zone NOT NULL,
+    local_date date NOT NULL,
+    username character varying(255),
+    PRIMARY KEY (id, recorded_at)
+) PARTITION BY RANGE (recorded_at);
+
+ALTER SEQUENCE flow_records_id_seq OWNED BY flow_records.id;
+
+DO $$
+BEGIN
+    EXECUTE format(
+        'ALTER TABLE flow_records ATTACH PARTITION flow_records_legacy FOR VALUES FROM (MINVALUE) TO (%L)',
+        date_trunc('month', now()) + interval '1 month'
+    );
+END;
+$$;
+
+-- Индекс на родителе подхватывает уже существующий индекс старой секции без перестроения
+CREATE INDEX ix_flow_records_user_recorded ON flow_records (user_id, recorded_at) INCLUDE (duration_minutes);
+
+CREATE INDEX ix_flow_records_user_local_date ON flow_records (user_id, local_date) INCLUDE (duration_minutes);
+
+CREATE TABLE flow_records_default PARTITION OF flow_records DEFAULT;
+
+ALTER TABLE flow_records_default ADD FOREIGN KEY (user_id) REFERENCES users (telegram_id);
+
+COMMIT;
+
+ALTER TABLE flow_records_legacy DROP CONSTRAINT flow_records_legacy_range;
+
+SELECT create_record_partitions('flow_records', 3);
+
+-- ---------------------------------------------------------------- sprint_records
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS sprint_records_id_recorded_key ON sprint_records (id, recorded_at);
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'sprint_records_legacy_range') THEN
+        EXECUTE format(
+            'ALTER TABLE sprint_records ADD CONSTRAINT sprint_records_legacy_range '
+            'CHECK (recorded_at IS NOT NULL AND recorded_at < %L) NOT VALID',
+            date_trunc('month', now()) + interval '1 month'
+        );
+    END IF;
+END;
+$$;
+
+ALTER TABLE sprint_records VALIDATE CONSTRAINT sprint_records_legacy_range;
+
+BEGIN;
+
+SET LOCAL lock_timeout = '5s';
+
+LOCK TABLE sprint_records IN ACCESS EXCLUSIVE MODE;
+
+ALTER TABLE sprint_records RENAME TO sprint_records_legacy;
+
+ALTER INDEX ix_sprint_records_user_recorded RENAME TO ix_sprint_records_legacy_user_recorded;
+
+-- Имена индексов общие для схемы: освобождаем их для индексов секционированной таблицы
+ALTER INDEX ix_sprint_records_user_local_date RENAME TO ix_sprint_records_legacy_user_local_date;
+
+-- Ключ секции должен совпадать с ключом родителя (id, recorded_at), а имя sprint_records_pkey займёт родитель.
+-- Уникальный индекс построен заранее, поэтому замена ключа не сканирует таблицу
+ALTER TABLE sprint_records_legacy
+    DROP CONSTRAINT sprint_records_pkey,
+    ADD CONSTRAINT sprint_records_legacy_pkey PRIMARY KEY USING INDEX sprint_records_id_recorded_key;
+
+-- IDENTITY нельзя перенести на секционированную таблицу (PostgreSQL < 17), используем обычную последовательность
+DO $$
+DECLARE
+    next_id bigint := (SELECT coalesce(max(id), 0) + 1 FROM sprint_records_legacy);
+BEGIN
+    ALTER TABLE sprint_records_legacy ALTER COLUMN id DROP IDENTITY IF EXISTS;
+    EXECUTE format('CREATE SEQUENCE sprint_records_id_seq AS bigint START WITH %s CACHE 50', next_id);
+END;
+$$;
+
+CREATE TABLE sprint_records (
+    id bigint NOT NULL DEFAULT nextval('sprint_records_id_seq'),
+    user_id bigint NOT NULL,
+    duration_minutes integer NOT NULL,
+    recorded_at timestamp with time zone NOT NULL,
+    local_date date NOT NULL,
+    username character varying(255),
+    PRIMARY KEY (id, recorded_at)
+) PARTITION BY RANGE (recorded_at);
+
+ALTER SEQUENCE sprint_records_id_seq OWNED BY sprint_records.id;
+
+DO $$
+BEGIN
+    EXECUTE format(
+        'ALTER TABLE sprint_records ATTACH PARTITION sprint_records_legacy FOR VALUES FROM (MINVALUE) TO (%L)',
+        date_trunc('month', now()) + interval '1 month'
+    );
+END;
+$$;
+
+-- Индекс на родителе подхватывает уже существующий индекс старой секции без перестроения
+CREATE INDEX ix_sprint_records_user_recorded ON sprint_records (user_id, recorded_at) INCLUDE (duration_minutes);
+
+CREATE INDEX ix_sprint_records_user_local_date ON sprint_records (user_id, local_date) INCLUDE (duration_minutes);
+
+CREATE TABLE sprint_records_default PARTITION OF sprint_records DEFAULT;
+
+ALTER TABLE sprint_records_default ADD FOREIGN KEY (user_id) REFERENCES users (telegram_id);
+
+COMMIT;
+
+ALTER TABLE sprint_records_legacy DROP CONSTRAINT sprint_records_legacy_range;
+
+SELECT create_record_partitions('sprint_records', 3);
@@ -6,3 +6,4 @@ class RecordStates(StatesGroup):
     waiting_for_sprint_duration = State()
     flow_active = State()
     flow_paused = State()
+    waiting_for_import_file = State()
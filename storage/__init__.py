@@ -0,0 +1,15 @@
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from config import conf
+from .base import CachedStorage
+from .file import FileStorage
+from .postgres import PostgresStorage
+
+def create_storage() -> BaseStorage:
+    """Создаёт FSM-хранилище, выбранное в конфигурации (FSM_STORAGE)."""
+    if conf.FSM_STORAGE == 'postgres':
+        return PostgresStorage(flush_interval=conf.FSM_FLUSH_INTERVAL, cache_size=conf.FSM_CACHE_SIZE)
+    if conf.FSM_STORAGE == 'file':
+        return FileStorage(conf.FSM_STORAGE_FILE, flush_interval=conf.FSM_FLUSH_INTERVAL)
+    return MemoryStorage()
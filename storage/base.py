@@ -0,0 +1,123 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Mapping, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+
+logger = logging.getLogger(__name__)
+
+class CachedStorage(BaseStorage, ABC):
+    """
+    Основа для постоянных FSM-хранилищ: чтения обслуживаются из локального кэша,
+    а изменения копятся и сбрасываются в хранилище пачкой раз в flush_interval секунд.
+
+    Несколько изменений одного ключа между сбросами (пауза/продолжение таймера)
+    превращаются в одну запись. Локальный кэш предполагает, что ключи одного
+    пользователя обрабатывает один процесс.
+    """
+    def __init__(
+        self,
+        flush_interval: float = 0.5,
+        cache_size: int | None = 100_000,
+        key_builder: KeyBuilder | None = None,
+    ):
+        self.flush_interval = flush_interval
+        self.cache_size = cache_size
+        self.key_builder = key_builder or DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        # ключ -> (state, data); кортеж заменяется целиком, поэтому его можно сбрасывать без копирования
+        self._cache: OrderedDict[str, tuple[Optional[str], Dict[str, Any]]] = OrderedDict()
+        self._dirty: set[str] = set()
+        self._flush_task: asyncio.Task | None = None
+        self._closed = False
+        self.flushes = 0
+        self.flushed_keys = 0
+
+    @abstractmethod
+    async def _load(self, key: str) -> tuple[Optional[str], Dict[str, Any]] | None:
+        """Читает запись из хранилища (None, если её нет)."""
+
+    @abstractmethod
+    async def _persist(self, batch: dict[str, tuple[Optional[str], Dict[str, Any]]]) -> None:
+        """Записывает пачку изменённых записей в хранилище."""
+
+    async def _close_backend(self) -> None:
+        pass
+
+    async def _entry(self, key: StorageKey) -> tuple[str, tuple[Optional[str], Dict[str, Any]]]:
+        k = self.key_builder.build(key)
+        entry = self._cache.get(k)
+        if entry is not None:
+            self._cache.move_to_end(k)
+            return k, entry
+        loaded = await self._load(k) or (None, {})
+        # пока шло чтение, ключ мог появиться в кэше из другого обработчика
+        entry = self._cache.setdefault(k, loaded)
+        self._trim()
+        return k, entry
+
+    def _trim(self) -> None:
+        if self.cache_size is None or len(self._cache) <= self.cache_size:
+            return
+        for k in list(self._cache):
+            if len(self._cache) <= self.cache_size:
+                break
+            if k not in self._dirty:
+                del self._cache[k]
+
+    def _store(self, k: str, entry: tuple[Optional[str], Dict[str, Any]]) -> None:
+        self._cache[k] = entry
+        self._dirty.add(k)
+        if self._flush_task is None and not self._closed:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        k, (_, data) = await self._entry(key)
+        self._store(k, (state.state if isinstance(state, State) else state, data))
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        _, (state, _) = await self._entry(key)
+        return state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        k, (state, _) = await self._entry(key)
+        self._store(k, (state, dict(data)))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, (_, data) = await self._entry(key)
+        return data.copy()
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Сбрасывает накопленные изменения; при ошибке они остаются до следующей попытки."""
+        if not self._dirty:
+            return
+        keys, self._dirty = self._dirty, set()
+        batch = {k: self._cache[k] for k in keys if k in self._cache}
+        try:
+            await self._persist(batch)
+        except Exception:
+            logger.exception("FSM storage flush failed, %s keys will be retried", len(keys))
+            self._dirty |= keys
+            return
+        self.flushes += 1
+        self.flushed_keys += len(batch)
+
+    async def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+        await self._close_backend()
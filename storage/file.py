@@ -0,0 +1,45 @@
+import asyncio
+import json
+import os
+from typing import Any, Dict, Optional
+
+from .base import CachedStorage
+
+class FileStorage(CachedStorage):
+    """
+    FSM-хранилище в JSON-файле для одиночного процесса без БД.
+    Все записи держатся в памяти, файл перезаписывается целиком при сбросе.
+    """
+    def __init__(self, path: str, flush_interval: float = 1.0, **kwargs):
+        super().__init__(flush_interval=flush_interval, cache_size=None, **kwargs)
+        self.path = path
+        self._snapshot: dict[str, list] | None = None
+
+    def _read_file(self) -> dict[str, list]:
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _write_file(self, records: dict[str, list]) -> None:
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(records, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    async def _load(self, key: str) -> tuple[Optional[str], Dict[str, Any]] | None:
+        if self._snapshot is None:
+            self._snapshot = await asyncio.to_thread(self._read_file)
+        record = self._snapshot.get(key)
+        return (record[0], record[1]) if record else None
+
+    async def _persist(self, batch: dict[str, tuple[Optional[str], Dict[str, Any]]]) -> None:
+        if self._snapshot is None:
+            self._snapshot = await asyncio.to_thread(self._read_file)
+        for k, (state, data) in batch.items():
+            if state is None and not data:
+                self._snapshot.pop(k, None)
+            else:
+                self._snapshot[k] = [state, data]
+        await asyncio.to_thread(self._write_file, dict(self._snapshot))
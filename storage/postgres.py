@@ -0,0 +1,40 @@
+from typing import Any, Dict, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+
+from database.connection import AsyncSessionLocal
+from database.models import FsmState
+from .base import CachedStorage
+
+class PostgresStorage(CachedStorage):
+    """FSM-хранилище в таблице fsm_states; использует общий пул AsyncSessionLocal."""
+
+    async def _load(self, key: str) -> tuple[Optional[str], Dict[str, Any]] | None:
+        async with AsyncSessionLocal() as session:
+            row = (await session.execute(
+                select(FsmState.state, FsmState.data).where(FsmState.key == key)
+            )).first()
+        if row is None:
+            return None
+        return row.state, dict(row.data or {})
+
+    async def _persist(self, batch: dict[str, tuple[Optional[str], Dict[str, Any]]]) -> None:
+        # пустые записи (state.clear()) удаляем, чтобы таблица не росла
+        upserts = [
+            {'key': k, 'state': state, 'data': data}
+            for k, (state, data) in batch.items()
+            if state is not None or data
+        ]
+        deletes = [k for k, (state, data) in batch.items() if state is None and not data]
+        async with AsyncSessionLocal() as session:
+            if upserts:
+                stmt = insert(FsmState).values(upserts)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[FsmState.key],
+                    set_={'state': stmt.excluded.state, 'data': stmt.excluded.data, 'updated_at': stmt.excluded.updated_at},
+                )
+                await session.execute(stmt)
+            if deletes:
+                await session.execute(delete(FsmState).where(FsmState.key.in_(deletes)))
+            await session.commit()
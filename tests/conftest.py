@@ -0,0 +1,10 @@
+import os
+
+# Модули бота читают настройки при импорте; для тестов хватает заглушек без БД и Telegram
+os.environ.setdefault('BOT_TOKEN', '123456:test-token')
+os.environ.setdefault('DB_HOST', '127.0.0.1')
+os.environ.setdefault('DB_PORT', '5432')
+os.environ.setdefault('DB_NAME', 'test')
+os.environ.setdefault('DB_USER', 'test')
+os.environ.setdefault('DB_PASS', 'test')
+os.environ.setdefault('DEFAULT_TIMEZONE', 'Europe/Moscow')
@@ -0,0 +1,142 @@
+import gzip
+import json
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from importer import ImportFileError, ParsedRecord, RejectedLine, parse_file
+from importer import parser
+
+def _write(tmp_path, name: str, content: str) -> str:
+    path = tmp_path / name
+    path.write_text(content, encoding='utf-8')
+    return str(path)
+
+def _records(path: str, **kwargs) -> list:
+    return list(parse_file(path, **kwargs))
+
+def test_csv_comma_delimiter(tmp_path):
+    path = _write(tmp_path, 'a.csv', 'recorded_at,kind,duration_minutes\n2024-01-02T10:00:00+00:00,flow,45\n')
+    assert _records(path) == [
+        ParsedRecord(2, 'flow', datetime(2024, 1, 2, 10, tzinfo=timezone.utc), 45),
+    ]
+
+def test_csv_semicolon_delimiter(tmp_path):
+    # Так сохраняет CSV Excel в русской локали
+    path = _write(tmp_path, 'a.csv', 'Recorded_At;Kind;Duration_Minutes\n2024-01-02 10:00:00;Sprint;30\n')
+    assert _records(path) == [
+        ParsedRecord(2, 'sprint', datetime(2024, 1, 2, 10, tzinfo=timezone.utc), 30),
+    ]
+
+def test_csv_without_kind_is_sprint(tmp_path):
+    path = _write(tmp_path, 'a.csv', 'recorded_at,duration_minutes\n2024-01-02 10:00,15\n')
+    assert _records(path)[0].kind == 'sprint'
+
+def test_csv_without_required_columns(tmp_path):
+    path = _write(tmp_path, 'a.csv', 'date,minutes\n2024-01-02,15\n')
+    with pytest.raises(ImportFileError, match='header'):
+        _records(path)
+
+def test_csv_extra_values_rejected(tmp_path):
+    path = _write(tmp_path, 'a.csv', 'recorded_at,duration_minutes\n2024-01-02 10:00,15,extra\n2024-01-02 11:00,20\n')
+    records = _records(path)
+    assert records[0] == RejectedLine(2, 'format')
+    assert isinstance(records[1], ParsedRecord) and records[1].line == 3
+
+def test_naive_time_uses_tz(tmp_path):
+    path = _write(tmp_path, 'a.csv', 'recorded_at,duration_minutes\n2024-01-02 10:00,15\n')
+    zone = ZoneInfo('Europe/Moscow')
+    record = _records(path, tz=zone)[0]
+    assert record.recorded_at == datetime(2024, 1, 2, 10, tzinfo=zone)
+    assert record.recorded_at.astimezone(timezone.utc).hour == 7
+
+def test_rejection_reasons(tmp_path):
+    future = (datetime.now(timezone.utc) + timedelta(days=1)).isoformat()
+    rows = [
+        {'recorded_at': '2024-01-02 10:00', 'kind': 'nap', 'duration_minutes': 10},
+        {'recorded_at': 'yesterday', 'duration_minutes': 10},
+        {'duration_minutes': 10},
+        {'recorded_at': future, 'duration_minutes': 10},
+        {'recorded_at': '2024-01-02 10:00', 'duration_minutes': 0},
+        {'recorded_at': '2024-01-02 10:00', 'duration_minutes': parser.MAX_DURATION_MINUTES + 1},
+        {'recorded_at': '2024-01-02 10:00', 'duration_minutes': 12.5},
+        {'recorded_at': '2024-01-02 10:00', 'duration_minutes': True},
+        {'recorded_at': '2024-01-02 10:00', 'duration_minutes': 'abc'},
+        {'recorded_at': '2024-01-02 10:00', 'duration_minutes': ' 25 '},
+        ['not', 'an', 'object'],
+    ]
+    path = _write(tmp_path, 'a.json', json.dumps(rows))
+    assert _records(path) == [
+        RejectedLine(1, 'kind'),
+        RejectedLine(2, 'recorded_at'),
+        RejectedLine(3, 'recorded_at'),
+        RejectedLine(4, 'future'),
+        RejectedLine(5, 'duration'),
+        RejectedLine(6, 'duration'),
+        RejectedLine(7, 'duration'),
+        RejectedLine(8, 'duration'),
+        RejectedLine(9, 'duration'),
+        ParsedRecord(10, 'sprint', datetime(2024, 1, 2, 10, tzinfo=timezone.utc), 25),
+        RejectedLine(11, 'format'),
+    ]
+
+@pytest.mark.parametrize('read_size', [1, 2, 3, 7, 16, 64])
+def test_json_array_split_across_chunks(tmp_path, monkeypatch, read_size):
+    rows = [
+        {'recorded_at': f'2024-01-{day:02d}T08:30:00+03:00', 'kind': 'flow', 'duration_minutes': 100 + day}
+        for day in range(1, 11)
+    ]
+    content = ' \n[ ' + ' ,\n  '.join(json.dumps(row) for row in rows) + ' ]\n'
+    path = _write(tmp_path, 'a.json', content)
+    expected = _records(path)
+    assert len(expected) == 10 and all(isinstance(r, ParsedRecord) for r in expected)
+
+    monkeypatch.setattr(parser, '_READ_SIZE', read_size)
+    assert _records(path) == expected
+
+def test_json_array_number_cut_by_chunk(tmp_path, monkeypatch):
+    # Число в конце куска нельзя считать разобранным, пока не прочитан следующий символ
+    path = _write(tmp_path, 'a.json', '[123456, {"recorded_at": "2024-01-02 10:00", "duration_minutes": 5}]')
+    monkeypatch.setattr(parser, '_READ_SIZE', 3)
+    assert _records(path) == [
+        RejectedLine(1, 'format'),
+        ParsedRecord(2, 'sprint', datetime(2024, 1, 2, 10, tzinfo=timezone.utc), 5),
+    ]
+
+@pytest.mark.parametrize('content', [
+    '[{"recorded_at": "2024-01-02 10:00", "duration_minutes": 5}',
+    '[{"recorded_at": "2024-01-02 10:00", "duration_minutes": 5} {"a": 1}]',
+    '[{"recorded_at": "2024-01-02 10:00", "duration_minutes": ',
+])
+def test_broken_json_array(tmp_path, monkeypatch, content):
+    path = _write(tmp_path, 'a.json', content)
+    monkeypatch.setattr(parser, '_READ_SIZE', 4)
+    with pytest.raises(ImportFileError, match='json'):
+        _records(path)
+
+def test_ndjson(tmp_path):
+    path = _write(tmp_path, 'a.ndjson', (
+        '{"recorded_at": "2024-01-02 10:00", "kind": "flow", "duration_minutes": 50}\n'
+        '\n'
+        '{"recorded_at": broken}\n'
+        '{"recorded_at": "2024-01-02 11:00", "duration_minutes": 20}\n'
+    ))
+    records = _records(path)
+    assert [(r.line, type(r).__name__) for r in records] == [
+        (1, 'ParsedRecord'), (3, 'RejectedLine'), (4, 'ParsedRecord'),
+    ]
+    assert records[1].reason == 'format'
+
+def test_gzip_file(tmp_path):
+    path = tmp_path / 'export.csv.gz'
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        f.write('recorded_at,kind,duration_minutes\n2024-01-02 10:00:00+00:00,flow,45\n')
+    assert _records(str(path)) == [
+        ParsedRecord(2, 'flow', datetime(2024, 1, 2, 10, tzinfo=timezone.utc), 45),
+    ]
+
+def test_empty_file(tmp_path):
+    path = _write(tmp_path, 'a.csv', ' \n\t\n')
+    with pytest.raises(ImportFileError, match='empty'):
+        _records(path)
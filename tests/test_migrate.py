@@ -0,0 +1,38 @@
+import pytest
+
+from database.migrate import split_sections, split_statements
+
+def test_split_statements_keeps_dollar_quoted_bodies():
+    sql = """
+    -- комментарий; с точкой с запятой
+    CREATE FUNCTION f() RETURNS void AS $$ BEGIN PERFORM 1; END; $$ LANGUAGE plpgsql;
+    SELECT 'a;b';
+    """
+    assert split_statements(sql) == [
+        "CREATE FUNCTION f() RETURNS void AS $$ BEGIN PERFORM 1; END; $$ LANGUAGE plpgsql",
+        "SELECT 'a;b'",
+    ]
+
+def test_split_sections():
+    sql = (
+        "SELECT 1;\n"
+        "-- migrate: if NOT EXISTS (SELECT 1 FROM t)\n"
+        "SELECT 2;\n"
+        "-- migrate: end if\n"
+        "SELECT 3;\n"
+    )
+    sections = split_sections(sql)
+    assert [(condition, split_statements(text)) for condition, text in sections] == [
+        (None, ['SELECT 1']),
+        ('NOT EXISTS (SELECT 1 FROM t)', ['SELECT 2']),
+        (None, ['SELECT 3']),
+    ]
+
+@pytest.mark.parametrize('sql', [
+    "-- migrate: if true\nSELECT 1;\n",
+    "SELECT 1;\n-- migrate: end if\n",
+    "-- migrate: if true\n-- migrate: if false\n-- migrate: end if\n-- migrate: end if\n",
+])
+def test_split_sections_unbalanced(sql):
+    with pytest.raises(ValueError):
+        split_sections(sql)
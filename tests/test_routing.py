@@ -0,0 +1,130 @@
+import asyncio
+import time
+
+import pytest
+
+from database import routing
+from database.routing import ReplicaRouter
+
+class _FakeConnection:
+    def __init__(self, values: list):
+        self._values = values
+
+    async def scalar(self, stmt):
+        return self._values.pop(0)
+
+class _FakeConnect:
+    def __init__(self, conn: _FakeConnection):
+        self._conn = conn
+
+    async def __aenter__(self):
+        return self._conn
+
+    async def __aexit__(self, *exc):
+        return False
+
+class _FakeEngine:
+    """Движок, который на каждый scalar отдаёт следующее значение из списка."""
+
+    def __init__(self, *values):
+        self.values = list(values)
+
+    def connect(self):
+        return _FakeConnect(_FakeConnection(self.values))
+
+@pytest.fixture
+def engines(monkeypatch):
+    primary, replica = _FakeEngine(), _FakeEngine()
+    monkeypatch.setattr(routing, 'engine', primary)
+    monkeypatch.setattr(routing, 'replica_engine', replica)
+    return primary, replica
+
+def _caught_up_router(**kwargs) -> ReplicaRouter:
+    router = ReplicaRouter(enabled=True, **kwargs)
+    router.available = True
+    router.caught_up_at = time.monotonic()
+    return router
+
+def test_choose_unavailable():
+    router = ReplicaRouter(enabled=True)
+    assert router.choose(1) == 'unavailable'
+    # Проверка прошла, но реплика ещё ни разу не догнала основную БД
+    router.available = True
+    assert router.choose(1) == 'unavailable'
+
+def test_choose_lag():
+    router = _caught_up_router(max_lag=5.0)
+    router.caught_up_at -= 10
+    assert router.choose(1) == 'lag'
+
+def test_choose_replica_for_old_writes():
+    router = ReplicaRouter(enabled=True)
+    router.mark_written(1)
+    router.available = True
+    router.caught_up_at = time.monotonic()
+    assert router.choose(1) == 'replica'
+    assert router.choose(None) == 'replica'
+
+def test_choose_read_your_writes():
+    router = _caught_up_router()
+    router.mark_written(1)
+    assert router.choose(1) == 'written'
+    assert router.choose(2) == 'replica'
+    assert router.choose(None) == 'replica'
+
+def test_choose_write_for_all_users():
+    router = _caught_up_router()
+    router.mark_written(None)
+    assert router.choose(1) == 'written'
+    assert router.choose(None) == 'written'
+
+def test_evicted_user_still_reads_primary():
+    router = _caught_up_router(max_users=2)
+    for user_id in (1, 2, 3):
+        router.mark_written(user_id)
+    assert 1 not in router._written
+    # Вытесненная запись переходит в общую отметку, а не теряется
+    assert router.choose(1) == 'written'
+
+def test_check_before_first_catch_up(engines):
+    primary, replica = engines
+    router = ReplicaRouter(enabled=True)
+    router.mark_written(1)
+    # Реплика ещё не воспроизвела позицию основной БД: caught_up_at остаётся None
+    primary.values.append(200)
+    replica.values.append(100)
+    asyncio.run(router.check())
+    assert router.caught_up_at is None
+    assert router.available
+    assert router.lag_bytes == 100
+    assert router.choose(1) == 'unavailable'
+    assert 1 in router._written
+
+def test_check_catch_up(engines):
+    primary, replica = engines
+    router = ReplicaRouter(enabled=True)
+    router.mark_written(1)
+    primary.values += [200, 300]
+    replica.values += [100, 250]
+    asyncio.run(router.check())
+    before_second = time.monotonic()
+    router.mark_written(2)
+    asyncio.run(router.check())
+    # Догнана позиция первого замера, но не второго
+    assert router.caught_up_at is not None and router.caught_up_at < before_second
+    assert router.lag_bytes == 50
+    assert router.choose(1) == 'replica'
+    assert router.choose(2) == 'written'
+    # Запись пользователя 1 старше caught_up_at и больше не хранится
+    assert list(router._written) == [2]
+
+def test_check_replica_without_replay(engines):
+    # На сервере, который не является репликой, позиция воспроизведения NULL
+    primary, replica = engines
+    router = ReplicaRouter(enabled=True)
+    primary.values.append(500)
+    replica.values.append(None)
+    asyncio.run(router.check())
+    assert router.caught_up_at is not None
+    assert router.lag_bytes == 0
+    assert router.choose(1) == 'replica'
@@ -0,0 +1,76 @@
+import asyncio
+import time
+
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+from broadcast import SendQueue
+
+class _FakeBot:
+    """Бот без сети: errors задаёт исключения для chat_id по очереди попыток."""
+
+    def __init__(self, errors: dict[int, list[Exception]] | None = None):
+        self.errors = errors or {}
+        self.sent: list[tuple[int, str, float]] = []
+
+    async def send_message(self, chat_id: int, text: str):
+        pending = self.errors.get(chat_id)
+        if pending:
+            raise pending.pop(0)
+        self.sent.append((chat_id, text, time.monotonic()))
+
+def _retry_after(chat_id: int, seconds: int) -> TelegramRetryAfter:
+    return TelegramRetryAfter(SendMessage(chat_id=chat_id, text='x'), 'Too Many Requests', seconds)
+
+async def _send_all(bot: _FakeBot, chat_ids, rate: float = 1000.0, **kwargs) -> SendQueue:
+    queue = SendQueue(bot, rate=rate, **kwargs)
+    queue.start()
+    for chat_id in chat_ids:
+        queue.put(chat_id, f'hi {chat_id}', 'test')
+    try:
+        await asyncio.wait_for(queue.join(), 5)
+    finally:
+        await queue.close()
+    return queue
+
+def test_sends_everything():
+    bot = _FakeBot()
+    queue = asyncio.run(_send_all(bot, range(20), workers=4))
+    assert sorted(chat_id for chat_id, _, _ in bot.sent) == list(range(20))
+    assert queue.results == {'sent': 20, 'failed': 0, 'blocked': 0, 'retried': 0}
+    assert len(queue) == 0
+
+def test_rate_limit():
+    bot = _FakeBot()
+    start = time.monotonic()
+    # Корзина начинается полной (rate токенов), остальные 5 сообщений ждут пополнения
+    asyncio.run(_send_all(bot, range(15), rate=10.0, workers=4))
+    assert time.monotonic() - start >= 0.4
+
+def test_retry_after_requeues():
+    bot = _FakeBot({1: [_retry_after(1, 0)]})
+    queue = asyncio.run(_send_all(bot, [1, 2]))
+    assert sorted(chat_id for chat_id, _, _ in bot.sent) == [1, 2]
+    assert queue.results == {'sent': 2, 'failed': 0, 'blocked': 0, 'retried': 1}
+
+def test_retry_after_pauses_all_sends():
+    bot = _FakeBot({1: [_retry_after(1, 1)]})
+    start = time.monotonic()
+    asyncio.run(_send_all(bot, [1, 2, 3], workers=1))
+    sent_at = {chat_id: at - start for chat_id, _, at in bot.sent}
+    assert sent_at[2] >= 0.9 and sent_at[3] >= 0.9
+
+def test_retries_are_limited():
+    bot = _FakeBot({1: [_retry_after(1, 0) for _ in range(5)]})
+    queue = asyncio.run(_send_all(bot, [1], max_retries=2))
+    assert bot.sent == []
+    assert queue.results == {'sent': 0, 'failed': 1, 'blocked': 0, 'retried': 2}
+
+def test_blocked_and_failed():
+    bot = _FakeBot({
+        1: [TelegramForbiddenError(SendMessage(chat_id=1, text='x'), 'bot was blocked by the user')],
+        2: [RuntimeError('boom')],
+    })
+    queue = asyncio.run(_send_all(bot, [1, 2, 3]))
+    assert [chat_id for chat_id, _, _ in bot.sent] == [3]
+    assert queue.results == {'sent': 1, 'failed': 1, 'blocked': 1, 'retried': 0}
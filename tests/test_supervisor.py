@@ -0,0 +1,65 @@
+import asyncio
+
+from aiogram.types import Update
+
+from workers.supervisor import Supervisor, shard_for
+
+def test_message_by_user():
+    update = {'update_id': 1, 'message': {'from': {'id': 17}, 'chat': {'id': -100}}}
+    assert shard_for(update, 4) == 1
+
+def test_callback_query_by_user():
+    update = {'update_id': 2, 'callback_query': {'id': 'q', 'from': {'id': 10}, 'message': {'chat': {'id': 3}}}}
+    assert shard_for(update, 4) == 2
+
+def test_member_update_by_user():
+    update = {'update_id': 3, 'my_chat_member': {'chat': {'id': 5}, 'from': {'id': 7}}}
+    assert shard_for(update, 3) == 1
+
+def test_falls_back_to_chat():
+    update = {'update_id': 4, 'channel_post': {'chat': {'id': 9}}}
+    assert shard_for(update, 4) == 1
+
+def test_without_ids():
+    assert shard_for({'update_id': 5, 'poll': {'id': 'p'}}, 4) == 0
+    assert shard_for({'update_id': 6}, 4) == 0
+
+def test_same_user_same_worker():
+    updates = [
+        {'update_id': 1, 'message': {'from': {'id': 123456789}, 'chat': {'id': 123456789}}},
+        {'update_id': 2, 'callback_query': {'from': {'id': 123456789}}},
+        {'update_id': 3, 'edited_message': {'from': {'id': 123456789}, 'chat': {'id': 1}}},
+    ]
+    assert len({shard_for(update, 8) for update in updates}) == 1
+    assert all(0 <= shard_for(update, 8) < 8 for update in updates)
+
+def _update(**event) -> Update:
+    return Update.model_validate({'update_id': 1, **event})
+
+def _user(user_id: int) -> dict:
+    return {'id': user_id, 'is_bot': False, 'first_name': 'Test'}
+
+def _chat(chat_id: int) -> dict:
+    return {'id': chat_id, 'type': 'private'}
+
+def _routed_to(update: Update, workers: int = 4) -> tuple[int, dict]:
+    supervisor = Supervisor(bot=None, allowed_updates=[], workers=workers)
+    asyncio.run(supervisor._route(update))
+    index = next(i for i, routed in enumerate(supervisor.routed) if routed)
+    return index, supervisor.queues[index].get(timeout=5)
+
+def test_route_aiogram_message():
+    update = _update(message={'message_id': 1, 'date': 0, 'chat': _chat(-100), 'from': _user(777), 'text': '/start'})
+    index, routed = _routed_to(update)
+    assert index == 777 % 4
+    assert Update.model_validate(routed).message.from_user.id == 777
+
+def test_route_aiogram_callback_query():
+    # У callback_query нет chat верхнего уровня: шард определяется только по from
+    update = _update(callback_query={
+        'id': 'q', 'from': _user(777), 'chat_instance': 'c', 'data': 'flow_pause',
+        'message': {'message_id': 5, 'date': 0, 'chat': _chat(-100)},
+    })
+    index, routed = _routed_to(update)
+    assert index == 777 % 4
+    assert Update.model_validate(routed).callback_query.data == 'flow_pause'
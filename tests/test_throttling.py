@@ -0,0 +1,28 @@
+import pytest
+
+from middlewares.throttling import TokenBucket
+
+def test_burst_then_empty():
+    bucket = TokenBucket(rate=1.0, capacity=3, now=0.0)
+    assert [bucket.consume(0.0) for _ in range(4)] == [True, True, True, False]
+
+def test_refill_with_time():
+    bucket = TokenBucket(rate=2.0, capacity=2, now=0.0)
+    assert bucket.consume(0.0) and bucket.consume(0.0)
+    assert not bucket.consume(0.25)
+    # За 0.5 с с начала пополнилось ровно на один токен
+    assert bucket.consume(0.5)
+    assert not bucket.consume(0.5)
+
+def test_refill_capped_by_capacity():
+    bucket = TokenBucket(rate=10.0, capacity=2, now=0.0)
+    bucket.consume(0.0)
+    assert bucket.consume(100.0)
+    assert bucket.tokens == pytest.approx(1)
+
+def test_consume_resets_notified():
+    bucket = TokenBucket(rate=1.0, capacity=1, now=0.0)
+    bucket.consume(0.0)
+    bucket.notified = True
+    assert not bucket.consume(0.5) and bucket.notified
+    assert bucket.consume(1.0) and not bucket.notified
@@ -0,0 +1,139 @@
+import asyncio
+
+import pytest
+
+from timers import ticker
+from timers.ticker import FlowTicker
+
+class _FakeEditor:
+    """Подменяет message_editor: запоминает правки, release открывает ожидающие правки."""
+
+    def __init__(self, block: bool = False):
+        self.edits: list[tuple[int, int, str]] = []
+        self.release = asyncio.Event()
+        if not block:
+            self.release.set()
+
+    async def edit_text(self, bot, chat_id, message_id, text, reply_markup=None):
+        await self.release.wait()
+        self.edits.append((chat_id, message_id, text))
+        return True
+
+@pytest.fixture
+def editor(monkeypatch):
+    def install(block: bool = False) -> _FakeEditor:
+        fake = _FakeEditor(block)
+        monkeypatch.setattr(ticker, 'message_editor', fake)
+        return fake
+    return install
+
+def _ticker(**kwargs) -> FlowTicker:
+    # Без фоновой задачи: сроки обрабатываются вызовами _fire из теста
+    flow = FlowTicker(render=lambda elapsed: str(elapsed // 60), **kwargs)
+    flow._bot = object()
+    flow._task = asyncio.get_running_loop().create_future()
+    flow._tokens_updated = asyncio.get_running_loop().time()
+    return flow
+
+def _run(coro):
+    return asyncio.run(coro)
+
+def test_track_schedules_next_boundary():
+    async def main():
+        flow = _ticker(interval=60)
+        flow.track(1, 10, 30)
+        due, _, key, generation = flow._heap[0]
+        assert key == (1, 10) and generation == 1
+        assert due - flow._timers[key].base_time == pytest.approx(30)
+    _run(main())
+
+def test_stale_heap_entries_are_skipped(editor):
+    async def main():
+        fake = editor()
+        flow = _ticker(interval=60)
+        flow.track(1, 10, 0)
+        # Пауза и продолжение: в куче остаётся запись старого поколения
+        await flow.untrack(1, 10)
+        flow.track(1, 10, 120)
+        assert len(flow._heap) == 2
+        now = asyncio.get_running_loop().time()
+        assert flow._next_delay(now) == pytest.approx(60, abs=1)
+        assert len(flow._heap) == 1 and flow._heap[0][3] == 2
+        flow._fire(now + 60)
+        await asyncio.gather(*flow._in_flight.values())
+        assert fake.edits == [(1, 10, '3')]
+    _run(main())
+
+def test_untracked_timer_is_not_edited(editor):
+    async def main():
+        fake = editor()
+        flow = _ticker(interval=60)
+        flow.track(1, 10, 0)
+        await flow.untrack(1, 10)
+        flow._fire(asyncio.get_running_loop().time() + 120)
+        assert not flow._in_flight and not flow._heap
+        assert fake.edits == [] and len(flow) == 0
+    _run(main())
+
+def test_unchanged_text_is_skipped(editor):
+    async def main():
+        editor()
+        flow = _ticker(interval=60)
+        flow.track(1, 10, 0)
+        start = flow._timers[(1, 10)].base_time
+        flow._fire(start + 60)
+        await asyncio.gather(*flow._in_flight.values())
+        flow._timers[(1, 10)].shown = flow.render(120)
+        flow._fire(start + 120)
+        assert flow.skipped == 1 and not flow._in_flight
+        # Таймер снова в куче со следующим сроком
+        assert flow._heap[0][0] == pytest.approx(start + 180)
+    _run(main())
+
+def test_edit_rate_limit(editor):
+    async def main():
+        editor()
+        flow = _ticker(interval=60, max_edits_per_sec=2)
+        for chat_id in range(5):
+            flow.track(chat_id, 10, 0)
+        now = asyncio.get_running_loop().time() + 60
+        flow._tokens_updated = now
+        flow._fire(now)
+        assert len(flow._in_flight) == 2
+        # Остальные три ждут токенов и остаются в голове кучи
+        due = sorted(entry[0] for entry in flow._heap)
+        assert sum(1 for d in due if d <= now) == 3
+        assert flow._next_delay(now) == pytest.approx(0.5)
+        await asyncio.gather(*flow._in_flight.values())
+    _run(main())
+
+def test_one_edit_in_flight_per_message(editor):
+    async def main():
+        fake = editor(block=True)
+        flow = _ticker(interval=60)
+        flow.track(1, 10, 0)
+        start = flow._timers[(1, 10)].base_time
+        flow._fire(start + 60)
+        first = flow._in_flight[(1, 10)]
+        flow._fire(start + 120)
+        assert flow._in_flight[(1, 10)] is first and flow.skipped == 1
+        fake.release.set()
+        await first
+        assert fake.edits == [(1, 10, '1')]
+    _run(main())
+
+def test_untrack_waits_for_in_flight_edit(editor):
+    async def main():
+        fake = editor(block=True)
+        flow = _ticker(interval=60)
+        flow.track(1, 10, 0)
+        flow._fire(flow._timers[(1, 10)].base_time + 60)
+        untrack = asyncio.create_task(flow.untrack(1, 10))
+        await asyncio.sleep(0)
+        assert not untrack.done()
+        fake.release.set()
+        await untrack
+        # Правка таймера закончилась раньше, чем обработчик поставит свою клавиатуру
+        assert fake.edits == [(1, 10, '1')]
+        assert not flow._in_flight and len(flow) == 0
+    _run(main())
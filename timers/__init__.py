@@ -0,0 +1,8 @@
+from config import conf
+from .ticker import FlowTicker, render_flow_timer
+
+flow_ticker = FlowTicker(
+    interval=conf.FLOW_TIMER_INTERVAL,
+    max_edits_per_sec=conf.FLOW_TIMER_MAX_EDITS_PER_SEC,
+    max_in_flight=conf.FLOW_TIMER_MAX_IN_FLIGHT,
+)
@@ -0,0 +1,236 @@
+import asyncio
+import functools
+import heapq
+import itertools
+import logging
+from typing import Callable
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+
+from keyboards import create_flow_active_kb
+from lexicon import LEXICON_RU
+from messaging import mark_background, message_editor
+
+logger = logging.getLogger(__name__)
+
+def render_flow_timer(elapsed_sec: int) -> str:
+    hours, minutes = divmod(elapsed_sec // 60, 60)
+    return LEXICON_RU['flow_timer_live'].format(hours=hours, minutes=minutes)
+
+class _Timer:
+    __slots__ = ('chat_id', 'message_id', 'base_elapsed', 'base_time', 'shown', 'generation')
+
+    def __init__(self, chat_id: int, message_id: int):
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.base_elapsed = 0
+        self.base_time = 0.0
+        self.shown: str | None = None
+        self.generation = 0
+
+    def elapsed(self, now: float) -> int:
+        return int(self.base_elapsed + now - self.base_time)
+
+class FlowTicker:
+    """
+    Общий планировщик живых таймеров потока: одна задача и куча сроков вместо задачи на пользователя.
+    Таймер тикает, когда прошедшее время доходит до следующего кратного interval, и правит сообщение,
+    только если текст изменился. Правки идут не чаще max_edits_per_sec на процесс: при отставании
+    таймеры обслуживаются по очереди сроков и показывают актуальное время, промежуточные значения
+    пропускаются. Приостановленные таймеры из кучи убираются.
+
+    У сообщения не больше одной правки в полёте. untrack дожидается её, чтобы правка таймера
+    не вернула клавиатуру идущего таймера поверх той, что поставит обработчик после паузы или остановки.
+    """
+
+    def __init__(
+        self,
+        interval: float = 60.0,
+        max_edits_per_sec: float = 20.0,
+        max_in_flight: int = 50,
+        render: Callable[[int], str] = render_flow_timer,
+    ):
+        # Чаще раза в секунду править сообщение в одном чате Telegram не даёт
+        self.interval = max(1.0, interval)
+        self.max_edits_per_sec = max_edits_per_sec
+        self.max_in_flight = max_in_flight
+        self.render = render
+        self._timers: dict[tuple[int, int], _Timer] = {}
+        # (срок, порядковый номер, ключ, поколение таймера); устаревшие записи пропускаются при извлечении
+        self._heap: list[tuple[float, int, tuple[int, int], int]] = []
+        self._seq = itertools.count()
+        # Поколения уникальны на весь планировщик: таймер, созданный заново после untrack,
+        # не должен совпасть по поколению с записями старого таймера, оставшимися в куче
+        self._generations = itertools.count(1)
+        self._wakeup = asyncio.Event()
+        # (chat_id, message_id) -> задача правки, которая ещё не завершилась
+        self._in_flight: dict[tuple[int, int], asyncio.Task] = {}
+        self._bot: Bot | None = None
+        self._task: asyncio.Task | None = None
+        self._markup = create_flow_active_kb()
+        self._tokens = max_edits_per_sec
+        self._tokens_updated = 0.0
+        self._blocked_until = 0.0
+        self.edits = 0
+        self.skipped = 0
+        self.errors = 0
+        self.lag_max = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def __len__(self) -> int:
+        return len(self._timers)
+
+    def start(self, bot: Bot) -> None:
+        self._bot = bot
+        self._tokens_updated = asyncio.get_running_loop().time()
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight.values(), return_exceptions=True)
+
+    def track(self, chat_id: int, message_id: int, elapsed_sec: int) -> None:
+        """Начинает (или возобновляет) обновление сообщения таймера с уже прошедшим временем."""
+        if self._task is None:
+            return
+        key = (chat_id, message_id)
+        timer = self._timers.get(key)
+        if timer is None:
+            timer = self._timers[key] = _Timer(chat_id, message_id)
+        now = asyncio.get_running_loop().time()
+        timer.generation = next(self._generations)
+        timer.base_elapsed = elapsed_sec
+        timer.base_time = now
+        self._schedule(key, timer, now)
+        self._wakeup.set()
+
+    async def untrack(self, chat_id: int, message_id: int) -> None:
+        """Прекращает обновление (пауза, завершение или отмена таймера) и дожидается уже начатой правки."""
+        key = (chat_id, message_id)
+        self._drop(key)
+        task = self._in_flight.get(key)
+        if task is not None:
+            # wait, а не await: отмена обработчика не должна отменять саму правку
+            await asyncio.wait({task})
+
+    def _drop(self, key: tuple[int, int]) -> None:
+        self._timers.pop(key, None)
+        # Куча чистится лениво, но не даём ей разрастись из-за частых пауз
+        if len(self._heap) > 2 * len(self._timers) + 64:
+            self._heap = [
+                entry for entry in self._heap
+                if (timer := self._timers.get(entry[2])) is not None and timer.generation == entry[3]
+            ]
+            heapq.heapify(self._heap)
+
+    def stats(self) -> dict[str, float]:
+        return {
+            'active': len(self._timers),
+            'heap': len(self._heap),
+            'in_flight': len(self._in_flight),
+            'edits': self.edits,
+            'skipped': self.skipped,
+            'errors': self.errors,
+            'lag_max_seconds': self.lag_max,
+        }
+
+    def _schedule(self, key: tuple[int, int], timer: _Timer, now: float) -> None:
+        due = now + self.interval - (timer.elapsed(now) % self.interval)
+        heapq.heappush(self._heap, (due, next(self._seq), key, timer.generation))
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.max_edits_per_sec, self._tokens + (now - self._tokens_updated) * self.max_edits_per_sec)
+        self._tokens_updated = now
+
+    def _next_delay(self, now: float) -> float | None:
+        """Сколько ждать до следующей правки; None — ждать сигнала (нет таймеров или заняты все слоты)."""
+        heap = self._heap
+        while heap:
+            timer = self._timers.get(heap[0][2])
+            if timer is not None and timer.generation == heap[0][3]:
+                break
+            heapq.heappop(heap)
+        if not heap or len(self._in_flight) >= self.max_in_flight:
+            return None
+        self._refill(now)
+        delay = max(heap[0][0] - now, self._blocked_until - now)
+        if self._tokens < 1:
+            delay = max(delay, (1 - self._tokens) / self.max_edits_per_sec)
+        return delay
+
+    async def _run(self) -> None:
+        # Правки из _fire наследуют контекст задачи и уходят после ответов пользователям
+        mark_background()
+        loop = asyncio.get_running_loop()
+        while True:
+            self._wakeup.clear()
+            now = loop.time()
+            delay = self._next_delay(now)
+            if delay is None:
+                await self._wakeup.wait()
+            elif delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                self._fire(now)
+
+    def _fire(self, now: float) -> None:
+        heap = self._heap
+        while heap and heap[0][0] <= now and len(self._in_flight) < self.max_in_flight:
+            due, _, key, generation = heap[0]
+            timer = self._timers.get(key)
+            if timer is None or timer.generation != generation:
+                heapq.heappop(heap)
+                continue
+            text = self.render(timer.elapsed(now))
+            if key in self._in_flight:
+                # Предыдущая правка ещё не завершилась: эту пропускаем, время покажем на следующем тике
+                self.skipped += 1
+            elif text != timer.shown:
+                if self._tokens < 1:
+                    break
+                self._tokens -= 1
+                timer.shown = text
+                task = asyncio.create_task(self._edit(timer, text))
+                self._in_flight[key] = task
+                task.add_done_callback(functools.partial(self._edit_done, key))
+            else:
+                self.skipped += 1
+            heapq.heappop(heap)
+            self.lag_max = max(self.lag_max, now - due)
+            self._schedule(key, timer, now)
+
+    def _edit_done(self, key: tuple[int, int], task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        self._wakeup.set()
+
+    async def _edit(self, timer: _Timer, text: str) -> None:
+        try:
+            if await message_editor.edit_text(self._bot, timer.chat_id, timer.message_id, text, self._markup):
+                self.edits += 1
+        except TelegramRetryAfter as e:
+            # Telegram просит подождать: приостанавливаем все правки, текст покажем на следующем тике
+            self._blocked_until = asyncio.get_running_loop().time() + e.retry_after
+            timer.shown = None
+        except TelegramBadRequest:
+            # Сообщение удалено или больше не редактируется ("not modified" редактор не выбрасывает)
+            self._drop((timer.chat_id, timer.message_id))
+        except Exception:
+            self.errors += 1
+            timer.shown = None
+            logger.exception("Flow timer edit failed for chat %s", timer.chat_id)
@@ -0,0 +1 @@
+from .webhook import WebhookHandler, run_webhook
@@ -0,0 +1,97 @@
+import asyncio
+import logging
+import secrets
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from sqlalchemy import text
+
+from config import conf
+from database.connection import engine
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+class WebhookHandler:
+    """
+    Принимает апдейты от Telegram и передаёт их диспетчеру в фоне.
+    Одновременно обрабатывается не больше max_concurrency апдейтов: при заполнении
+    ответ Telegram задерживается, и он сам снижает темп отправки.
+    """
+    def __init__(self, dp: Dispatcher, bot: Bot, secret_token: str, max_concurrency: int = 100):
+        self.dp = dp
+        self.bot = bot
+        self.secret_token = secret_token
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._tasks: set[asyncio.Task] = set()
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if not secrets.compare_digest(request.headers.get(SECRET_HEADER, ''), self.secret_token):
+            return web.Response(status=401)
+        try:
+            update = await request.json()
+        except ValueError:
+            return web.Response(status=400)
+        await self._semaphore.acquire()
+        task = asyncio.create_task(self._process(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return web.Response()
+
+    async def _process(self, update: dict) -> None:
+        try:
+            await self.dp.feed_raw_update(self.bot, update)
+        except Exception:
+            logger.exception("Failed to process update %s", update.get('update_id'))
+        finally:
+            self._semaphore.release()
+
+    async def wait_closed(self) -> None:
+        """Дожидается обработки уже принятых апдейтов."""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+async def healthz(request: web.Request) -> web.Response:
+    return web.Response(text='ok')
+
+async def readyz(request: web.Request) -> web.Response:
+    """Готовность: процесс жив и БД отвечает."""
+    try:
+        async with engine.connect() as conn:
+            await asyncio.wait_for(conn.execute(text('SELECT 1')), timeout=2)
+    except Exception:
+        return web.Response(status=503, text='database unavailable')
+    return web.Response(text='ok')
+
+async def run_webhook(dp: Dispatcher, bot: Bot) -> None:
+    """Запускает aiohttp-сервер для вебхука и регистрирует его в Telegram."""
+    # Без заданного секрета генерируем одноразовый: вебхук всё равно регистрируется при старте
+    secret_token = conf.WEBHOOK_SECRET or secrets.token_urlsafe(32)
+    handler = WebhookHandler(dp, bot, secret_token, max_concurrency=conf.WEBHOOK_MAX_CONCURRENCY)
+
+    app = web.Application()
+    app.router.add_post(conf.WEBHOOK_PATH, handler.handle)
+    app.router.add_get('/healthz', healthz)
+    app.router.add_get('/readyz', readyz)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, conf.WEBHOOK_HOST, conf.WEBHOOK_PORT)
+    await site.start()
+    logger.info("Webhook server listening on %s:%s", conf.WEBHOOK_HOST, conf.WEBHOOK_PORT)
+
+    await dp.emit_startup(bot=bot, dispatcher=dp)
+    await bot.set_webhook(
+        url=conf.WEBHOOK_BASE_URL.rstrip('/') + conf.WEBHOOK_PATH,
+        secret_token=secret_token,
+        allowed_updates=dp.resolve_used_update_types(),
+        drop_pending_updates=True,
+    )
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+        await handler.wait_closed()
+        await dp.emit_shutdown(bot=bot, dispatcher=dp)
+        await bot.session.close()
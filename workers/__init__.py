@@ -0,0 +1 @@
+from .supervisor import Supervisor, shard_for
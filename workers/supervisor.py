@@ -0,0 +1,109 @@
+import asyncio
+import logging
+import multiprocessing
+import queue as queue_module
+
+from aiogram import Bot
+from aiogram.types import Update
+
+from config import conf
+from .worker import run_worker
+
+logger = logging.getLogger(__name__)
+
+def shard_for(update: dict, workers: int) -> int:
+    """Номер воркера для апдейта: все апдейты одного пользователя попадают к одному воркеру."""
+    for value in update.values():
+        if isinstance(value, dict):
+            user = value.get('from') or value.get('user')
+            if isinstance(user, dict) and 'id' in user:
+                return user['id'] % workers
+            chat = value.get('chat')
+            if isinstance(chat, dict) and 'id' in chat:
+                return chat['id'] % workers
+    return 0
+
+class Supervisor:
+    """
+    Получает апдейты long polling'ом и раздаёт их N процессам-воркерам по from_user.id,
+    поэтому FSM-состояние и таймер потока пользователя всегда живут в одном процессе.
+    Упавшие воркеры перезапускаются, их очереди при этом сохраняются.
+    """
+    def __init__(self, bot: Bot, allowed_updates: list[str], workers: int, queue_size: int = 10000):
+        self.bot = bot
+        self.allowed_updates = allowed_updates
+        self._ctx = multiprocessing.get_context('spawn')
+        self.queues = [self._ctx.Queue(maxsize=queue_size) for _ in range(workers)]
+        self.processes: list[multiprocessing.Process | None] = [None] * workers
+        self.restarts = [0] * workers
+        self.routed = [0] * workers
+
+    def _start_worker(self, index: int) -> None:
+        process = self._ctx.Process(target=run_worker, args=(index, self.queues[index]), name=f'worker-{index}')
+        process.start()
+        self.processes[index] = process
+
+    def stats(self) -> list[dict]:
+        """Состояние воркеров: глубина очереди, число перезапусков и отправленных апдейтов."""
+        return [
+            {
+                'worker': index,
+                'alive': bool(process and process.is_alive()),
+                'queue_depth': self.queues[index].qsize(),
+                'restarts': self.restarts[index],
+                'routed': self.routed[index],
+            }
+            for index, process in enumerate(self.processes)
+        ]
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(conf.WORKER_MONITOR_INTERVAL)
+            for index, process in enumerate(self.processes):
+                if process is not None and not process.is_alive():
+                    logger.warning("Worker %s exited with code %s, restarting", index, process.exitcode)
+                    self.restarts[index] += 1
+                    self._start_worker(index)
+            logger.info("Workers: %s", self.stats())
+
+    async def _route(self, update: Update) -> None:
+        # Имена полей как в Bot API ('from', а не from_user): по ним shard_for находит пользователя,
+        # и в таком же виде апдейт ждёт feed_raw_update воркера
+        update = update.model_dump(mode='json', exclude_none=True, by_alias=True)
+        index = shard_for(update, len(self.queues))
+        while True:
+            try:
+                self.queues[index].put_nowait(update)
+                break
+            except queue_module.Full:
+                # воркер не успевает: притормаживаем polling вместо потери апдейтов
+                await asyncio.sleep(0.05)
+        self.routed[index] += 1
+
+    async def run(self) -> None:
+        for index in range(len(self.queues)):
+            self._start_worker(index)
+        watcher = asyncio.create_task(self._watch())
+        await self.bot.delete_webhook(drop_pending_updates=True)
+        offset = None
+        try:
+            while True:
+                try:
+                    updates = await self.bot.get_updates(
+                        offset=offset, timeout=30, allowed_updates=self.allowed_updates
+                    )
+                except Exception:
+                    logger.exception("get_updates failed")
+                    await asyncio.sleep(1)
+                    continue
+                for update in updates:
+                    await self._route(update)
+                    offset = update.update_id + 1
+        finally:
+            watcher.cancel()
+            for updates_queue in self.queues:
+                updates_queue.put(None)
+            for process in self.processes:
+                if process is not None:
+                    await asyncio.to_thread(process.join, 30)
+            await self.bot.session.close()
@@ -0,0 +1,71 @@
+import asyncio
+import logging
+import multiprocessing
+import queue as queue_module
+
+from config import conf
+
+logger = logging.getLogger(__name__)
+
+def run_worker(index: int, updates: multiprocessing.Queue) -> None:
+    """Точка входа процесса-воркера: обрабатывает апдейты своей доли пользователей."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format=f'worker-{index} %(filename)s:%(lineno)d #%(levelname)-8s '
+               '[%(asctime)s] - %(name)s - %(message)s'
+    )
+    try:
+        asyncio.run(_worker_main(index, updates))
+    except KeyboardInterrupt:
+        pass
+
+async def _worker_main(index: int, updates: multiprocessing.Queue) -> None:
+    # Импорт внутри процесса: у каждого воркера свой движок SQLAlchemy и свой пул
+    from database import record_writer, replica_router
+    from main import create_bot, create_dispatcher, setup_metrics
+    from storage import create_storage
+    from timers import flow_ticker
+
+    storage = create_storage()
+    bot = create_bot()
+    dp = create_dispatcher(storage)
+    await setup_metrics(conf.METRICS_PORT + index + 1)
+    if conf.RECORD_WRITE_BEHIND:
+        await record_writer.start()
+    if conf.FLOW_TIMER_ENABLED:
+        flow_ticker.start(bot)
+    replica_router.start()
+
+    semaphore = asyncio.Semaphore(conf.WORKER_MAX_CONCURRENCY)
+    tasks: set[asyncio.Task] = set()
+
+    async def process(update: dict) -> None:
+        try:
+            await dp.feed_raw_update(bot, update)
+        except Exception:
+            logger.exception("Failed to process update %s", update.get('update_id'))
+        finally:
+            semaphore.release()
+
+    logger.info("Worker %s started", index)
+    try:
+        while True:
+            try:
+                update = await asyncio.to_thread(updates.get, True, 1.0)
+            except queue_module.Empty:
+                continue
+            if update is None:
+                break
+            await semaphore.acquire()
+            task = asyncio.create_task(process(update))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+    finally:
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        await flow_ticker.close()
+        await replica_router.close()
+        await record_writer.close()
+        await storage.close()
+        await bot.session.close()
+        logger.info("Worker %s stopped", index)